@@ -0,0 +1,81 @@
+"""Tokens/sec of token-window chunking: single-pass offsets vs. the per-window decode loop.
+
+The legacy path is the previous implementation (encoder looked up per document, every
+window decoded separately, spans summed from piece lengths); the current path encodes
+once and slices the text at mapped token offsets.
+
+    python -m benchmarks.bench_chunk --docs 50 --words 20000 --max-tokens 512 --overlap 64
+"""
+import argparse
+import json
+import random
+import time
+
+import tiktoken
+
+from src.common.types import Chunk
+from src.ingest.chunk import token_chunk
+
+WORDS = "retrieval vector index chunk document embedding query latency throughput section table figure naïve café".split()
+
+
+def _legacy_chunk(text: str, max_tokens: int, overlap_tokens: int):
+    encoder = tiktoken.get_encoding("cl100k_base")
+    tokens = encoder.encode(text)
+    pieces = []
+    start = 0
+    while start < len(tokens):
+        end = min(start + max_tokens, len(tokens))
+        pieces.append(encoder.decode(tokens[start:end]))
+        if end == len(tokens):
+            break
+        start = max(0, end - overlap_tokens)
+    chunks = []
+    offset = 0
+    for idx, piece in enumerate(pieces):
+        chunks.append(
+            Chunk(doc_id="bench", chunk_index=idx, text=piece, char_span=(offset, offset + len(piece)), section_path=None, page_numbers=[], metadata={})
+        )
+        offset += len(piece)
+    return chunks
+
+
+def _time(fn, docs, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunks = sum(len(fn(d)) for d in docs)
+        best = min(best, time.perf_counter() - start)
+    return best, chunks
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=50)
+    parser.add_argument("--words", type=int, default=20000)
+    parser.add_argument("--max-tokens", type=int, default=512)
+    parser.add_argument("--overlap", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=5, help="report the best of this many passes")
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    docs = [" ".join(rnd.choice(WORDS) for _ in range(args.words)) for _ in range(args.docs)]
+    tokens = sum(len(tiktoken.get_encoding("cl100k_base").encode(d)) for d in docs)
+
+    legacy_s, legacy_chunks = _time(lambda d: _legacy_chunk(d, args.max_tokens, args.overlap), docs, args.repeat)
+    current_s, current_chunks = _time(lambda d: list(token_chunk(d, "bench", args.max_tokens, args.overlap)), docs, args.repeat)
+    print(
+        json.dumps(
+            {
+                "docs": args.docs,
+                "tokens": tokens,
+                "legacy": {"seconds": round(legacy_s, 3), "tokens_per_s": round(tokens / legacy_s), "chunks": legacy_chunks},
+                "current": {"seconds": round(current_s, 3), "tokens_per_s": round(tokens / current_s), "chunks": current_chunks},
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Cold vs. warm conversion-cache benchmark for the docling chunking path.
+
+Runs convert + chunk over the input files twice against a fresh cache directory and
+reports wall time and the number of Docling conversions performed in each pass.
+A warm pass should perform zero conversions.
+
+    python -m benchmarks.bench_convert_cache --config configs/default.yaml
+"""
+import argparse
+import json
+import tempfile
+import time
+
+from src.common.config import load_config
+from src.ingest.chunk import chunk_document
+from src.ingest.convert_docling import convert_with_docling
+from src.ingest.discover import discover_files
+
+
+def _count_conversions():
+    from docling.document_converter import DocumentConverter
+
+    original = DocumentConverter.convert
+    counter = {"conversions": 0}
+
+    def counting(self, *args, **kwargs):
+        counter["conversions"] += 1
+        return original(self, *args, **kwargs)
+
+    DocumentConverter.convert = counting
+    return counter
+
+
+def _run_pass(files, cfg, counter):
+    counter["conversions"] = 0
+    start = time.perf_counter()
+    chunks = 0
+    for f in files:
+        dc = convert_with_docling(f.path, f.sha256, cfg)
+        chunks += len(chunk_document(dc, cfg["chunking"]["strategy"], cfg["chunking"]["max_tokens"], cfg["chunking"]["overlap_tokens"]))
+    return {"seconds": round(time.perf_counter() - start, 3), "conversions": counter["conversions"], "chunks": chunks}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--config", default="configs/default.yaml")
+    parser.add_argument("--input-dir", default=None)
+    args = parser.parse_args()
+
+    cfg = load_config(args.config)
+    if args.input_dir:
+        cfg["data"]["input_dir"] = args.input_dir
+    cfg.setdefault("docling", {})["cache_converted"] = True
+    files = discover_files(
+        cfg["data"]["input_dir"],
+        cfg["data"].get("include_glob", []),
+        cfg["data"].get("exclude_glob", []),
+        cfg["data"].get("max_file_mb", 50),
+    )
+    counter = _count_conversions()
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cfg["data"]["cache_dir"] = cache_dir
+        cold = _run_pass(files, cfg, counter)
+        warm = _run_pass(files, cfg, counter)
+    print(json.dumps({"files": len(files), "strategy": cfg["chunking"]["strategy"], "cold": cold, "warm": warm}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Texts/sec of the local HuggingFace embedding backend across execution options.
+
+Embeds a synthetic corpus with mixed chunk lengths using a small local model and reports
+throughput for each variant: single-process torch, multi-process torch, dynamic int8
+quantization and ONNX Runtime. Variants whose extras are missing are reported as skipped.
+
+    python -m benchmarks.bench_hf_embed --model sentence-transformers/all-MiniLM-L6-v2 --texts 2000
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+from src.ingest.embed import Embedder
+
+WORDS = "retrieval vector index chunk document embedding query latency throughput section table figure".split()
+
+
+def _corpus(n: int):
+    rnd = random.Random(0)
+    # 20-800 token chunks, as produced by the chunkers
+    return [" ".join(rnd.choice(WORDS) for _ in range(rnd.randint(15, 600))) for _ in range(n)]
+
+
+def _run(model: str, texts, batch_size: int, options):
+    try:
+        embedder = Embedder(provider="huggingface", model=model, batch_size=batch_size, timeout_s=60, huggingface=options)
+    except Exception as exc:  # noqa: BLE001 - report and continue with the other variants
+        return {"skipped": f"{type(exc).__name__}: {exc}"}
+    try:
+        embedder.embed_array(texts[:batch_size])  # warm-up (model load, pool start)
+        start = time.perf_counter()
+        arr = embedder.embed_array(texts)
+        seconds = time.perf_counter() - start
+    finally:
+        embedder.close()
+    return {"seconds": round(seconds, 3), "texts_per_s": round(len(texts) / seconds, 1), "dims": int(arr.shape[1])}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    texts = _corpus(args.texts)
+    variants = {
+        "torch": {"device": "cpu"},
+        "torch_multiprocess": {"device": "cpu", "processes": args.processes},
+        "torch_int8": {"device": "cpu", "quantize": "int8"},
+        "onnx": {"device": "cpu", "backend": "onnx"},
+    }
+    results = {name: _run(args.model, texts, args.batch_size, options) for name, options in variants.items()}
+    print(json.dumps({"model": args.model, "texts": len(texts), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
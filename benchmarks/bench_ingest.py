@@ -0,0 +1,155 @@
+"""Ingest throughput on generated documents, isolated from Docling and the embedding provider.
+
+Documents are generated from a seed inside ``prepare`` (standing in for conversion), then
+chunked with the configured strategy, embedded by a stub that returns random unit vectors,
+and written to an in-memory store that diffs documents like the real clients. Two passes:
+
+- ``stages``: the serial ingest under ``IngestProfiler``, giving items/s and MB/s for
+  convert, chunk, embed and upsert separately;
+- ``pipeline``: ``run_pipeline`` end to end with ``--workers`` conversion processes.
+
+    python -m benchmarks.bench_ingest --docs 200 --words 3000 --strategy hierarchical --workers 4
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from src.common.types import Chunk, DiscoveredFile, DocumentConversion, SectionText
+from src.ingest.chunk import chunk_document
+from src.ingest.pipeline import PipelineSettings, ingest_serial, run_pipeline
+from src.ingest.profile import NULL_PROFILER, IngestProfiler
+from src.ingest.upsert import VectorClient, diff_document
+
+WORDS = "retrieval vector index chunk document embedding query latency throughput section table figure naïve café".split()
+
+
+def _generate(f: DiscoveredFile, words: int) -> DocumentConversion:
+    rnd = random.Random(f.sha256)
+    sections = []
+    for s in range(max(1, words // 500)):
+        text = " ".join(rnd.choice(WORDS) for _ in range(500))
+        sections.append(SectionText(section_path=f"Chapter {s // 4} > Section {s}", page_numbers=[s + 1], text=text))
+    markdown = "\n\n".join(f"## {sec.section_path}\n\n{sec.text}" for sec in sections)
+    return DocumentConversion(
+        doc_id=f.sha256, title=None, author=None, created_at=None, modified_at=None, language="en",
+        markdown=markdown, source_path=f.path, sections=sections,
+    )
+
+
+def _prepare(f: DiscoveredFile, cfg: Dict, profiler=NULL_PROFILER) -> List[Chunk]:
+    ccfg = cfg["chunking"]
+    with profiler.stage("convert", items=1, nbytes=f.size_bytes):
+        dc = _generate(f, cfg["bench_words"])
+    with profiler.stage("chunk") as counts:
+        chunks = chunk_document(dc, ccfg["strategy"], ccfg["max_tokens"], ccfg["overlap_tokens"])
+        counts.items, counts.bytes = len(chunks), sum(len(c.text.encode("utf-8")) for c in chunks)
+    for ch in chunks:
+        ch.metadata.update({"source_path": f.path, "file_name": f.path, "sha256": f.sha256, "doc_id": dc.doc_id})
+    return chunks
+
+
+class StubEmbedder:
+    def __init__(self, dims: int) -> None:
+        self.dims = dims
+        self._rng = np.random.default_rng(0)
+
+    def embed_array(self, texts) -> np.ndarray:
+        vectors = self._rng.standard_normal((len(texts), self.dims), dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def embedding_dimensions(self) -> int:
+        return self.dims
+
+
+class MemoryVectorClient(VectorClient):
+    """Dict-backed store; ``replace_document`` diffs against stored ids like the real clients."""
+
+    def __init__(self) -> None:
+        self.points: Dict[str, tuple] = {}
+        self.documents: Dict[str, List[str]] = {}
+
+    def ensure_collection(self, name: str, dims: int) -> None:
+        pass
+
+    def upsert(self, records) -> None:
+        for r in records:
+            self.points[r.id] = (np.array(r.vector, dtype=np.float32), r.text, r.metadata)
+
+    def delete(self, ids: List[str]) -> None:
+        for i in ids:
+            self.points.pop(i, None)
+
+    def document_ids(self, doc_key: str) -> List[str]:
+        return self.documents.get(doc_key, [])
+
+    def replace_document(self, doc_key: str, records) -> None:
+        fresh, _, stale = diff_document(self.documents.get(doc_key, []), records)
+        self.upsert(fresh)
+        self.delete(stale)
+        self.documents[doc_key] = [r.id for r in records]
+
+
+def _files(n: int, words: int) -> List[DiscoveredFile]:
+    # size_bytes approximates the generated text, so convert MB/s is comparable across runs
+    return [DiscoveredFile(path=f"gen/doc_{i:05d}.md", size_bytes=words * 9, sha256=f"{i:064x}") for i in range(n)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=200)
+    parser.add_argument("--words", type=int, default=3000, help="words per generated document")
+    parser.add_argument("--strategy", default="hierarchical", choices=["hierarchical", "token"])
+    parser.add_argument("--max-tokens", type=int, default=800)
+    parser.add_argument("--overlap", type=int, default=150)
+    parser.add_argument("--dims", type=int, default=384)
+    parser.add_argument("--workers", type=int, default=4, help="conversion processes for the pipeline pass")
+    parser.add_argument("--upsert-batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    cfg = {
+        "chunking": {"strategy": args.strategy, "max_tokens": args.max_tokens, "overlap_tokens": args.overlap},
+        "bench_words": args.words,
+    }
+    files = _files(args.docs, args.words)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        profiler = IngestProfiler(tmp, top_n=0)
+        try:
+            chunks = ingest_serial(files, cfg, StubEmbedder(args.dims), MemoryVectorClient(), PipelineSettings(), prepare=_prepare, profiler=profiler)
+            stages = profiler.report()["stages"]
+        finally:
+            profiler.close()
+
+    settings = PipelineSettings(convert_workers=args.workers, upsert_batch_size=args.upsert_batch_size)
+    start = time.perf_counter()
+    run_pipeline(files, cfg, StubEmbedder(args.dims), MemoryVectorClient(), settings, prepare=_prepare)
+    elapsed = time.perf_counter() - start
+
+    keep = ("items", "bytes", "wall_s", "cpu_s", "items_per_s", "mb_per_s")
+    print(
+        json.dumps(
+            {
+                "docs": args.docs,
+                "words": args.words,
+                "strategy": args.strategy,
+                "chunks": chunks,
+                "stages": {name: {k: s[k] for k in keep} for name, s in stages.items()},
+                "pipeline": {
+                    "workers": args.workers,
+                    "seconds": round(elapsed, 3),
+                    "docs_per_s": round(args.docs / elapsed, 1),
+                    "chunks_per_s": round(chunks / elapsed, 1),
+                },
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
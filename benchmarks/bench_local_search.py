@@ -0,0 +1,65 @@
+"""Open time and query latency of the in-process ``local`` vector engine.
+
+Builds a random unit-vector collection, then reports the time to reopen it (mmap, no
+load) and p50/p99 single-query latency for exact search and, after ``reindex``, IVF.
+
+    python -m benchmarks.bench_local_search --rows 100000 --dims 384
+"""
+import argparse
+import json
+import tempfile
+import time
+
+import numpy as np
+
+from src.common.types import EmbeddingBatch
+from src.search.client_local import LocalVectorClient
+
+
+def _latencies(client, queries, top_k, params=None):
+    out = []
+    for q in queries:
+        start = time.perf_counter()
+        client.search(q, top_k, None, params=params)
+        out.append(time.perf_counter() - start)
+    ms = np.array(out) * 1000
+    return {"p50_ms": round(float(np.percentile(ms, 50)), 3), "p99_ms": round(float(np.percentile(ms, 99)), 3)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--dims", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    results = {"rows": args.rows, "dims": args.dims}
+    with tempfile.TemporaryDirectory() as path:
+        settings = {"path": path, "index": "ivf", "nprobe": 8}
+        client = LocalVectorClient("bench", args.dims, settings=settings)
+        client.ensure_collection("bench", args.dims)
+        start = time.perf_counter()
+        for first in range(0, args.rows, 10000):
+            n = min(10000, args.rows - first)
+            ids = [f"{i:032x}" for i in range(first, first + n)]
+            client.upsert(EmbeddingBatch(ids, rng.normal(size=(n, args.dims)).astype(np.float32), [""] * n, [{}] * n))
+        results["load_s"] = round(time.perf_counter() - start, 3)
+        client.close()
+
+        start = time.perf_counter()
+        client = LocalVectorClient("bench", 0, settings=settings)
+        results["open_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        queries = rng.normal(size=(args.queries, args.dims)).tolist()
+        results["flat"] = _latencies(client, queries, args.top_k)
+        start = time.perf_counter()
+        client.reindex()
+        results["ivf_train_s"] = round(time.perf_counter() - start, 3)
+        results["ivf"] = _latencies(client, queries, args.top_k)
+        client.close()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Rows/sec of PgVectorClient.upsert: binary COPY + merge vs. the row-by-row INSERT loop.
+
+Point --dsn at a scratch database; rows are written under a dedicated source_path and
+removed afterwards, but the documents table is created with --dims if missing.
+
+    python -m benchmarks.bench_pg_upsert --dsn postgresql://... --rows 20000 --dims 1536
+"""
+import argparse
+import json
+import random
+import time
+
+from src.common.types import EmbeddingRecord
+from src.search.client_pgvector import PgVectorClient
+
+BENCH_SOURCE = "__bench_pg_upsert__"
+
+
+def _records(n: int, dims: int, tag: str):
+    rnd = random.Random(0)
+    return [
+        EmbeddingRecord(
+            id=f"bench-{tag}-{i}",
+            vector=[rnd.random() for _ in range(dims)],
+            text=f"benchmark chunk {i}",
+            metadata={"source_path": BENCH_SOURCE, "file_name": "bench", "chunk_index": i, "page_numbers": [], "char_span": (0, 0)},
+        )
+        for i in range(n)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dsn", required=True)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--dims", type=int, default=1536)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    results = {}
+    for method in ("insert", "copy"):
+        client = PgVectorClient(args.dsn, "documents", args.dims, upsert_batch_size=args.batch_size, upsert_method=method)
+        client.ensure_collection("documents", args.dims)
+        records = _records(args.rows, args.dims, method)
+        start = time.perf_counter()
+        client.upsert(records)
+        elapsed = time.perf_counter() - start
+        with client._pool.connection() as conn, conn.cursor() as cur:
+            cur.execute("DELETE FROM documents WHERE source_path = %s", (BENCH_SOURCE,))
+        client.close()
+        results[method] = {"seconds": round(elapsed, 3), "rows_per_s": round(args.rows / elapsed, 1)}
+    print(json.dumps({"rows": args.rows, "dims": args.dims, "batch_size": args.batch_size, **results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Load test of query-embedding micro-batching.
+
+By default a simulated embedding provider is used: each call takes a fixed round trip
+plus a small per-text cost, and at most ``--provider-concurrency`` calls run at once (the
+HTTP connection pool). Concurrent clients send queries for ``--seconds`` with one
+provider call per query (the old path) and then through ``EmbeddingBatcher``; QPS,
+latency percentiles and provider calls are reported for both.
+
+With ``--url`` the clients instead POST to a running search API, e.g. started once with
+``search.batching.enabled: true`` and once with false:
+
+    python -m benchmarks.bench_query_batching --clients 200 --seconds 10
+    python -m benchmarks.bench_query_batching --url http://localhost:8000 --clients 200
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+
+import numpy as np
+
+from src.search.batcher import EmbeddingBatcher
+
+QUERIES = [f"how do I configure feature {i}" for i in range(5000)]
+
+
+class SimulatedProvider:
+    def __init__(self, round_trip_ms: float, per_text_ms: float, concurrency: int) -> None:
+        self.round_trip_s = round_trip_ms / 1000.0
+        self.per_text_s = per_text_ms / 1000.0
+        self.calls = 0
+        self._slots = threading.Semaphore(concurrency)
+
+    def __call__(self, texts):
+        with self._slots:
+            self.calls += 1
+            time.sleep(self.round_trip_s + self.per_text_s * len(texts))
+        return [[0.0] * 8 for _ in texts]
+
+
+async def _drive(send, clients: int, seconds: float):
+    latencies = []
+    deadline = time.perf_counter() + seconds
+
+    async def client(seed: int) -> None:
+        rnd = random.Random(seed)
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            await send(rnd.choice(QUERIES))
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(clients)))
+    elapsed = time.perf_counter() - start
+    ms = np.array(latencies) * 1000
+    return {
+        "qps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(ms, 50)), 1),
+        "p99_ms": round(float(np.percentile(ms, 99)), 1),
+    }
+
+
+async def _simulated(args) -> dict:
+    results = {}
+    provider = SimulatedProvider(args.round_trip_ms, args.per_text_ms, args.provider_concurrency)
+
+    async def unbatched(query):
+        return (await asyncio.to_thread(provider, [query]))[0]
+
+    results["unbatched"] = await _drive(unbatched, args.clients, args.seconds)
+    results["unbatched"]["provider_calls"] = provider.calls
+
+    provider = SimulatedProvider(args.round_trip_ms, args.per_text_ms, args.provider_concurrency)
+    batcher = EmbeddingBatcher(provider, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+    results["batched"] = await _drive(batcher.embed, args.clients, args.seconds)
+    await batcher.close()
+    results["batched"]["provider_calls"] = provider.calls
+    results["batched"]["mean_batch_size"] = batcher.stats()["mean_batch_size"]
+    results["speedup"] = round(results["batched"]["qps"] / results["unbatched"]["qps"], 2)
+    return results
+
+
+async def _http(args) -> dict:
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.clients)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60) as http:
+
+        async def send(query):
+            # Unique suffixes keep the API's result cache out of the measurement
+            resp = await http.post("/search", json={"query": f"{query} #{random.random()}", "top_k": 5})
+            resp.raise_for_status()
+
+        return {"api": await _drive(send, args.clients, args.seconds)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--url", default=None, help="load-test a running search API instead of the simulation")
+    parser.add_argument("--round-trip-ms", type=float, default=30.0)
+    parser.add_argument("--per-text-ms", type=float, default=0.2)
+    parser.add_argument("--provider-concurrency", type=int, default=8)
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    args = parser.parse_args()
+    results = asyncio.run(_http(args) if args.url else _simulated(args))
+    print(json.dumps({"clients": args.clients, "seconds": args.seconds, **results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Time-to-first-token of RAG generation against a local fake OpenAI-compatible server.
+
+The server waits ``--first-token-ms`` before the first token and ``--token-ms`` between
+tokens, and every new connection costs ``--connect-ms`` (a stand-in for the TCP/TLS
+handshake to a remote provider). Two client paths are compared:
+
+- ``per_call_blocking``: a fresh client per request and a non-streaming completion, so
+  the first token reaches the caller only with the full answer (the old path);
+- ``pooled_streaming``: one long-lived ``LLMClient`` and ``stream``, so the first token
+  is forwarded as soon as the server sends it.
+
+    python -m benchmarks.bench_rag_ttft --requests 20 --tokens 100
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from src.rag.llm import LLMClient, LLMSettings
+
+
+def _make_handler(args):
+    class FakeOpenAI(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            time.sleep(args.connect_ms / 1000.0)
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream" if body.get("stream") else "application/json")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            time.sleep(args.first_token_ms / 1000.0)
+            if body.get("stream"):
+                for i in range(args.tokens):
+                    if i:
+                        time.sleep(args.token_ms / 1000.0)
+                    chunk = {"id": "c", "object": "chat.completion.chunk", "created": 0, "model": body["model"],
+                             "choices": [{"index": 0, "delta": {"content": f" tok{i}"}, "finish_reason": None}]}
+                    self._write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self._write(b"data: [DONE]\n\n")
+            else:
+                time.sleep(args.token_ms * (args.tokens - 1) / 1000.0)
+                message = {"role": "assistant", "content": "".join(f" tok{i}" for i in range(args.tokens))}
+                self._write(json.dumps({"id": "c", "object": "chat.completion", "created": 0, "model": body["model"],
+                                        "choices": [{"index": 0, "message": message, "finish_reason": "stop"}]}).encode())
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _write(self, part: bytes) -> None:
+            self.wfile.write(f"{len(part):x}\r\n".encode() + part + b"\r\n")
+            self.wfile.flush()
+
+        def log_message(self, *a):
+            pass
+
+    return FakeOpenAI
+
+
+def _summary(ttft, total):
+    ttft_ms, total_ms = np.array(ttft) * 1000, np.array(total) * 1000
+    return {
+        "ttft_p50_ms": round(float(np.percentile(ttft_ms, 50)), 1),
+        "ttft_p95_ms": round(float(np.percentile(ttft_ms, 95)), 1),
+        "total_p50_ms": round(float(np.percentile(total_ms, 50)), 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--tokens", type=int, default=100)
+    parser.add_argument("--first-token-ms", type=float, default=200.0)
+    parser.add_argument("--token-ms", type=float, default=10.0)
+    parser.add_argument("--connect-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _make_handler(args))
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+    settings = LLMSettings(model="bench", base_url=f"http://127.0.0.1:{httpd.server_address[1]}/v1")
+
+    ttft, total = [], []
+    for _ in range(args.requests):
+        llm = LLMClient(settings)
+        start = time.perf_counter()
+        llm.complete("question")
+        total.append(time.perf_counter() - start)
+        ttft.append(total[-1])
+        llm.close()
+    results = {"per_call_blocking": _summary(ttft, total)}
+
+    llm = LLMClient(settings)
+    ttft, total = [], []
+    for _ in range(args.requests):
+        start = time.perf_counter()
+        first = None
+        for _text in llm.stream("question"):
+            if first is None:
+                first = time.perf_counter() - start
+        ttft.append(first)
+        total.append(time.perf_counter() - start)
+    llm.close()
+    httpd.shutdown()
+    results["pooled_streaming"] = _summary(ttft, total)
+    results["ttft_speedup"] = round(results["per_call_blocking"]["ttft_p50_ms"] / results["pooled_streaming"]["ttft_p50_ms"], 2)
+    print(json.dumps({"requests": args.requests, "tokens": args.tokens, **results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
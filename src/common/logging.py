@@ -1,7 +1,61 @@
 import json
 import logging
 import sys
-from typing import Any, Dict
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar, Token
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+class Trace:
+    """Request ID plus the ``(name, seconds)`` spans recorded while handling one request."""
+
+    __slots__ = ("request_id", "spans")
+
+    def __init__(self, request_id: str) -> None:
+        self.request_id = request_id
+        self.spans: List[Tuple[str, float]] = []
+
+    def span_ms(self) -> Dict[str, float]:
+        out: Dict[str, float] = {}
+        for name, seconds in self.spans:
+            out[name] = round(out.get(name, 0.0) + seconds * 1000, 3)
+        return out
+
+
+_trace: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+_NULL_SPAN = nullcontext()
+
+
+def start_trace(request_id: Optional[str] = None) -> Tuple[Trace, Token]:
+    trace = Trace(request_id or uuid.uuid4().hex)
+    return trace, _trace.set(trace)
+
+
+def end_trace(token: Token) -> None:
+    _trace.reset(token)
+
+
+def current_trace() -> Optional[Trace]:
+    return _trace.get()
+
+
+@contextmanager
+def _timed(trace: Trace, name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.spans.append((name, time.perf_counter() - start))
+
+
+def span(name: str):
+    """Time a block as a span of the current request; a shared no-op outside a trace."""
+    trace = _trace.get()
+    if trace is None:
+        return _NULL_SPAN
+    return _timed(trace, name)
 
 
 class JsonFormatter(logging.Formatter):
@@ -11,6 +65,12 @@ class JsonFormatter(logging.Formatter):
             "name": record.name,
             "message": record.getMessage(),
         }
+        trace = _trace.get()
+        if trace is not None:
+            payload["request_id"] = trace.request_id
+        fields = getattr(record, "fields", None)
+        if fields:
+            payload.update(fields)
         if record.exc_info:
             payload["exc_info"] = self.formatException(record.exc_info)
         return json.dumps(payload, ensure_ascii=False)
@@ -27,5 +87,3 @@ def setup_logging(level: str = "INFO", json_output: bool = True) -> None:
 
 def get_logger(name: str) -> logging.Logger:
     return logging.getLogger(name)
-
-
@@ -0,0 +1,255 @@
+"""Prometheus-compatible counters, gauges and histograms.
+
+Metrics are module-level objects updated from the hot paths. Until ``enable_metrics`` is
+called (``observability.metrics: true``) every update is an early return, so
+instrumentation costs one attribute check. ``render`` produces the text exposition
+format served at ``GET /metrics``; batch jobs such as ingest ``export_metrics`` to a
+node_exporter textfile and/or a Pushgateway at the end of a run.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from src.common.logging import get_logger
+
+log = get_logger("metrics")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048)
+
+
+class _State:
+    enabled = False
+
+
+_state = _State()
+_NULL_TIMER = nullcontext()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def samples(self) -> Iterator[str]:  # pragma: no cover - interface
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        if not _state.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        if not _state.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: Any) -> None:
+        if not _state.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # per-bucket counts (last one is +Inf), sum, count
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def time(self, **labels: Any):
+        """Context manager observing the block's duration in seconds."""
+        if not _state.enabled:
+            return _NULL_TIMER
+        return self._timer(labels)
+
+    @contextmanager
+    def _timer(self, labels: Dict[str, Any]) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: Any) -> int:
+        entry = self._values.get(self._key(labels))
+        return entry[2] if entry else 0
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            items = [(key, (list(e[0]), e[1], e[2])) for key, e in self._values.items()]
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip((*self.buckets, float("inf")), counts):
+                cumulative += n
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {count}"
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicate metric: {metric.name}")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            samples = list(metric.samples())
+            if not samples:
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def clear(self) -> None:
+        for metric in self._metrics.values():
+            metric.clear()
+
+
+REGISTRY = Registry()
+
+
+def enable_metrics(enabled: bool = True) -> None:
+    _state.enabled = bool(enabled)
+
+
+def metrics_enabled() -> bool:
+    return _state.enabled
+
+
+def configure_metrics(cfg: Dict[str, Any]) -> bool:
+    """Enable metrics when ``observability.metrics`` is set; returns whether they are on."""
+    enable_metrics(bool((cfg.get("observability", {}) or {}).get("metrics", False)))
+    return _state.enabled
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+def write_textfile(path: str) -> None:
+    """Write the current metrics for node_exporter's textfile collector (atomic replace)."""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    Path(tmp).write_text(render())
+    os.replace(tmp, path)
+
+
+def push_to_gateway(url: str, job: str, timeout_s: float = 10.0) -> None:
+    import httpx
+
+    resp = httpx.put(f"{url.rstrip('/')}/metrics/job/{job}", content=render().encode("utf-8"), headers={"Content-Type": CONTENT_TYPE}, timeout=timeout_s)
+    resp.raise_for_status()
+
+
+def export_metrics(cfg: Dict[str, Any], job: str) -> None:
+    """Hand a batch job's metrics to ``observability.textfile`` and/or ``pushgateway``."""
+    if not _state.enabled:
+        return
+    ocfg = cfg.get("observability", {}) or {}
+    if ocfg.get("textfile"):
+        write_textfile(ocfg["textfile"])
+    if ocfg.get("pushgateway"):
+        try:
+            push_to_gateway(ocfg["pushgateway"], job)
+        except Exception as exc:  # noqa: BLE001 - metrics must not fail the job
+            log.warning(f"metrics_push_failed url={ocfg['pushgateway']} error={exc}")
+
+
+# -- catalog -----------------------------------------------------------------------------
+
+HTTP_REQUESTS = Counter("rag_http_requests_total", "API requests by route, method and status", ["route", "method", "status"])
+HTTP_SECONDS = Histogram("rag_http_request_seconds", "API request latency until the response starts", ["route"])
+EMBED_SECONDS = Histogram("rag_embed_request_seconds", "Latency of one embedding provider request or local encode", ["provider"])
+EMBED_BATCH_SIZE = Histogram("rag_embed_batch_size", "Texts per embedding provider request or local encode", ["provider"], SIZE_BUCKETS)
+EMBED_RETRIES = Counter("rag_embed_retries_total", "Embedding requests retried after a provider error", ["provider"])
+QUERY_BATCH_SIZE = Histogram("rag_query_embed_batch_size", "Queries per micro-batched API embedding call", (), SIZE_BUCKETS)
+SEARCH_SECONDS = Histogram("rag_vector_search_seconds", "Vector store search latency", ["backend", "op"])
+SEARCH_QUERIES = Counter("rag_vector_search_queries_total", "Queries sent to the vector store", ["backend"])
+UPSERT_SECONDS = Histogram("rag_upsert_seconds", "Vector store write latency per call", ["backend"])
+UPSERT_ROWS = Counter("rag_upsert_rows_total", "Rows written to the vector store", ["backend"])
+CACHE_LOOKUPS = Counter("rag_cache_lookups_total", "Cache lookups by cache and result (hit|miss)", ["cache", "result"])
+QUEUE_DEPTH = Gauge("rag_queue_depth", "Items waiting in an ingest stage queue or the query embedding batcher", ["queue"])
@@ -1,5 +1,7 @@
-from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Tuple
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
 
 
 @dataclass
@@ -7,6 +9,8 @@ class DiscoveredFile:
     path: str
     size_bytes: int
     sha256: str
+    mtime_ns: int = 0
+    inode: int = 0
 
 
 @dataclass
@@ -24,13 +28,15 @@ class DocumentConversion:
     created_at: Optional[str]
     modified_at: Optional[str]
     language: Optional[str]
-    markdown: Optional[str]
-    source_path: Optional[str]
-    dl_doc: Optional[object]
-    sections: List[SectionText]
+    markdown: Optional[str] = None
+    source_path: Optional[str] = None
+    dl_doc: Optional[object] = None
+    sections: List[SectionText] = field(default_factory=list)
+    # Serialized DoclingDocument in the conversion cache, loaded on first use
+    dl_doc_path: Optional[str] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class Chunk:
     doc_id: str
     chunk_index: int
@@ -41,15 +47,83 @@ class Chunk:
     metadata: Dict[str, Any]
 
 
-@dataclass
+@dataclass(slots=True)
 class EmbeddingRecord:
     id: str
-    vector: List[float]
+    # A list, or a row view into an EmbeddingBatch matrix
+    vector: Union[List[float], np.ndarray]
     text: str
     metadata: Dict[str, Any]
 
 
-@dataclass
+def as_float32_matrix(vectors) -> np.ndarray:
+    """``vectors`` as a 2-D float32 matrix (no copy when it already is one)."""
+    arr = np.asarray(vectors, dtype=np.float32)
+    return arr.reshape(len(arr), -1) if arr.size else arr.reshape(len(arr), 0)
+
+
+@dataclass(slots=True)
+class EmbeddingBatch:
+    """Columnar embedding records: one float32 ``(n, dims)`` matrix instead of n float lists.
+
+    Iterating yields ``EmbeddingRecord`` views whose ``vector`` is a row of ``vectors``,
+    so consumers can treat a batch like a list of records without copying vectors.
+    """
+
+    ids: List[str]
+    vectors: np.ndarray
+    texts: List[str]
+    metadata: List[Dict[str, Any]]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self) -> Iterator[EmbeddingRecord]:
+        for i, rid in enumerate(self.ids):
+            yield EmbeddingRecord(id=rid, vector=self.vectors[i], text=self.texts[i], metadata=self.metadata[i])
+
+    def __getitem__(self, key: slice) -> "EmbeddingBatch":
+        # Slices of the matrix are views
+        return EmbeddingBatch(self.ids[key], self.vectors[key], self.texts[key], self.metadata[key])
+
+    def take(self, indices: Sequence[int]) -> "EmbeddingBatch":
+        idx = list(indices)
+        if idx and idx == list(range(idx[0], idx[0] + len(idx))):
+            vectors = self.vectors[idx[0] : idx[0] + len(idx)]  # a contiguous run stays a view
+        else:
+            vectors = self.vectors[idx] if idx else self.vectors[:0]
+        return EmbeddingBatch(
+            [self.ids[i] for i in idx],
+            vectors,
+            [self.texts[i] for i in idx],
+            [self.metadata[i] for i in idx],
+        )
+
+    @classmethod
+    def from_records(cls, records: Sequence[EmbeddingRecord]) -> "EmbeddingBatch":
+        return cls(
+            [r.id for r in records],
+            as_float32_matrix([r.vector for r in records]),
+            [r.text for r in records],
+            [r.metadata for r in records],
+        )
+
+    @classmethod
+    def concat(cls, batches: Sequence["EmbeddingBatch"]) -> "EmbeddingBatch":
+        batches = [b for b in batches if len(b)]
+        if len(batches) == 1:
+            return batches[0]
+        if not batches:
+            return cls([], np.empty((0, 0), dtype=np.float32), [], [])
+        return cls(
+            [i for b in batches for i in b.ids],
+            np.concatenate([b.vectors for b in batches]),
+            [t for b in batches for t in b.texts],
+            [m for b in batches for m in b.metadata],
+        )
+
+
+@dataclass(slots=True)
 class SearchResult:
     id: str
     score: float
@@ -1,126 +1,150 @@
-from typing import List
+from functools import lru_cache
+from typing import Iterator, List, Optional, Tuple
 
 import tiktoken
 
 from src.common.types import Chunk, DocumentConversion
+from src.ingest.convert_docling import load_docling_document
 
 
-def docling_markdown_chunk(conversion: DocumentConversion, max_tokens: int, overlap_tokens: int) -> List[Chunk]:
+_CONTINUATION_BYTES = bytes(range(0x80, 0xC0))
+
+
+@lru_cache(maxsize=None)
+def _encoder(name: str = "cl100k_base"):
+    return tiktoken.get_encoding(name)
+
+
+def _window_bounds(n: int, max_tokens: int, overlap_tokens: int) -> List[Tuple[int, int]]:
+    bounds: List[Tuple[int, int]] = []
+    start = 0
+    while start < n:
+        end = min(start + max_tokens, n)
+        bounds.append((start, end))
+        if end == n:
+            break
+        # Always advance, even if overlap_tokens >= max_tokens
+        start = max(start + 1, end - overlap_tokens)
+    return bounds
+
+
+def token_windows(text: str, max_tokens: int, overlap_tokens: int) -> Iterator[Tuple[int, int]]:
+    """Yield ``(start, end)`` character spans of ``max_tokens`` windows over ``text``.
+
+    The text is encoded once. The token runs between consecutive window boundaries are
+    decoded once each (as bytes, so overlapping tokens are not decoded twice) to find the
+    byte offset of every boundary, which is then mapped to a character offset. Windows
+    are therefore exact slices of ``text`` and spans stay correct whatever the overlap.
+    A boundary inside a multi-byte character snaps to the start of that character.
+    """
+    if not text:
+        return
+    encoder = _encoder()
+    tokens = encoder.encode(text, disallowed_special=())
+    bounds = _window_bounds(len(tokens), max_tokens, overlap_tokens)
+    points = sorted({p for b in bounds for p in b})
+    char_at = {points[0]: 0}
+    chars = 0
+    for prev, point in zip(points, points[1:]):
+        seg = encoder.decode_bytes(tokens[prev:point])
+        # A run starting with a continuation byte means the boundary split a character
+        if seg and 0x80 <= seg[0] < 0xC0:
+            char_at[prev] -= 1
+        # Characters started in this run: all bytes except UTF-8 continuation bytes
+        chars += len(seg.translate(None, _CONTINUATION_BYTES))
+        char_at[point] = chars
+    char_at[points[-1]] = len(text)
+    for start, end in bounds:
+        if char_at[end] > char_at[start]:
+            yield char_at[start], char_at[end]
+
+
+def _section_chunks(
+    text: str,
+    doc_id: str,
+    first_index: int,
+    max_tokens: int,
+    overlap_tokens: int,
+    base_offset: int = 0,
+    section_path: Optional[str] = None,
+    page_numbers: Optional[List[int]] = None,
+) -> Iterator[Chunk]:
+    for i, (start, end) in enumerate(token_windows(text, max_tokens, overlap_tokens)):
+        yield Chunk(
+            doc_id=doc_id,
+            chunk_index=first_index + i,
+            text=text[start:end],
+            char_span=(base_offset + start, base_offset + end),
+            section_path=section_path,
+            page_numbers=page_numbers if page_numbers is not None else [],
+            metadata={},
+        )
+
+
+def _markdown_sections(text: str) -> Iterator[Tuple[int, str]]:
+    """Split on markdown heading lines, yielding (offset in ``text``, stripped section)."""
+    sec_start = 0
+    pos = 0
+    for line in text.splitlines(keepends=True):
+        if line.strip().startswith("#") and pos > sec_start:
+            yield from _stripped(text, sec_start, pos)
+            sec_start = pos
+        pos += len(line)
+    yield from _stripped(text, sec_start, len(text))
+
+
+def _stripped(text: str, start: int, end: int) -> Iterator[Tuple[int, str]]:
+    section = text[start:end]
+    body = section.strip()
+    if body:
+        yield start + len(section) - len(section.lstrip()), body
+
+
+def docling_markdown_chunk(conversion: DocumentConversion, max_tokens: int, overlap_tokens: int) -> Iterator[Chunk]:
     """Chunk using markdown headings from Docling export (if available).
 
     Splits on markdown heading lines (e.g., lines starting with '#'). Then token-splits within each section.
+    ``char_span`` is relative to the whole markdown text.
     """
-    encoder = tiktoken.get_encoding("cl100k_base")
     text = conversion.markdown or "\n\n".join(s.text for s in conversion.sections)
-    lines = text.splitlines()
-    sections: List[str] = []
-    current: List[str] = []
-    for ln in lines:
-        if ln.strip().startswith("#") and current:
-            sections.append("\n".join(current).strip())
-            current = [ln]
-        else:
-            current.append(ln)
-    if current:
-        sections.append("\n".join(current).strip())
-
-    result: List[Chunk] = []
     chunk_index = 0
-    for sec in sections:
-        pieces = _split_tokens(sec, max_tokens, overlap_tokens, encoder)
-        offset = 0
-        for piece in pieces:
-            start = offset
-            end = offset + len(piece)
-            result.append(
-                Chunk(
-                    doc_id=conversion.doc_id,
-                    chunk_index=chunk_index,
-                    text=piece,
-                    char_span=(start, end),
-                    section_path=None,
-                    page_numbers=[],
-                    metadata={},
-                )
-            )
+    for offset, sec in _markdown_sections(text):
+        for chunk in _section_chunks(sec, conversion.doc_id, chunk_index, max_tokens, overlap_tokens, base_offset=offset):
             chunk_index += 1
-            offset = end
-    return result
+            yield chunk
 
 
-def _split_tokens(text: str, max_tokens: int, overlap_tokens: int, encoder) -> List[str]:
-    tokens = encoder.encode(text)
-    chunks = []
-    start = 0
-    while start < len(tokens):
-        end = min(start + max_tokens, len(tokens))
-        chunk_tokens = tokens[start:end]
-        chunks.append(encoder.decode(chunk_tokens))
-        if end == len(tokens):
-            break
-        start = max(0, end - overlap_tokens)
-    return chunks
-
-
-def hierarchical_chunk(conversion: DocumentConversion, max_tokens: int, overlap_tokens: int) -> List[Chunk]:
-    encoder = tiktoken.get_encoding("cl100k_base")
-    result: List[Chunk] = []
+def hierarchical_chunk(conversion: DocumentConversion, max_tokens: int, overlap_tokens: int) -> Iterator[Chunk]:
+    """Token-split each section; ``char_span`` is relative to the section text."""
     chunk_index = 0
     for section in conversion.sections:
-        pieces = _split_tokens(section.text, max_tokens, overlap_tokens, encoder)
-        offset = 0
-        for piece in pieces:
-            start = offset
-            end = offset + len(piece)
-            result.append(
-                Chunk(
-                    doc_id=conversion.doc_id,
-                    chunk_index=chunk_index,
-                    text=piece,
-                    char_span=(start, end),
-                    section_path=section.section_path,
-                    page_numbers=section.page_numbers,
-                    metadata={},
-                )
-            )
+        for chunk in _section_chunks(
+            section.text,
+            conversion.doc_id,
+            chunk_index,
+            max_tokens,
+            overlap_tokens,
+            section_path=section.section_path,
+            page_numbers=section.page_numbers,
+        ):
             chunk_index += 1
-            offset = end
-    return result
+            yield chunk
 
 
-def token_chunk(plain_text: str, doc_id: str, max_tokens: int, overlap_tokens: int) -> List[Chunk]:
-    encoder = tiktoken.get_encoding("cl100k_base")
-    pieces = _split_tokens(plain_text, max_tokens, overlap_tokens, encoder)
-    result: List[Chunk] = []
-    offset = 0
-    for idx, piece in enumerate(pieces):
-        start = offset
-        end = offset + len(piece)
-        result.append(
-            Chunk(
-                doc_id=doc_id,
-                chunk_index=idx,
-                text=piece,
-                char_span=(start, end),
-                section_path=None,
-                page_numbers=[],
-                metadata={},
-            )
-        )
-        offset = end
-    return result
+def token_chunk(plain_text: str, doc_id: str, max_tokens: int, overlap_tokens: int) -> Iterator[Chunk]:
+    return _section_chunks(plain_text, doc_id, 0, max_tokens, overlap_tokens)
 
 
-def docling_hierarchical_chunk(conversion: DocumentConversion, max_tokens: int, overlap_tokens: int) -> List[Chunk]:
+def docling_hierarchical_chunk(conversion: DocumentConversion, max_tokens: int, overlap_tokens: int) -> Iterator[Chunk]:
     # Use Docling's HierarchicalChunker directly on the DoclingDocument if available; else fallback to markdown
     try:
         from docling_core.transforms.chunker import HierarchicalChunker
     except Exception:
         return docling_markdown_chunk(conversion, max_tokens, overlap_tokens)
 
-    dl_doc = getattr(conversion, "dl_doc", None)
+    dl_doc = load_docling_document(conversion)
     if dl_doc is None:
-        # Best-effort reconstruction if possible
+        # Best-effort reconstruction if the conversion cache has no DoclingDocument
         try:
             from docling.document_converter import DocumentConverter
 
@@ -153,10 +177,11 @@ def docling_hierarchical_chunk(conversion: DocumentConversion, max_tokens: int,
             chunk_index += 1
     except Exception:
         return docling_markdown_chunk(conversion, max_tokens, overlap_tokens)
-    return result
+    return iter(result)
 
 
-def chunk_document(conversion: DocumentConversion, strategy: str, max_tokens: int, overlap_tokens: int) -> List[Chunk]:
+def iter_chunks(conversion: DocumentConversion, strategy: str, max_tokens: int, overlap_tokens: int) -> Iterator[Chunk]:
+    """Lazily chunk a document, so very large documents can be streamed."""
     if strategy == "docling":
         return docling_hierarchical_chunk(conversion, max_tokens, overlap_tokens)
     if strategy == "hierarchical" and conversion.sections:
@@ -165,3 +190,5 @@ def chunk_document(conversion: DocumentConversion, strategy: str, max_tokens: in
     return token_chunk(joined, conversion.doc_id, max_tokens, overlap_tokens)
 
 
+def chunk_document(conversion: DocumentConversion, strategy: str, max_tokens: int, overlap_tokens: int) -> List[Chunk]:
+    return list(iter_chunks(conversion, strategy, max_tokens, overlap_tokens))
@@ -24,12 +24,53 @@ def _save_cache(cache_dir: str, sha256: str, data: Dict[str, Any]) -> None:
         json.dump(data, f, ensure_ascii=False)
 
 
+def _dl_doc_path(cache_dir: str, sha256: str) -> str:
+    return str(Path(cache_dir) / f"{sha256}.docling.json")
+
+
+def _save_dl_doc(cache_dir: str, sha256: str, dl_doc: Any) -> str | None:
+    """Serialize the DoclingDocument with docling-core's JSON format; returns the path on success."""
+    if dl_doc is None or not hasattr(dl_doc, "save_as_json"):
+        return None
+    Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    path = _dl_doc_path(cache_dir, sha256)
+    tmp = path + ".tmp"
+    try:
+        dl_doc.save_as_json(Path(tmp))
+        os.replace(tmp, path)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return None
+    return path
+
+
+def load_docling_document(conversion: DocumentConversion) -> Any:
+    """Return the DoclingDocument for a conversion, rehydrating it from the cache on first use."""
+    if conversion.dl_doc is None and conversion.dl_doc_path:
+        try:
+            from docling_core.types.doc import DoclingDocument
+
+            conversion.dl_doc = DoclingDocument.load_from_json(Path(conversion.dl_doc_path))
+        except Exception:
+            # Unreadable cache entry: don't retry on every access
+            conversion.dl_doc_path = None
+    return conversion.dl_doc
+
+
 def convert_with_docling(file_path: str, sha256: str, cfg: Dict[str, Any]) -> DocumentConversion:
     cache_dir = cfg["data"]["cache_dir"]
     if cfg.get("docling", {}).get("cache_converted", True):
         cached = _load_cache(cache_dir, sha256)
-        if cached:
-            return _from_cached(cached)
+        dl_doc_path = _dl_doc_path(cache_dir, sha256)
+        has_dl_doc = os.path.exists(dl_doc_path)
+        # The docling chunker needs the DoclingDocument; entries cached without it are
+        # treated as misses so a warm run never has to re-convert inside the chunker
+        needs_dl_doc = cfg.get("chunking", {}).get("strategy") == "docling"
+        if cached and (has_dl_doc or not needs_dl_doc):
+            dc = _from_cached(cached)
+            dc.dl_doc_path = dl_doc_path if has_dl_doc else None
+            return dc
 
     # Lazy import to keep optional dependency lightweight for tests
     from docling.document_converter import DocumentConverter
@@ -64,6 +105,7 @@ def convert_with_docling(file_path: str, sha256: str, cfg: Dict[str, Any]) -> Do
     if cfg.get("docling", {}).get("cache_converted", True):
         # Only cache serializable fields
         cached = _to_cached(dc)
+        _save_dl_doc(cache_dir, sha256, dc.dl_doc)
         _save_cache(cache_dir, sha256, cached)
     return dc
 
@@ -2,10 +2,13 @@ import fnmatch
 import hashlib
 import os
 from pathlib import Path
-from typing import Iterable, List
+from typing import TYPE_CHECKING, Iterable, List, Optional
 
 from src.common.types import DiscoveredFile
 
+if TYPE_CHECKING:
+    from src.ingest.manifest import IngestManifest
+
 
 def _iter_files(root: str) -> Iterable[Path]:
     for dirpath, _, filenames in os.walk(root):
@@ -25,7 +28,18 @@ def _sha256_of_file(path: Path) -> str:
     return h.hexdigest()
 
 
-def discover_files(input_dir: str, include_glob: List[str], exclude_glob: List[str], max_file_mb: int) -> List[DiscoveredFile]:
+def discover_files(
+    input_dir: str,
+    include_glob: List[str],
+    exclude_glob: List[str],
+    max_file_mb: int,
+    manifest: Optional["IngestManifest"] = None,
+) -> List[DiscoveredFile]:
+    """Walk input_dir and hash matching files.
+
+    With a manifest, files whose (size, mtime_ns, inode) signature is unchanged reuse the
+    recorded SHA-256 instead of being read again, and new signatures are recorded.
+    """
     results: List[DiscoveredFile] = []
     for p in _iter_files(input_dir):
         rel_name = p.name
@@ -33,10 +47,22 @@ def discover_files(input_dir: str, include_glob: List[str], exclude_glob: List[s
             continue
         if exclude_glob and _matches(rel_name, exclude_glob):
             continue
-        size_bytes = p.stat().st_size
-        if size_bytes > max_file_mb * 1024 * 1024:
+        st = p.stat()
+        if st.st_size > max_file_mb * 1024 * 1024:
             continue
-        results.append(DiscoveredFile(path=str(p), size_bytes=size_bytes, sha256=_sha256_of_file(p)))
+        path = str(p)
+        sha256 = manifest.known_sha256(path, st.st_size, st.st_mtime_ns, st.st_ino) if manifest else None
+        results.append(
+            DiscoveredFile(
+                path=path,
+                size_bytes=st.st_size,
+                sha256=sha256 or _sha256_of_file(p),
+                mtime_ns=st.st_mtime_ns,
+                inode=st.st_ino,
+            )
+        )
+    if manifest:
+        manifest.record_discovered(results)
     return results
 
 
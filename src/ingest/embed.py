@@ -1,26 +1,177 @@
 from __future__ import annotations
 
+import math
 import os
-from typing import List
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
-from tenacity import retry, stop_after_attempt, wait_random_exponential
+import numpy as np
+from tenacity import Retrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+from src.common import metrics
+from src.common.logging import get_logger
+from src.ingest.embed_cache import EmbeddingCache, cache_key, make_embedding_cache
+from src.ingest.rate_limit import make_bucket
+
+
+log = get_logger("ingest.embed")
+
+_backoff = wait_random_exponential(multiplier=1, max=20)
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds requested by a ``Retry-After``/``retry-after-ms`` header on an API error."""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        return None
+    return None
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status == 408 or status == 429 or status >= 500
+    # Connection errors, timeouts and local model failures keep the old retry-everything behavior
+    return True
+
+
+def pack_batches(token_counts: Sequence[int], max_items: int, max_tokens: int, window: int = 0) -> List[List[int]]:
+    """Group input indices into requests of at most ``max_items`` inputs and ``max_tokens`` tokens.
+
+    Within each ``window`` of consecutive inputs the indices are sorted by length first, so
+    a batch holds similarly sized inputs and fills up evenly. ``window=0`` keeps input order.
+    """
+    order = list(range(len(token_counts)))
+    if window > 1:
+        order = [i for start in range(0, len(order), window) for i in sorted(order[start : start + window], key=lambda j: token_counts[j])]
+    batches: List[List[int]] = []
+    batch: List[int] = []
+    tokens = 0
+    for i in order:
+        n = token_counts[i]
+        if batch and (len(batch) >= max_items or tokens + n > max_tokens):
+            batches.append(batch)
+            batch, tokens = [], 0
+        batch.append(i)
+        tokens += n
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _combine(vectors: List[List[float]], weights: List[int]) -> List[float]:
+    """Token-weighted mean of the pieces of a split input, re-normalized to unit length."""
+    total = float(sum(weights))
+    mean = [sum(w * v[d] for v, w in zip(vectors, weights)) / total for d in range(len(vectors[0]))]
+    norm = math.sqrt(sum(x * x for x in mean)) or 1.0
+    return [x / norm for x in mean]
+
+
+def _load_sentence_transformer(model: str, options: Dict[str, Any]):
+    """Load a SentenceTransformer with the configured execution backend.
+
+    ``backend: onnx`` runs the model with ONNX Runtime (``model_file`` selects an exported
+    variant, e.g. ``onnx/model_qint8_avx512_vnni.onnx`` for int8); ``quantize: int8`` applies
+    PyTorch dynamic int8 quantization to the Linear layers of the torch backend.
+    """
+    from sentence_transformers import SentenceTransformer  # type: ignore
+
+    backend = options.get("backend", "torch")
+    kwargs: Dict[str, Any] = {}
+    if options.get("device"):
+        kwargs["device"] = options["device"]
+    if backend != "torch":
+        kwargs["backend"] = backend
+        if options.get("model_file"):
+            kwargs["model_kwargs"] = {"file_name": options["model_file"]}
+    st = SentenceTransformer(model, **kwargs)
+    if options.get("quantize") == "int8" and backend == "torch":
+        import torch  # type: ignore
+
+        st = torch.quantization.quantize_dynamic(st, {torch.nn.Linear}, dtype=torch.qint8)
+    return st
 
 
 class Embedder:
-    def __init__(self, provider: str, model: str, batch_size: int, timeout_s: int) -> None:
+    """Embeds texts with OpenAI or a local sentence-transformers model.
+
+    The local backend (``huggingface`` options: device, backend, model_file, quantize,
+    processes, normalize) encodes whole calls at once: inputs are sorted by length to cut
+    padding, spread over ``processes`` worker processes when set, and returned as
+    contiguous float32 arrays by ``embed_array``.
+
+    OpenAI requests are packed by token count: at most ``batch_size`` inputs and
+    ``max_tokens_per_request`` tokens each, sorted by length within ``sort_window``
+    inputs. Inputs longer than ``max_input_tokens`` are truncated or, with
+    ``oversize="split"``, embedded in pieces and averaged. Batches are sent by a pool of
+    ``concurrency`` threads, so several requests are in flight at once; optional
+    ``rpm``/``tpm`` token buckets keep them inside the account's rate limits. Each batch
+    is retried on its own (429, 5xx, connection errors), waiting for the server's
+    ``Retry-After`` when given. Results always come back in input order.
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        model: str,
+        batch_size: int,
+        timeout_s: int,
+        cache: Optional[EmbeddingCache] = None,
+        concurrency: int = 1,
+        rpm: Optional[float] = None,
+        tpm: Optional[float] = None,
+        max_retries: int = 5,
+        base_url: Optional[str] = None,
+        max_tokens_per_request: int = 300_000,
+        max_input_tokens: int = 8191,
+        oversize: str = "truncate",
+        sort_window: int = 1024,
+        huggingface: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        if oversize not in ("truncate", "split"):
+            raise ValueError(f"Unknown oversize policy: {oversize}")
         self.provider = provider
         self.model = model
         self.batch_size = batch_size
         self.timeout_s = timeout_s
+        self.cache = cache
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max(0, max_retries)
+        self._requests = make_bucket(rpm)
+        self._tokens = make_bucket(tpm)
+        self._pool: Optional[ThreadPoolExecutor] = None
+        # Embed calls may come from several threads; pools are created once, under this lock
+        self._pool_lock = threading.Lock()
+        self.max_input_tokens = max_input_tokens
+        self.max_tokens_per_request = max(max_tokens_per_request, max_input_tokens)
+        self.oversize = oversize
+        self.sort_window = sort_window
 
         if provider == "openai":
             from openai import OpenAI  # type: ignore
 
-            self._client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        elif provider == "huggingface":
-            from sentence_transformers import SentenceTransformer  # type: ignore
+            # Retries are handled per batch here, so the SDK's own retries are disabled
+            self._client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), base_url=base_url or None, max_retries=0)
+            import tiktoken
 
-            self._model = SentenceTransformer(model)
+            try:
+                self._encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                self._encoding = tiktoken.get_encoding("cl100k_base")
+        elif provider == "huggingface":
+            self.hf_options = dict(huggingface or {})
+            self.normalize = bool(self.hf_options.get("normalize", True))
+            self.processes = int(self.hf_options.get("processes", 0) or 0)
+            self._mp_pool = None
+            self._model = _load_sentence_transformer(model, self.hf_options)
         else:
             raise ValueError(f"Unknown embeddings provider: {provider}")
 
@@ -33,26 +184,186 @@ class Embedder:
             # Reasonable default
             return 1536
         if self.provider == "huggingface":
-            # Common default for MiniLM-L6
-            return 384
+            dims = self._model.get_sentence_embedding_dimension()
+            # Common default for MiniLM-L6 when the model doesn't report one
+            return int(dims) if dims else 384
         raise ValueError("Unknown provider")
 
-    def _embed_batch_openai(self, texts: List[str]) -> List[List[float]]:
-        resp = self._client.embeddings.create(model=self.model, input=texts, timeout=self.timeout_s)
-        return [d.embedding for d in resp.data]
+    def _embed_batch_openai(self, texts: List[str], tokens: int = 0) -> List[List[float]]:
+        if self._requests:
+            self._requests.acquire(1)
+        if self._tokens:
+            self._tokens.acquire(tokens or sum(len(t) // 4 + 1 for t in texts))
+        metrics.EMBED_BATCH_SIZE.observe(len(texts), provider=self.provider)
+        with metrics.EMBED_SECONDS.time(provider=self.provider):
+            resp = self._client.embeddings.create(model=self.model, input=texts, timeout=self.timeout_s)
+        return [d.embedding for d in sorted(resp.data, key=lambda d: d.index)]
+
+    def _encode_hf(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, self.embedding_dimensions()), dtype=np.float32)
+        # Sort longest first so each batch pads to similar lengths, then restore input order
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        ordered = [texts[i] for i in order]
+        metrics.EMBED_BATCH_SIZE.observe(len(texts), provider=self.provider)
+        with metrics.EMBED_SECONDS.time(provider=self.provider):
+            if self.processes > 1:
+                with self._pool_lock:
+                    if self._mp_pool is None:
+                        self._mp_pool = self._model.start_multi_process_pool(["cpu"] * self.processes)
+                encoded = self._model.encode_multi_process(
+                    ordered, self._mp_pool, batch_size=self.batch_size, normalize_embeddings=self.normalize
+                )
+            else:
+                encoded = self._model.encode(
+                    ordered, batch_size=self.batch_size, convert_to_numpy=True, normalize_embeddings=self.normalize
+                )
+        out = np.empty((len(texts), encoded.shape[1]), dtype=np.float32)
+        out[order] = encoded
+        return out
 
     def _embed_batch_hf(self, texts: List[str]) -> List[List[float]]:
-        return self._model.encode(texts, convert_to_numpy=False)  # type: ignore
+        return self._encode_hf(texts).tolist()
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        """Embed ``texts`` into a contiguous ``(len(texts), dims)`` float32 array."""
+        if not texts:
+            return np.empty((0, self.embedding_dimensions()), dtype=np.float32)
+        if self.provider == "huggingface" and self.cache is None:
+            return self._encode_hf(texts)
+        vectors = self.embed_texts(texts)
+        return np.ascontiguousarray(vectors, dtype=np.float32).reshape(len(texts), -1)
 
-    @retry(wait=wait_random_exponential(multiplier=1, max=20), stop=stop_after_attempt(5))
     def embed_texts(self, texts: List[str]) -> List[List[float]]:
-        vectors: List[List[float]] = []
-        for i in range(0, len(texts), self.batch_size):
-            batch = texts[i : i + self.batch_size]
-            if self.provider == "openai":
-                vectors.extend(self._embed_batch_openai(batch))
-            else:
-                vectors.extend(self._embed_batch_hf(batch))
-        return vectors
+        """Embed ``texts`` in order; with a cache only the misses reach the provider."""
+        if self.cache is None:
+            return self._embed_uncached(texts)
+        dims = self.embedding_dimensions()
+        keys = [cache_key(self.provider, self.model, dims, t) for t in texts]
+        cached = self.cache.get_many(keys)
+        # Deduplicate misses so repeated texts in one call are embedded once
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in cached:
+                missing.setdefault(key, text)
+        if missing:
+            fresh = self._embed_uncached(list(missing.values()))
+            computed = dict(zip(missing.keys(), fresh))
+            self.cache.put_many(computed.items())
+            cached.update(computed)
+        return [cached[k] for k in keys]
+
+    def cache_stats(self) -> Optional[Dict[str, Any]]:
+        return self.cache.stats() if self.cache is not None else None
+
+    def _wait(self, retry_state) -> float:
+        exc = retry_state.outcome.exception()
+        delay = _retry_after(exc) if exc is not None else None
+        if delay is None:
+            return _backoff(retry_state)
+        # Hold back the other workers too; they would hit the same limit
+        if self._requests:
+            self._requests.pause(delay)
+        return delay
+
+    def _embed_batch(self, batch: List[str], tokens: int = 0) -> List[List[float]]:
+        for attempt in Retrying(
+            wait=self._wait,
+            stop=stop_after_attempt(self.max_retries + 1),
+            retry=retry_if_exception(_is_retryable),
+            reraise=True,
+        ):
+            with attempt:
+                if attempt.retry_state.attempt_number > 1:
+                    metrics.EMBED_RETRIES.inc(provider=self.provider)
+                    log.warning(f"embed_batch_retry attempt={attempt.retry_state.attempt_number} size={len(batch)}")
+                if self.provider == "openai":
+                    return self._embed_batch_openai(batch, tokens)
+                return self._embed_batch_hf(batch)
+        raise AssertionError("unreachable")  # pragma: no cover
+
+    def _pieces(self, texts: List[str]) -> Tuple[List[str], List[int], List[int]]:
+        """Fit inputs to ``max_input_tokens``: returns piece texts, piece token counts and owners."""
+        pieces: List[str] = []
+        counts: List[int] = []
+        owners: List[int] = []
+        limit = self.max_input_tokens
+        for i, text in enumerate(texts):
+            ids = self._encoding.encode(text, disallowed_special=())
+            if len(ids) > limit and self.oversize == "truncate":
+                ids = ids[:limit]
+                text = self._encoding.decode(ids)
+            if len(ids) <= limit:
+                pieces.append(text)
+                counts.append(max(1, len(ids)))
+                owners.append(i)
+                continue
+            for start in range(0, len(ids), limit):
+                part = ids[start : start + limit]
+                pieces.append(self._encoding.decode(part))
+                counts.append(len(part))
+                owners.append(i)
+        return pieces, counts, owners
+
+    def _run_batches(self, jobs: List[Tuple[List[str], int]]) -> List[List[List[float]]]:
+        if self.concurrency == 1 or len(jobs) == 1:
+            return [self._embed_batch(b, n) for b, n in jobs]
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="embed")
+            pool = self._pool
+        # map() yields in submission order, so results line up with the jobs
+        return list(pool.map(lambda job: self._embed_batch(*job), jobs))
+
+    def _embed_uncached(self, texts: List[str]) -> List[List[float]]:
+        if self.provider != "openai":
+            # Whole call in one encode so length sorting and worker processes see every input
+            return self._embed_batch(texts)
+        pieces, counts, owners = self._pieces(texts)
+        batches = pack_batches(counts, self.batch_size, self.max_tokens_per_request, self.sort_window)
+        results = self._run_batches([([pieces[j] for j in b], sum(counts[j] for j in b)) for b in batches])
+        piece_vectors: List[Optional[List[float]]] = [None] * len(pieces)
+        for batch, vectors in zip(batches, results):
+            for j, vec in zip(batch, vectors):
+                piece_vectors[j] = vec
+        if len(pieces) == len(texts):
+            return piece_vectors  # type: ignore[return-value]
+        grouped: List[List[int]] = [[] for _ in texts]
+        for j, owner in enumerate(owners):
+            grouped[owner].append(j)
+        return [
+            piece_vectors[js[0]] if len(js) == 1 else _combine([piece_vectors[j] for j in js], [counts[j] for j in js])  # type: ignore[misc]
+            for js in grouped
+        ]
+
+    def close(self) -> None:
+        with self._pool_lock:
+            if getattr(self, "_mp_pool", None) is not None:
+                self._model.stop_multi_process_pool(self._mp_pool)
+                self._mp_pool = None
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+        if self.cache is not None:
+            self.cache.close()
 
 
+def make_embedder(cfg: Dict[str, Any]) -> Embedder:
+    ecfg = cfg["embeddings"]
+    return Embedder(
+        provider=ecfg["provider"],
+        model=ecfg["model"],
+        batch_size=ecfg.get("batch_size", 64),
+        timeout_s=ecfg.get("request_timeout_s", 60),
+        cache=make_embedding_cache(cfg),
+        concurrency=int(ecfg.get("concurrency", 1)),
+        rpm=ecfg.get("rpm"),
+        tpm=ecfg.get("tpm"),
+        max_retries=int(ecfg.get("max_retries", 5)),
+        base_url=ecfg.get("base_url"),
+        max_tokens_per_request=int(ecfg.get("max_tokens_per_request", 300_000)),
+        max_input_tokens=int(ecfg.get("max_input_tokens", 8191)),
+        oversize=ecfg.get("oversize", "truncate"),
+        sort_window=int(ecfg.get("sort_window", 1024)),
+        huggingface=ecfg.get("huggingface"),
+    )
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from src.common import metrics
+
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    key TEXT PRIMARY KEY,
+    vector BLOB NOT NULL,
+    last_used INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used);
+"""
+
+UPSERT_SQL = """
+INSERT INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)
+ON CONFLICT(key) DO UPDATE SET vector=excluded.vector, last_used=excluded.last_used
+"""
+
+# Evict down to this fraction of the budget so eviction doesn't run on every write
+EVICT_TO = 0.9
+
+
+def cache_key(provider: str, model: str, dims: int, text: str) -> str:
+    text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return hashlib.sha256(f"{provider}:{model}:{dims}:{text_hash}".encode("utf-8")).hexdigest()
+
+
+def embedding_cache_path(cfg: Dict[str, Any]) -> str:
+    ccfg = cfg.get("embeddings", {}).get("cache", {}) or {}
+    cache_dir = cfg.get("data", {}).get("cache_dir", ".cache/docling")
+    return ccfg.get("path") or str(Path(cache_dir) / "embeddings.sqlite")
+
+
+class EmbeddingCache:
+    """Persistent content-addressed embedding store (SQLite, float32 blobs).
+
+    Keys come from ``cache_key``, so a vector is reused whenever the same text is embedded
+    with the same provider, model and dimensions. The store is bounded to ``max_mb`` of
+    vector data; the least recently used entries are evicted first. Safe to share between
+    threads.
+    """
+
+    def __init__(self, path: str, max_mb: float = 2048) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA_SQL)
+        self._bytes = self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        """Return cached vectors for the keys present and mark them recently used."""
+        found: Dict[str, List[float]] = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for i in range(0, len(unique), 500):
+                part = unique[i : i + 500]
+                marks = ",".join("?" * len(part))
+                for key, blob in self._conn.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({marks})", part):
+                    vec = array("f")
+                    vec.frombytes(blob)
+                    found[key] = vec.tolist()
+            if found:
+                now = time.time_ns()
+                with self._conn:
+                    self._conn.executemany("UPDATE embeddings SET last_used=? WHERE key=?", [(now, k) for k in found])
+            hits = sum(1 for k in keys if k in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        metrics.CACHE_LOOKUPS.inc(hits, cache="embeddings", result="hit")
+        metrics.CACHE_LOOKUPS.inc(len(keys) - hits, cache="embeddings", result="miss")
+        return found
+
+    def put_many(self, items: Iterable[Tuple[str, Sequence[float]]]) -> None:
+        now = time.time_ns()
+        rows = [(key, array("f", vec).tobytes(), now) for key, vec in items]
+        if not rows:
+            return
+        with self._lock:
+            keys = [r[0] for r in rows]
+            replaced = 0
+            for i in range(0, len(keys), 500):
+                part = keys[i : i + 500]
+                marks = ",".join("?" * len(part))
+                replaced += self._conn.execute(
+                    f"SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings WHERE key IN ({marks})", part
+                ).fetchone()[0]
+            with self._conn:
+                self._conn.executemany(UPSERT_SQL, rows)
+            self._bytes += sum(len(r[1]) for r in rows) - replaced
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        excess = self._bytes - int(self.max_bytes * EVICT_TO)
+        victims: List[str] = []
+        freed = 0
+        for key, size in self._conn.execute("SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_used"):
+            if freed >= excess:
+                break
+            victims.append(key)
+            freed += size
+        with self._conn:
+            self._conn.executemany("DELETE FROM embeddings WHERE key=?", [(k,) for k in victims])
+        self._bytes -= freed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": entries,
+                "bytes": self._bytes,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def make_embedding_cache(cfg: Dict[str, Any]) -> Optional[EmbeddingCache]:
+    ccfg = cfg.get("embeddings", {}).get("cache", {}) or {}
+    if not ccfg.get("enabled", False):
+        return None
+    return EmbeddingCache(embedding_cache_path(cfg), max_mb=float(ccfg.get("max_mb", 2048)))
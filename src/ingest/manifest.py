@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from src.common.types import DiscoveredFile
+
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size_bytes INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    settings TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    updated_at REAL NOT NULL
+);
+"""
+
+UPSERT_SQL = """
+INSERT INTO files (path, size_bytes, mtime_ns, inode, sha256, settings, status, updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(path) DO UPDATE SET size_bytes=excluded.size_bytes, mtime_ns=excluded.mtime_ns, inode=excluded.inode,
+sha256=excluded.sha256, settings=excluded.settings, status=excluded.status, updated_at=excluded.updated_at
+"""
+
+STATUS_PENDING = "pending"
+STATUS_INGESTED = "ingested"
+
+
+def ingest_settings_key(cfg: Dict[str, Any]) -> str:
+    """Fingerprint of the settings that shape stored chunks; a change forces re-ingest."""
+    chunking = cfg.get("chunking", {})
+    embeddings = cfg.get("embeddings", {})
+    vectordb = cfg.get("vectordb", {})
+    material = {
+        "chunking": [chunking.get("strategy"), chunking.get("max_tokens"), chunking.get("overlap_tokens")],
+        "embeddings": [embeddings.get("provider"), embeddings.get("model")],
+        "vectordb": [vectordb.get("provider"), vectordb.get("collection")],
+    }
+    return hashlib.sha256(json.dumps(material, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def manifest_path(cfg: Dict[str, Any]) -> str:
+    data = cfg.get("data", {})
+    return data.get("manifest_path") or str(Path(data.get("cache_dir", ".cache/docling")) / "ingest_manifest.sqlite")
+
+
+class IngestManifest:
+    """Persistent per-path record of file signatures and ingest status (SQLite).
+
+    Rows are loaded into memory once so discovery can check stat signatures without a
+    query per file. Writes are serialized with a lock so pipeline threads can report
+    completed documents.
+    """
+
+    def __init__(self, path: str) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA_SQL)
+        self._rows: Dict[str, Tuple[int, int, int, str, Optional[str], str]] = {
+            row[0]: tuple(row[1:])  # type: ignore[misc]
+            for row in self._conn.execute("SELECT path, size_bytes, mtime_ns, inode, sha256, settings, status FROM files")
+        }
+
+    def known_sha256(self, path: str, size_bytes: int, mtime_ns: int, inode: int) -> Optional[str]:
+        """Return the recorded hash if the file's stat signature is unchanged."""
+        row = self._rows.get(path)
+        if row and row[0] == size_bytes and row[1] == mtime_ns and row[2] == inode:
+            return row[3]
+        return None
+
+    def record_discovered(self, files: Iterable[DiscoveredFile]) -> None:
+        """Store signatures for discovered files; content changes reset the status to pending."""
+        now = time.time()
+        updates = []
+        for f in files:
+            row = self._rows.get(f.path)
+            if row and row[:4] == (f.size_bytes, f.mtime_ns, f.inode, f.sha256):
+                continue
+            settings, status = (row[4], row[5]) if row and row[3] == f.sha256 else (None, STATUS_PENDING)
+            self._rows[f.path] = (f.size_bytes, f.mtime_ns, f.inode, f.sha256, settings, status)
+            updates.append((f.path, f.size_bytes, f.mtime_ns, f.inode, f.sha256, settings, status, now))
+        if not updates:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(UPSERT_SQL, updates)
+
+    def is_ingested(self, f: DiscoveredFile, settings_key: str) -> bool:
+        row = self._rows.get(f.path)
+        return bool(row and row[3] == f.sha256 and row[4] == settings_key and row[5] == STATUS_INGESTED)
+
+    def mark_ingested(self, f: DiscoveredFile, settings_key: str) -> None:
+        with self._lock:
+            self._rows[f.path] = (f.size_bytes, f.mtime_ns, f.inode, f.sha256, settings_key, STATUS_INGESTED)
+            with self._conn:
+                self._conn.execute(
+                    UPSERT_SQL,
+                    (f.path, f.size_bytes, f.mtime_ns, f.inode, f.sha256, settings_key, STATUS_INGESTED, time.time()),
+                )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,354 @@
+from __future__ import annotations
+
+import queue
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from src.common import metrics
+from src.common.logging import get_logger
+from src.common.types import Chunk, DiscoveredFile, EmbeddingBatch
+from src.ingest.chunk import chunk_document
+from src.ingest.convert_docling import convert_with_docling
+from src.ingest.profile import NULL_PROFILER
+from src.ingest.upsert import VectorClient, build_batch, chunk_ids, embedding_fingerprint
+
+
+log = get_logger("ingest.pipeline")
+
+
+@dataclass
+class PipelineSettings:
+    convert_workers: int = 0
+    embed_workers: int = 2
+    upsert_batch_size: int = 256
+    queue_size: int = 8
+    replace_documents: bool = True
+
+    @classmethod
+    def from_config(cls, cfg: Dict[str, Any]) -> "PipelineSettings":
+        icfg = cfg.get("ingest", {}) or {}
+        return cls(
+            convert_workers=int(icfg.get("workers", cls.convert_workers)),
+            embed_workers=max(1, int(icfg.get("embed_workers", cls.embed_workers))),
+            upsert_batch_size=max(1, int(icfg.get("upsert_batch_size", cls.upsert_batch_size))),
+            queue_size=max(1, int(icfg.get("queue_size", cls.queue_size))),
+            replace_documents=bool(icfg.get("replace_documents", cls.replace_documents)),
+        )
+
+
+def prepare_document(f: DiscoveredFile, cfg: Dict[str, Any], profiler=NULL_PROFILER) -> List[Chunk]:
+    """Convert and chunk one file, tagging chunks with source metadata.
+
+    Module-level so it can be shipped to worker processes.
+    """
+    with profiler.stage("convert", items=1, nbytes=f.size_bytes):
+        dc = convert_with_docling(f.path, f.sha256, cfg)
+    with profiler.stage("chunk") as counts:
+        chunks = chunk_document(dc, cfg["chunking"]["strategy"], cfg["chunking"]["max_tokens"], cfg["chunking"]["overlap_tokens"])
+        if profiler.enabled:
+            counts.items, counts.bytes = len(chunks), sum(len(c.text.encode("utf-8")) for c in chunks)
+    for ch in chunks:
+        ch.metadata.update(
+            {
+                "source_path": f.path,
+                "file_name": Path(f.path).name,
+                "sha256": f.sha256,
+                "doc_id": dc.doc_id,
+            }
+        )
+    return chunks
+
+
+def document_fingerprint(cfg: Dict[str, Any], dims: int) -> str:
+    """``embedding_fingerprint`` of the configured model, folded into every chunk id."""
+    ecfg = cfg.get("embeddings", {}) or {}
+    return embedding_fingerprint(ecfg.get("provider", ""), ecfg.get("model", ""), dims)
+
+
+def embed_document(
+    f: DiscoveredFile, chunks: List[Chunk], embedder, client: VectorClient, settings: PipelineSettings, fingerprint: str, dims: int
+) -> EmbeddingBatch:
+    """Build ``f``'s batch, embedding only the chunks the store does not hold yet.
+
+    With ``replace_documents`` the stored ids are read first. Chunks already stored under
+    the same id (same text, position and embedding model) get zero placeholder rows,
+    which ``replace_document`` never writes.
+    """
+    if settings.replace_documents and chunks:
+        existing = set(client.document_ids(f.path))
+        fresh = [i for i, rid in enumerate(chunk_ids(chunks, fingerprint)) if rid not in existing]
+    else:
+        fresh = list(range(len(chunks)))
+    if len(fresh) == len(chunks):
+        return build_batch(chunks, embedder.embed_array([c.text for c in chunks]), fingerprint)
+    vectors = np.zeros((len(chunks), dims), dtype=np.float32)
+    if fresh:
+        vectors[fresh] = embedder.embed_array([chunks[i].text for i in fresh])
+    return build_batch(chunks, vectors, fingerprint)
+
+
+def _flush_after_error(client: VectorClient) -> bool:
+    """Make the writes that completed before a failure durable; ``False`` if that fails too."""
+    try:
+        client.flush()
+        return True
+    except Exception as exc:  # noqa: BLE001 - the original error is the one re-raised
+        log.warning(f"flush_after_error_failed error={exc}")
+        return False
+
+
+def _report_done(files: Iterable[DiscoveredFile], on_document_done: Optional[Callable[[DiscoveredFile], None]]) -> None:
+    if on_document_done:
+        for f in files:
+            on_document_done(f)
+
+
+def ingest_serial(
+    files: Iterable[DiscoveredFile],
+    cfg: Dict[str, Any],
+    embedder,
+    client: VectorClient,
+    settings: PipelineSettings,
+    prepare: Callable[..., List[Chunk]] = prepare_document,
+    on_document_done: Optional[Callable[[DiscoveredFile], None]] = None,
+    profiler=NULL_PROFILER,
+) -> int:
+    """One document at a time through convert/chunk -> embed -> upsert.
+
+    ``profiler`` (an ``IngestProfiler``) times every stage per document; ``prepare`` is
+    given it as a third argument when profiling. Clients may buffer writes until ``flush``,
+    so ``on_document_done`` is only called once a flush has made the documents durable:
+    at the end, or after a failure for the documents written before it. Returns the
+    number of chunks written.
+    """
+    total = 0
+    written: List[DiscoveredFile] = []
+    dims = embedder.embedding_dimensions()
+    fingerprint = document_fingerprint(cfg, dims)
+    try:
+        for f in files:
+            with profiler.document(f):
+                chunks = prepare(f, cfg, profiler) if profiler.enabled else prepare(f, cfg)
+                with profiler.stage("embed", items=len(chunks)) as counts:
+                    records = embed_document(f, chunks, embedder, client, settings, fingerprint, dims)
+                    if profiler.enabled:
+                        counts.bytes = sum(len(c.text.encode("utf-8")) for c in chunks)
+                with profiler.stage("upsert", items=len(chunks)) as counts:
+                    if settings.replace_documents:
+                        client.replace_document(f.path, records)
+                    else:
+                        client.upsert(records)
+                    if profiler.enabled:
+                        counts.bytes = int(records.vectors.nbytes) + sum(len(t.encode("utf-8")) for t in records.texts)
+            written.append(f)
+            total += len(chunks)
+    except BaseException:
+        if _flush_after_error(client):
+            _report_done(written, on_document_done)
+        raise
+    with profiler.stage("flush"):
+        client.flush()
+    _report_done(written, on_document_done)
+    return total
+
+
+def trace_slowest(profiler, cfg: Dict[str, Any], embedder, prepare: Callable[..., List[Chunk]] = prepare_document) -> None:
+    """Repeat convert/chunk/embed for the profiler's slowest documents under its tracers.
+
+    The timing pass has filled the conversion and embedding caches, so both are bypassed
+    here: the traces show the Docling conversion and provider calls that made those
+    documents slow, at the cost of converting and embedding them again. Nothing is
+    written to the store or the caches.
+    """
+    traced_cfg = {**cfg, "docling": {**(cfg.get("docling") or {}), "cache_converted": False}}
+
+    def run(f: DiscoveredFile) -> None:
+        chunks = prepare(f, traced_cfg, profiler)
+        with profiler.stage("embed", items=len(chunks)):
+            embedder.embed_array([c.text for c in chunks])
+
+    cache = getattr(embedder, "cache", None)
+    if cache is not None:
+        embedder.cache = None
+    try:
+        profiler.trace_slowest(run)
+    finally:
+        if cache is not None:
+            embedder.cache = cache
+
+
+def run_pipeline(
+    files: Iterable[DiscoveredFile],
+    cfg: Dict[str, Any],
+    embedder,
+    client: VectorClient,
+    settings: PipelineSettings,
+    prepare: Callable[[DiscoveredFile, Dict[str, Any]], List[Chunk]] = prepare_document,
+    on_document_done: Optional[Callable[[DiscoveredFile], None]] = None,
+) -> int:
+    """Run convert/chunk -> embed -> upsert as concurrent stages.
+
+    Conversion runs in a process pool, embedding in a thread pool and writes in a
+    single writer thread. Embeddings travel as columnar ``EmbeddingBatch``es. With
+    ``replace_documents`` the writer diffs each document against its stored chunks;
+    otherwise it batches plain upserts across documents.
+    Stages are linked by bounded queues, so a slow stage throttles the ones feeding it.
+    The first error in any stage stops the pipeline and is re-raised. The client is
+    flushed once all documents are written (after an error, once the writer has drained)
+    and only then is ``on_document_done`` called, from the writer thread, for every
+    document whose records were all handed to the client. Returns the number of chunks
+    written.
+    """
+    embed_q: "queue.Queue[Optional[Tuple[DiscoveredFile, List[Chunk]]]]" = queue.Queue(maxsize=settings.queue_size)
+    write_q: "queue.Queue[Optional[Tuple[DiscoveredFile, EmbeddingBatch]]]" = queue.Queue(maxsize=settings.queue_size)
+    errors: List[BaseException] = []
+    stop = threading.Event()
+    written = [0]
+    dims = embedder.embedding_dimensions()
+    fingerprint = document_fingerprint(cfg, dims)
+
+    def fail(exc: BaseException) -> None:
+        errors.append(exc)
+        stop.set()
+
+    def embed_worker() -> None:
+        # Keep draining after a failure so producers blocked on put() can finish
+        while True:
+            item = embed_q.get()
+            metrics.QUEUE_DEPTH.set(embed_q.qsize(), queue="embed")
+            if item is None:
+                return
+            if stop.is_set():
+                continue
+            f, chunks = item
+            try:
+                write_q.put((f, embed_document(f, chunks, embedder, client, settings, fingerprint, dims)))
+                metrics.QUEUE_DEPTH.set(write_q.qsize(), queue="write")
+            except BaseException as exc:  # noqa: BLE001 - surfaced to the caller
+                fail(exc)
+
+    def writer() -> None:
+        done: List[DiscoveredFile] = []
+        buffer: List[EmbeddingBatch] = []
+        # (file, running record count at the end of its records) in arrival order
+        pending_docs: "deque[Tuple[DiscoveredFile, int]]" = deque()
+        buffered = 0
+
+        def flush(batch: Optional[EmbeddingBatch]) -> None:
+            if batch:
+                client.upsert(batch)
+                written[0] += len(batch)
+            while pending_docs and pending_docs[0][1] <= written[0]:
+                done.append(pending_docs.popleft()[0])
+
+        while True:
+            item = write_q.get()
+            metrics.QUEUE_DEPTH.set(write_q.qsize(), queue="write")
+            if item is None:
+                break
+            if stop.is_set():
+                continue
+            f, records = item
+            if settings.replace_documents:
+                try:
+                    client.replace_document(f.path, records)
+                    written[0] += len(records)
+                    done.append(f)
+                except BaseException as exc:  # noqa: BLE001
+                    fail(exc)
+                continue
+            buffer.append(records)
+            buffered += len(records)
+            pending_docs.append((f, buffered))
+            try:
+                if sum(len(b) for b in buffer) >= settings.upsert_batch_size:
+                    merged = EmbeddingBatch.concat(buffer)
+                    size = settings.upsert_batch_size
+                    full = len(merged) - len(merged) % size
+                    for start in range(0, full, size):
+                        flush(merged[start : start + size])
+                    buffer = [merged[full:]]
+                if not any(len(b) for b in buffer):
+                    buffer = []
+                    flush(None)
+            except BaseException as exc:  # noqa: BLE001
+                fail(exc)
+        if stop.is_set():
+            # Records still in ``buffer`` are dropped; their documents are not reported
+            durable = _flush_after_error(client)
+        else:
+            try:
+                flush(EmbeddingBatch.concat(buffer) if buffer else None)
+                client.flush()
+                durable = True
+            except BaseException as exc:  # noqa: BLE001
+                fail(exc)
+                durable = False
+        if durable:
+            try:
+                _report_done(done, on_document_done)
+            except BaseException as exc:  # noqa: BLE001
+                fail(exc)
+
+    embed_threads = [
+        threading.Thread(target=embed_worker, name=f"ingest-embed-{i}", daemon=True) for i in range(settings.embed_workers)
+    ]
+    writer_thread = threading.Thread(target=writer, name="ingest-writer", daemon=True)
+    for t in embed_threads:
+        t.start()
+    writer_thread.start()
+
+    submitted: Dict[Future, DiscoveredFile] = {}
+
+    def forward(done: Set[Future]) -> None:
+        for fut in done:
+            f = submitted.pop(fut)
+            try:
+                chunks = fut.result()
+            except BaseException as exc:  # noqa: BLE001
+                fail(exc)
+                continue
+            embed_q.put((f, chunks))
+            metrics.QUEUE_DEPTH.set(embed_q.qsize(), queue="embed")
+
+    # Cap in-flight conversions so finished documents cannot pile up in memory
+    max_in_flight = max(1, settings.convert_workers) + settings.queue_size
+    try:
+        with ProcessPoolExecutor(max_workers=max(1, settings.convert_workers)) as pool:
+            pending: Set[Future] = set()
+            for f in files:
+                if stop.is_set():
+                    break
+                fut = pool.submit(prepare, f, cfg)
+                submitted[fut] = f
+                pending.add(fut)
+                if len(pending) >= max_in_flight:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    forward(done)
+            if stop.is_set():
+                for fut in pending:
+                    fut.cancel()
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                forward({fut for fut in done if not fut.cancelled()})
+    finally:
+        for _ in embed_threads:
+            embed_q.put(None)
+        for t in embed_threads:
+            t.join()
+        write_q.put(None)
+        writer_thread.join()
+
+    if errors:
+        raise errors[0]
+    log.info(
+        f"pipeline_complete chunks={written[0]} convert_workers={settings.convert_workers} "
+        f"embed_workers={settings.embed_workers} upsert_batch_size={settings.upsert_batch_size}"
+    )
+    return written[0]
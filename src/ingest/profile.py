@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import cProfile
+import heapq
+import itertools
+import json
+import re
+import resource
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from src.common.logging import get_logger
+from src.common.types import DiscoveredFile
+
+log = get_logger("ingest.profile")
+
+
+@dataclass
+class StageStats:
+    calls: int = 0
+    items: int = 0
+    bytes: int = 0
+    wall_s: float = 0.0
+    cpu_s: float = 0.0
+    peak_alloc_bytes: int = 0  # largest Python allocation growth within one call (traced pass only)
+
+    def to_dict(self) -> Dict[str, Any]:
+        out = asdict(self)
+        out["wall_s"] = round(self.wall_s, 6)
+        out["cpu_s"] = round(self.cpu_s, 6)
+        out["items_per_s"] = round(self.items / self.wall_s, 1) if self.wall_s > 0 else 0.0
+        out["mb_per_s"] = round(self.bytes / 1e6 / self.wall_s, 3) if self.wall_s > 0 else 0.0
+        return out
+
+
+class StageCounts:
+    """Handle yielded by ``stage``; set ``items``/``bytes`` once the work is known."""
+
+    __slots__ = ("items", "bytes")
+
+    def __init__(self, items: int = 0, nbytes: int = 0) -> None:
+        self.items = items
+        self.bytes = nbytes
+
+
+class IngestProfiler:
+    """Per-stage and per-document wall time, CPU time and item/byte counts.
+
+    ``stage`` blocks are totalled per stage name and, inside a ``document`` block, per
+    document as well. CPU time is the calling thread's, so stages must not overlap:
+    profile the serial ingest. The timing pass runs without tracers, so its numbers are
+    not inflated by them. ``trace_slowest`` then re-runs the ``top_n`` slowest documents
+    under cProfile and tracemalloc; that pass fills ``peak_alloc_bytes`` (Python heap
+    growth, per stage and per traced document) and ``write`` dumps its cProfile stats and
+    a tracemalloc snapshot (allocations still live at the end of the document) next to
+    ``profile.json``. Timings from the traced pass are reported separately.
+    """
+
+    enabled = True
+
+    def __init__(self, out_dir: str, top_n: int = 5) -> None:
+        self.out_dir = Path(out_dir)
+        self.top_n = max(0, int(top_n))
+        self.stages: Dict[str, StageStats] = {}
+        self.documents: List[Dict[str, Any]] = []
+        self._doc: Optional[Dict[str, Any]] = None
+        # Min-heap of (wall_s, seq, file) for the slowest documents of the timing pass
+        self._slowest: List[tuple] = []
+        # (path, cProfile, snapshot, report) per document of the traced pass
+        self._traced: List[tuple] = []
+        self._tracing = False
+        self._seq = itertools.count()
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str, items: int = 0, nbytes: int = 0) -> Iterator[StageCounts]:
+        counts = StageCounts(items, nbytes)
+        if self._tracing:
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield counts
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.thread_time() - cpu
+            if self._tracing:
+                peak = max(0, tracemalloc.get_traced_memory()[1] - base)
+                total = self.stages.setdefault(name, StageStats())
+                total.peak_alloc_bytes = max(total.peak_alloc_bytes, peak)
+                targets = [self._doc["stages"].setdefault(name, StageStats())] if self._doc is not None else []
+            else:
+                peak = 0
+                targets = [self.stages.setdefault(name, StageStats())]
+                if self._doc is not None:
+                    targets.append(self._doc["stages"].setdefault(name, StageStats()))
+            for s in targets:
+                s.calls += 1
+                s.items += counts.items
+                s.bytes += counts.bytes
+                s.wall_s += wall
+                s.cpu_s += cpu
+                s.peak_alloc_bytes = max(s.peak_alloc_bytes, peak)
+
+    @contextmanager
+    def document(self, f: DiscoveredFile) -> Iterator[None]:
+        doc: Dict[str, Any] = {"path": f.path, "bytes": f.size_bytes, "stages": {}}
+        self._doc = doc
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            doc["wall_s"] = time.perf_counter() - start
+            self._doc = None
+            self.documents.append(doc)
+            if self.top_n:
+                entry = (doc["wall_s"], next(self._seq), f)
+                if len(self._slowest) < self.top_n:
+                    heapq.heappush(self._slowest, entry)
+                elif doc["wall_s"] > self._slowest[0][0]:
+                    heapq.heapreplace(self._slowest, entry)
+
+    def slowest(self) -> List[DiscoveredFile]:
+        return [f for _, _, f in sorted(self._slowest, reverse=True)]
+
+    def trace_slowest(self, run: Callable[[DiscoveredFile], Any]) -> None:
+        """Re-run ``run(f)`` for each of the slowest documents under cProfile and tracemalloc.
+
+        ``run`` should repeat the document's work through ``stage`` blocks of this profiler
+        without writing anything; those blocks only feed the traced report.
+        """
+        owns_tracemalloc = not tracemalloc.is_tracing()
+        if owns_tracemalloc:
+            tracemalloc.start(25)
+        self._tracing = True
+        try:
+            for f in self.slowest():
+                doc: Dict[str, Any] = {"path": f.path, "bytes": f.size_bytes, "stages": {}}
+                self._doc = doc
+                profile = cProfile.Profile()
+                start = time.perf_counter()
+                profile.enable()
+                try:
+                    run(f)
+                finally:
+                    profile.disable()
+                    doc["wall_s"] = time.perf_counter() - start
+                    self._doc = None
+                self._traced.append((f.path, profile, tracemalloc.take_snapshot(), doc))
+        finally:
+            self._tracing = False
+            if owns_tracemalloc:
+                tracemalloc.stop()
+
+    def report(self) -> Dict[str, Any]:
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {
+            "wall_s": round(time.perf_counter() - self._started, 3),
+            # ru_maxrss is KiB on Linux, bytes on macOS
+            "peak_rss_mb": round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1),
+            "stages": {name: s.to_dict() for name, s in self.stages.items()},
+            "slowest": [f.path for f in self.slowest()],
+            "documents": [_document_report(d) for d in self.documents],
+            # Second run of the slowest documents; its timings include cProfile/tracemalloc overhead
+            "traced": [_document_report(d) for _, _, _, d in self._traced],
+        }
+
+    def write(self) -> str:
+        """Write ``profile.json`` plus ``slowest/NN_<file>.prof``/``.tracemalloc`` dumps."""
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        if self._traced:
+            dump_dir = self.out_dir / "slowest"
+            dump_dir.mkdir(exist_ok=True)
+            for rank, (path, profile, snapshot, _) in enumerate(self._traced, 1):
+                stem = f"{rank:02d}_{re.sub(r'[^A-Za-z0-9_.-]+', '_', Path(path).name)}"
+                profile.dump_stats(str(dump_dir / f"{stem}.prof"))
+                snapshot.dump(str(dump_dir / f"{stem}.tracemalloc"))
+        report = self.report()
+        path = self.out_dir / "profile.json"
+        path.write_text(json.dumps(report, indent=2))
+        for name, s in report["stages"].items():
+            log.info(
+                f"profile_stage name={name} calls={s['calls']} items={s['items']} bytes={s['bytes']} wall_s={s['wall_s']} "
+                f"cpu_s={s['cpu_s']} items_per_s={s['items_per_s']} peak_alloc_bytes={s['peak_alloc_bytes']}"
+            )
+        log.info(f"profile_written path={path} peak_rss_mb={report['peak_rss_mb']} slowest={report['slowest'][:3]}")
+        return str(path)
+
+    def close(self) -> None:
+        # Tracers only run inside trace_slowest, which stops them itself
+        self._traced.clear()
+
+
+def _document_report(doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {**doc, "wall_s": round(doc["wall_s"], 6), "stages": {n: s.to_dict() for n, s in doc["stages"].items()}}
+
+
+class _NullProfiler:
+    """Stand-in when profiling is off: every block is a shared no-op context."""
+
+    enabled = False
+    _stage = nullcontext(StageCounts())
+    _document = nullcontext()
+
+    def stage(self, name: str, items: int = 0, nbytes: int = 0):
+        return self._stage
+
+    def document(self, f: DiscoveredFile):
+        return self._document
+
+
+NULL_PROFILER = _NullProfiler()
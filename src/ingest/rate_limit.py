@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at ``per_minute`` tokens per minute.
+
+    ``acquire(n)`` blocks until ``n`` tokens are available. Requests larger than the bucket
+    are clamped to its capacity so they wait for a full bucket instead of forever.
+    ``pause(seconds)`` holds back every caller, e.g. to honor a server's ``Retry-After``.
+    """
+
+    def __init__(self, per_minute: float, clock=time.monotonic, sleep=time.sleep) -> None:
+        if per_minute <= 0:
+            raise ValueError("per_minute must be positive")
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, n: float = 1.0) -> float:
+        """Take ``n`` tokens, returning the seconds spent waiting."""
+        n = min(float(n), self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._refill(now)
+                delay = self._paused_until - now
+                if delay <= 0:
+                    if self._tokens >= n:
+                        self._tokens -= n
+                        return waited
+                    delay = (n - self._tokens) / self.rate
+            self._sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+
+def make_bucket(per_minute: Optional[float]) -> Optional[TokenBucket]:
+    return TokenBucket(float(per_minute)) if per_minute else None
@@ -1,65 +1,114 @@
 import argparse
-import os
-from pathlib import Path
 
+from src.common import metrics
 from src.common.config import load_config
 from src.common.logging import get_logger, setup_logging
-from src.ingest.convert_docling import convert_with_docling
 from src.ingest.discover import discover_files
-from src.ingest.chunk import chunk_document
-from src.ingest.embed import Embedder
-from src.ingest.upsert import build_records, make_vector_client
+from src.ingest.embed import make_embedder
+from src.ingest.manifest import IngestManifest, ingest_settings_key, manifest_path
+from src.ingest.pipeline import PipelineSettings, ingest_serial, run_pipeline, trace_slowest
+from src.ingest.profile import NULL_PROFILER, IngestProfiler
+from src.ingest.upsert import make_vector_client
+from src.search.query_cache import bump_generation
 
 
 def main() -> None:
     parser = argparse.ArgumentParser()
     parser.add_argument("--config", required=True)
+    parser.add_argument("--workers", type=int, default=None, help="convert/chunk processes; 0 runs the serial ingest")
+    parser.add_argument("--embed-workers", type=int, default=None)
+    parser.add_argument("--upsert-batch-size", type=int, default=None)
+    parser.add_argument("--queue-size", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="re-ingest files the manifest marks as unchanged")
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="ingest-profile",
+        default=None,
+        metavar="DIR",
+        help="time every stage per document (serial ingest) and write profile.json and dumps to DIR",
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=5,
+        help="slowest documents to re-run under cProfile/tracemalloc after the (untraced) timing pass; 0 disables",
+    )
     args = parser.parse_args()
 
     cfg = load_config(args.config)
     setup_logging(level=cfg.get("logging", {}).get("level", "INFO"), json_output=cfg.get("logging", {}).get("json", True))
     log = get_logger("ingest")
+    metrics.configure_metrics(cfg)
 
-    files = discover_files(
-        cfg["data"]["input_dir"],
-        cfg["data"].get("include_glob", []),
-        cfg["data"].get("exclude_glob", []),
-        cfg["data"].get("max_file_mb", 50),
-    )
+    icfg = cfg.setdefault("ingest", {})
+    for key, value in (
+        ("workers", args.workers),
+        ("embed_workers", args.embed_workers),
+        ("upsert_batch_size", args.upsert_batch_size),
+        ("queue_size", args.queue_size),
+    ):
+        if value is not None:
+            icfg[key] = value
+    settings = PipelineSettings.from_config(cfg)
+    profiler = IngestProfiler(args.profile, top_n=args.profile_top) if args.profile else NULL_PROFILER
+    if profiler.enabled and settings.convert_workers > 0:
+        # Concurrent stages would overlap and blur the per-stage numbers
+        log.info("profile mode runs the serial ingest")
+        settings.convert_workers = 0
+
+    manifest = IngestManifest(manifest_path(cfg)) if cfg["data"].get("manifest", True) else None
+    settings_key = ingest_settings_key(cfg)
+    with profiler.stage("discover") as counts:
+        files = discover_files(
+            cfg["data"]["input_dir"],
+            cfg["data"].get("include_glob", []),
+            cfg["data"].get("exclude_glob", []),
+            cfg["data"].get("max_file_mb", 50),
+            manifest=manifest,
+        )
+        counts.items, counts.bytes = len(files), sum(f.size_bytes for f in files)
     log.info(f"discovered_files={len(files)}")
+    if manifest and not args.force:
+        discovered = len(files)
+        files = [f for f in files if not manifest.is_ingested(f, settings_key)]
+        log.info(f"unchanged_files_skipped={discovered - len(files)}")
+    if not files:
+        if manifest:
+            manifest.close()
+        log.info("ingestion_complete total_chunks=0")
+        metrics.export_metrics(cfg, job="ingest")
+        return
 
-    embedder = Embedder(
-        provider=cfg["embeddings"]["provider"],
-        model=cfg["embeddings"]["model"],
-        batch_size=cfg["embeddings"].get("batch_size", 64),
-        timeout_s=cfg["embeddings"].get("request_timeout_s", 60),
-    )
+    def mark_done(f) -> None:
+        if manifest:
+            manifest.mark_ingested(f, settings_key)
+
+    embedder = make_embedder(cfg)
     dims = embedder.embedding_dimensions()
     client = make_vector_client(cfg)
     client.ensure_collection(cfg["vectordb"]["collection"], dims)
 
-    total_chunks = 0
-    for f in files:
-        dc = convert_with_docling(f.path, f.sha256, cfg)
-        chunks = chunk_document(dc, cfg["chunking"]["strategy"], cfg["chunking"]["max_tokens"], cfg["chunking"]["overlap_tokens"])
-        for ch in chunks:
-            ch.metadata.update(
-                {
-                    "source_path": f.path,
-                    "file_name": Path(f.path).name,
-                    "sha256": f.sha256,
-                    "doc_id": dc.doc_id,
-                }
-            )
-        vectors = embedder.embed_texts([c.text for c in chunks])
-        records = build_records(chunks, vectors)
-        client.upsert(records)
-        total_chunks += len(chunks)
+    if settings.convert_workers > 0:
+        total_chunks = run_pipeline(files, cfg, embedder, client, settings, on_document_done=mark_done)
+    else:
+        total_chunks = ingest_serial(files, cfg, embedder, client, settings, on_document_done=mark_done, profiler=profiler)
+    # Cached search results from before this run are stale now
+    log.info(f"collection_generation={bump_generation(cfg)}")
+    if manifest:
+        manifest.close()
+    stats = embedder.cache_stats()
+    if stats:
+        log.info(f"embedding_cache hits={stats['hits']} misses={stats['misses']} hit_rate={stats['hit_rate']} entries={stats['entries']}")
+    if profiler.enabled:
+        trace_slowest(profiler, cfg, embedder)
+        profiler.write()
+        profiler.close()
+    embedder.close()
 
     log.info(f"ingestion_complete total_chunks={total_chunks}")
+    metrics.export_metrics(cfg, job="ingest")
 
 
 if __name__ == "__main__":
     main()
-
-
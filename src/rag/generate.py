@@ -1,37 +1,18 @@
-from typing import Dict, List
+from functools import lru_cache
+from typing import AsyncIterator, Dict, Iterator, List, Optional
 
-from src.common.config import load_config
 from src.common.types import SearchResult
 from src.rag.assemble_prompt import assemble
+from src.rag.llm import LLMClient, get_llm, make_llm
+from src.rag.retrieve import Retriever, get_retriever
 
 
-def answer(question: str, contexts: List[SearchResult], cfg_path: str) -> Dict:
-    cfg = load_config(cfg_path)
-    prompt = assemble(contexts, question, max_context_chars=min(cfg["rag"].get("max_context_tokens", 4000) * 4, 16000))
-    try:
-        llm_provider = cfg["rag"]["llm_provider"]
-        if llm_provider == "openai":
-            from openai import OpenAI
-
-            client = OpenAI()
-            completion = client.chat.completions.create(
-                model=cfg["rag"]["llm_model"],
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.2,
-            )
-            text = completion.choices[0].message.content
-        else:
-            # Ollama fallback (simple HTTP call)
-            import httpx
-
-            base = "http://localhost:11434"
-            model = cfg["rag"]["llm_model"]
-            resp = httpx.post(f"{base}/api/generate", json={"model": model, "prompt": prompt, "stream": False}, timeout=60)
-            text = resp.json().get("response", "")
-    except Exception:
-        text = "[LLM unavailable]"
+def build_prompt(cfg: Dict, question: str, contexts: List[SearchResult]) -> str:
+    return assemble(contexts, question, max_context_chars=min(cfg["rag"].get("max_context_tokens", 4000) * 4, 16000))
 
-    sources = [
+
+def source_list(contexts: List[SearchResult]) -> List[Dict]:
+    return [
         {
             "id": r.id,
             "score": r.score,
@@ -40,7 +21,116 @@ def answer(question: str, contexts: List[SearchResult], cfg_path: str) -> Dict:
         }
         for r in contexts
     ]
+
+
+def _sources_event(contexts: List[SearchResult]) -> Dict:
+    return {"type": "sources", "sources": source_list(contexts), "confidence": contexts[0].score if contexts else 0.0}
+
+
+def stream_events(llm: LLMClient, prompt: str, contexts: List[SearchResult]) -> Iterator[Dict]:
+    """Answer events: ``sources`` (before any generation), one ``token`` per text delta, ``done``.
+
+    If the LLM fails, an ``error`` event replaces the remaining tokens.
+    """
+    yield _sources_event(contexts)
+    try:
+        for text in llm.stream(prompt):
+            yield {"type": "token", "text": text}
+    except Exception:
+        yield {"type": "error", "message": "LLM unavailable"}
+    yield {"type": "done"}
+
+
+async def astream_events(llm: LLMClient, prompt: str, contexts: List[SearchResult]) -> AsyncIterator[Dict]:
+    """Async ``stream_events`` for the API."""
+    yield _sources_event(contexts)
+    try:
+        async for text in llm.astream(prompt):
+            yield {"type": "token", "text": text}
+    except Exception:
+        yield {"type": "error", "message": "LLM unavailable"}
+    yield {"type": "done"}
+
+
+def _answer(text: str, contexts: List[SearchResult]) -> Dict:
     confidence = contexts[0].score if contexts else 0.0
-    return {"answer": text, "sources": sources, "confidence": confidence}
+    return {"answer": text, "sources": source_list(contexts), "confidence": confidence}
+
+
+class RagPipeline:
+    """Retrieval and generation over one long-lived ``Retriever`` and ``LLMClient``.
+
+    Shared by the CLIs, eval and the API so the config is read, the embedder loaded and
+    the LLM connection pool opened once per process instead of once per question.
+    """
+
+    def __init__(self, retriever: Retriever, llm: Optional[LLMClient] = None) -> None:
+        self.retriever = retriever
+        self.llm = llm or make_llm(retriever.cfg)
+
+    @classmethod
+    def from_path(cls, cfg_path: str) -> "RagPipeline":
+        return cls(Retriever.from_path(cfg_path))
+
+    @property
+    def cfg(self) -> Dict:
+        return self.retriever.cfg
+
+    def prompt(self, question: str, contexts: List[SearchResult]) -> str:
+        return build_prompt(self.cfg, question, contexts)
+
+    def warmup(self, embed: bool = True) -> None:
+        self.retriever.warmup(embed)
+
+    async def awarmup(self, embed: bool = True) -> None:
+        await self.retriever.awarmup(embed)
+
+    def generate(self, question: str, contexts: List[SearchResult]) -> Dict:
+        try:
+            text = self.llm.complete(self.prompt(question, contexts))
+        except Exception:
+            text = "[LLM unavailable]"
+        return _answer(text, contexts)
+
+    def generate_stream(self, question: str, contexts: List[SearchResult]) -> Iterator[Dict]:
+        return stream_events(self.llm, self.prompt(question, contexts), contexts)
+
+    async def agenerate(self, question: str, contexts: List[SearchResult]) -> Dict:
+        try:
+            text = await self.llm.acomplete(self.prompt(question, contexts))
+        except Exception:
+            text = "[LLM unavailable]"
+        return _answer(text, contexts)
+
+    def agenerate_stream(self, question: str, contexts: List[SearchResult]) -> AsyncIterator[Dict]:
+        return astream_events(self.llm, self.prompt(question, contexts), contexts)
+
+    def answer(self, question: str, top_k: int = 5, filters: Optional[Dict] = None) -> Dict:
+        return self.generate(question, self.retriever.retrieve(question, top_k, filters))
+
+    def answer_stream(self, question: str, top_k: int = 5, filters: Optional[Dict] = None) -> Iterator[Dict]:
+        return self.generate_stream(question, self.retriever.retrieve(question, top_k, filters))
+
+    def close(self) -> None:
+        self.llm.close()
+        self.retriever.close()
+
+    async def aclose(self) -> None:
+        await self.llm.aclose()
+        await self.retriever.aclose()
+
+
+@lru_cache(maxsize=None)
+def get_pipeline(cfg_path: str) -> RagPipeline:
+    """Process-wide pipeline for a config file, on the shared retriever and LLM client."""
+    retriever = get_retriever(cfg_path)
+    return RagPipeline(retriever, get_llm(retriever.cfg))
+
+
+def answer(question: str, contexts: List[SearchResult], cfg_path: str) -> Dict:
+    return get_pipeline(cfg_path).generate(question, contexts)
 
 
+def answer_stream(question: str, contexts: List[SearchResult], cfg_path: str) -> Iterator[Dict]:
+    """Streaming ``answer``: yields the events of ``stream_events``."""
+    return get_pipeline(cfg_path).generate_stream(question, contexts)
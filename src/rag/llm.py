@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+import httpx
+
+OLLAMA_URL = "http://localhost:11434"
+
+
+@dataclass(frozen=True)
+class LLMSettings:
+    """Generation model and connection pool settings (``rag`` section)."""
+
+    provider: str = "openai"  # openai|ollama
+    model: str = "gpt-4o-mini"
+    base_url: Optional[str] = None  # OpenAI-compatible endpoint or Ollama host
+    temperature: float = 0.2
+    timeout_s: float = 60.0
+    max_connections: int = 20
+    keepalive_s: float = 60.0
+
+    @classmethod
+    def from_config(cls, rcfg: Dict[str, Any]) -> "LLMSettings":
+        pool = rcfg.get("llm_pool", {}) or {}
+        return cls(
+            provider=rcfg.get("llm_provider", "openai"),
+            model=rcfg.get("llm_model", "gpt-4o-mini"),
+            base_url=rcfg.get("llm_base_url"),
+            temperature=float(rcfg.get("temperature", 0.2)),
+            timeout_s=float(rcfg.get("llm_timeout_s", 60)),
+            max_connections=int(pool.get("max_connections", 20)),
+            keepalive_s=float(pool.get("keepalive_s", 60)),
+        )
+
+
+def _sse_deltas(lines: Iterator[str]) -> Iterator[str]:
+    """Text deltas from OpenAI chat-completion SSE lines, consuming the body to its end."""
+    done = False
+    for line in lines:
+        if done or not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            done = True
+            continue
+        chunk = json.loads(data)
+        if chunk.get("error"):
+            raise RuntimeError(f"LLM stream error: {chunk['error']}")
+        for choice in chunk.get("choices") or []:
+            text = (choice.get("delta") or {}).get("content")
+            if text:
+                yield text
+
+
+class LLMClient:
+    """Completions from OpenAI or Ollama over long-lived, keep-alive connection pools.
+
+    The sync methods share one pool and the async ones another; clients are created on
+    first use (the async pool inside the running event loop) and reused for every later
+    call, so requests skip the TCP/TLS handshake. ``stream``/``astream`` yield text
+    deltas as the model produces them.
+    """
+
+    def __init__(self, settings: LLMSettings) -> None:
+        if settings.provider not in ("openai", "ollama"):
+            raise ValueError(f"Unknown llm provider: {settings.provider}")
+        self.settings = settings
+        self._lock = threading.Lock()
+        self._sync: Any = None
+        self._async: Any = None
+
+    def _limits(self) -> httpx.Limits:
+        s = self.settings
+        return httpx.Limits(max_connections=s.max_connections, max_keepalive_connections=s.max_connections, keepalive_expiry=s.keepalive_s)
+
+    def _messages(self, prompt: str) -> List[Dict[str, str]]:
+        return [{"role": "user", "content": prompt}]
+
+    def _ollama_body(self, prompt: str, stream: bool) -> Dict[str, Any]:
+        return {"model": self.settings.model, "prompt": prompt, "stream": stream, "options": {"temperature": self.settings.temperature}}
+
+    def _client(self):
+        with self._lock:
+            if self._sync is None:
+                s = self.settings
+                if s.provider == "openai":
+                    from openai import DefaultHttpxClient, OpenAI
+
+                    self._sync = OpenAI(
+                        api_key=os.getenv("OPENAI_API_KEY"),
+                        base_url=s.base_url or None,
+                        timeout=s.timeout_s,
+                        http_client=DefaultHttpxClient(limits=self._limits()),
+                    )
+                else:
+                    self._sync = httpx.Client(base_url=s.base_url or OLLAMA_URL, timeout=s.timeout_s, limits=self._limits())
+            return self._sync
+
+    def _aclient(self):
+        if self._async is None:
+            s = self.settings
+            if s.provider == "openai":
+                from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+                self._async = AsyncOpenAI(
+                    api_key=os.getenv("OPENAI_API_KEY"),
+                    base_url=s.base_url or None,
+                    timeout=s.timeout_s,
+                    http_client=DefaultAsyncHttpxClient(limits=self._limits()),
+                )
+            else:
+                self._async = httpx.AsyncClient(base_url=s.base_url or OLLAMA_URL, timeout=s.timeout_s, limits=self._limits())
+        return self._async
+
+    def complete(self, prompt: str) -> str:
+        client = self._client()
+        if self.settings.provider == "openai":
+            completion = client.chat.completions.create(
+                model=self.settings.model, messages=self._messages(prompt), temperature=self.settings.temperature
+            )
+            return completion.choices[0].message.content or ""
+        resp = client.post("/api/generate", json=self._ollama_body(prompt, stream=False))
+        resp.raise_for_status()
+        return resp.json().get("response", "")
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        client = self._client()
+        if self.settings.provider == "openai":
+            # The SDK's sync Stream closes the body unread after [DONE], which drops the
+            # keep-alive connection; reading the SSE lines to the end returns it to the pool.
+            with client.chat.completions.with_streaming_response.create(
+                model=self.settings.model, messages=self._messages(prompt), temperature=self.settings.temperature, stream=True
+            ) as resp:
+                yield from _sse_deltas(resp.iter_lines())
+            return
+        with client.stream("POST", "/api/generate", json=self._ollama_body(prompt, stream=True)) as resp:
+            resp.raise_for_status()
+            for line in resp.iter_lines():
+                if line:
+                    text = json.loads(line).get("response", "")
+                    if text:
+                        yield text
+
+    async def acomplete(self, prompt: str) -> str:
+        client = self._aclient()
+        if self.settings.provider == "openai":
+            completion = await client.chat.completions.create(
+                model=self.settings.model, messages=self._messages(prompt), temperature=self.settings.temperature
+            )
+            return completion.choices[0].message.content or ""
+        resp = await client.post("/api/generate", json=self._ollama_body(prompt, stream=False))
+        resp.raise_for_status()
+        return resp.json().get("response", "")
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        client = self._aclient()
+        if self.settings.provider == "openai":
+            chunks = await client.chat.completions.create(
+                model=self.settings.model, messages=self._messages(prompt), temperature=self.settings.temperature, stream=True
+            )
+            async with chunks:
+                async for chunk in chunks:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            return
+        async with client.stream("POST", "/api/generate", json=self._ollama_body(prompt, stream=True)) as resp:
+            resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                if line:
+                    text = json.loads(line).get("response", "")
+                    if text:
+                        yield text
+
+    def close(self) -> None:
+        with self._lock:
+            if self._sync is not None:
+                self._sync.close()
+            self._sync = None
+
+    async def aclose(self) -> None:
+        if self._async is not None:
+            await self._async.close() if self.settings.provider == "openai" else await self._async.aclose()
+        self._async = None
+
+
+def make_llm(cfg: Dict[str, Any]) -> LLMClient:
+    return LLMClient(LLMSettings.from_config(cfg.get("rag", {}) or {}))
+
+
+@lru_cache(maxsize=None)
+def _shared(settings: LLMSettings) -> LLMClient:
+    return LLMClient(settings)
+
+
+def get_llm(cfg: Dict[str, Any]) -> LLMClient:
+    """Process-wide client for these settings, so repeated calls reuse its connections."""
+    return _shared(LLMSettings.from_config(cfg.get("rag", {}) or {}))
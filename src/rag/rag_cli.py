@@ -1,7 +1,6 @@
 import argparse
 
-from src.rag.retrieve import retrieve
-from src.rag.generate import answer
+from src.rag.generate import RagPipeline
 
 
 def main() -> None:
@@ -9,10 +8,31 @@ def main() -> None:
     parser.add_argument("--config", required=True)
     parser.add_argument("--query", required=True)
     parser.add_argument("--top_k", type=int, default=5)
+    parser.add_argument("--stream", action="store_true", help="print the answer as it is generated")
     args = parser.parse_args()
 
-    results = retrieve(args.query, args.config, args.top_k, None)
-    res = answer(args.query, results, args.config)
+    pipeline = RagPipeline.from_path(args.config)
+    try:
+        _run(pipeline, args)
+    finally:
+        pipeline.close()
+
+
+def _run(pipeline: RagPipeline, args: argparse.Namespace) -> None:
+    if args.stream:
+        for event in pipeline.answer_stream(args.query, args.top_k):
+            if event["type"] == "sources":
+                print("Sources:")
+                for s in event["sources"]:
+                    print(f"- {s['source_path']} ({s['section_path']}) score={s['score']:.3f}")
+                print()
+            elif event["type"] == "token":
+                print(event["text"], end="", flush=True)
+            elif event["type"] == "error":
+                print("[LLM unavailable]", end="")
+        print()
+        return
+    res = pipeline.answer(args.query, args.top_k)
     print(res["answer"])
     print("\nSources:")
     for s in res["sources"]:
@@ -1,23 +1,137 @@
-from typing import Dict, List, Optional
+from __future__ import annotations
+
+import asyncio
+import threading
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence
 
 from src.common.config import load_config
-from src.ingest.embed import Embedder
-from src.ingest.upsert import make_vector_client
+from src.common.logging import get_logger
 from src.common.types import SearchResult
+from src.ingest.embed import Embedder, make_embedder
+from src.ingest.upsert import AsyncVectorClient, VectorClient, make_async_vector_client, make_vector_client
 
+log = get_logger("rag.retrieve")
 
-def retrieve(query: str, cfg_path: str, top_k: int, filters: Optional[Dict]) -> List[SearchResult]:
-    cfg = load_config(cfg_path)
-    embedder = Embedder(
-        provider=cfg["embeddings"]["provider"],
-        model=cfg["embeddings"]["model"],
-        batch_size=cfg["embeddings"].get("batch_size", 64),
-        timeout_s=cfg["embeddings"].get("request_timeout_s", 60),
-    )
-    dims = embedder.embedding_dimensions()
-    client = make_vector_client(cfg)
-    client.ensure_collection(cfg["vectordb"]["collection"], dims)
-    qvec = embedder.embed_texts([query])[0]
-    return client.search(qvec, top_k, filters)
 
+class Retriever:
+    """Long-lived config, embedder and vector clients for answering many queries.
+
+    The embedder (for ``huggingface``, the loaded model) and the vector client are built
+    once, on ``warmup`` or first use, and ``ensure_collection`` runs once rather than per
+    query. ``aretrieve`` goes through a separate pooled async client for event-loop
+    callers such as the API. Build one per process, share it, and ``close`` it at exit.
+    """
+
+    def __init__(
+        self,
+        cfg: Dict[str, Any],
+        embedder: Optional[Embedder] = None,
+        client: Optional[VectorClient] = None,
+        async_client: Optional[AsyncVectorClient] = None,
+    ) -> None:
+        self.cfg = cfg
+        self.collection = cfg["vectordb"]["collection"]
+        self._embedder = embedder
+        self._client = client
+        self._aclient = async_client
+        self._ready = False
+        self._aready = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_path(cls, cfg_path: str) -> "Retriever":
+        return cls(load_config(cfg_path))
+
+    @property
+    def embedder(self) -> Embedder:
+        with self._lock:
+            if self._embedder is None:
+                self._embedder = make_embedder(self.cfg)
+            return self._embedder
+
+    @property
+    def dims(self) -> int:
+        return self.embedder.embedding_dimensions()
+
+    @property
+    def client(self) -> VectorClient:
+        """Sync client; the collection is ensured on first access."""
+        dims = self.dims
+        with self._lock:
+            if self._client is None:
+                self._client = make_vector_client(self.cfg)
+            if not self._ready:
+                self._client.ensure_collection(self.collection, dims)
+                self._ready = True
+            return self._client
+
+    @property
+    def aclient(self) -> AsyncVectorClient:
+        """Async client, opened and ensured by ``awarmup``."""
+        with self._lock:
+            if self._aclient is None:
+                self._aclient = make_async_vector_client(self.cfg)
+            return self._aclient
+
+    def _warm_embed(self) -> None:
+        # The first encode pays for lazy model/runtime initialization (or the TLS handshake)
+        try:
+            self.embedder.embed_texts(["warmup"])
+        except Exception as exc:  # noqa: BLE001 - a cold first query beats a failed startup
+            log.warning(f"embedder warmup failed: {exc}")
+
+    def warmup(self, embed: bool = True) -> None:
+        """Load the embedder, connect and ensure the collection before the first query."""
+        self.client  # builds the embedder and client and ensures the collection
+        if embed:
+            self._warm_embed()
 
+    async def awarmup(self, embed: bool = True) -> None:
+        """``warmup`` for the async client; call from inside the running event loop."""
+        client = self.aclient
+        if not self._aready:
+            await client.open()
+            await client.ensure_collection(self.collection, self.dims)
+            self._aready = True
+        if embed:
+            await asyncio.to_thread(self._warm_embed)
+
+    def retrieve(self, query: str, top_k: int, filters: Optional[Dict] = None, hybrid: bool = True) -> List[SearchResult]:
+        qvec = self.embedder.embed_texts([query])[0]
+        return self.client.search(qvec, top_k, filters, query_text=query if hybrid else None)
+
+    def retrieve_batch(
+        self, queries: Sequence[str], top_k: int, filters: Optional[Dict] = None, hybrid: bool = True
+    ) -> List[List[SearchResult]]:
+        """Several queries with one embedding call and one ``search_batch`` round trip."""
+        qvecs = self.embedder.embed_texts(list(queries))
+        return self.client.search_batch(qvecs, top_k, filters, query_texts=list(queries) if hybrid else None)
+
+    async def aretrieve(self, query: str, top_k: int, filters: Optional[Dict] = None, hybrid: bool = True) -> List[SearchResult]:
+        qvec = (await asyncio.to_thread(self.embedder.embed_texts, [query]))[0]
+        return await self.aclient.search(qvec, top_k, filters, query_text=query if hybrid else None)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+            if self._embedder is not None:
+                self._embedder.close()
+            self._client, self._embedder, self._ready = None, None, False
+
+    async def aclose(self) -> None:
+        if self._aclient is not None:
+            await self._aclient.close()
+        self._aclient, self._aready = None, False
+        await asyncio.to_thread(self.close)
+
+
+@lru_cache(maxsize=None)
+def get_retriever(cfg_path: str) -> Retriever:
+    """Process-wide retriever for a config file (read once), shared by the function API."""
+    return Retriever.from_path(cfg_path)
+
+
+def retrieve(query: str, cfg_path: str, top_k: int, filters: Optional[Dict]) -> List[SearchResult]:
+    return get_retriever(cfg_path).retrieve(query, top_k, filters)
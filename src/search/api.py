@@ -1,37 +1,104 @@
-from fastapi import FastAPI
+import asyncio
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 
+from src.common import metrics
 from src.common.config import load_config
-from src.ingest.embed import Embedder
-from src.ingest.upsert import make_vector_client
-
-
-app = FastAPI()
+from src.common.logging import end_trace, get_logger, setup_logging, span, start_trace
+from src.rag.generate import RagPipeline
+from src.rag.retrieve import Retriever
+from src.search.batcher import make_embedding_batcher
+from src.search.query_cache import make_query_cache
 
 
 class SearchRequest(BaseModel):
     query: str
     top_k: int = 5
     filters: dict | None = None
+    params: dict | None = None
+    # Hybrid (dense + lexical) retrieval applies when enabled by search.hybrid; false forces dense-only
+    hybrid: bool = True
+
+
+class BatchSearchRequest(BaseModel):
+    queries: list[str]
+    top_k: int = 5
+    filters: dict | None = None
+    params: dict | None = None
+    hybrid: bool = True
 
 
 class RagRequest(BaseModel):
     query: str
     top_k: int = 5
+    # Server-sent events: sources first, then the answer token by token
+    stream: bool = False
 
 
-import os
 _cfg_path = os.getenv("CONFIG_PATH", "configs/default.yaml")
 _cfg = load_config(_cfg_path)
-_embedder = Embedder(
-    provider=_cfg["embeddings"]["provider"],
-    model=_cfg["embeddings"]["model"],
-    batch_size=_cfg["embeddings"].get("batch_size", 64),
-    timeout_s=_cfg["embeddings"].get("request_timeout_s", 60),
-)
-_dims = _embedder.embedding_dimensions()
-_client = make_vector_client(_cfg)
-_client.ensure_collection(_cfg["vectordb"]["collection"], _dims)
+_metrics = metrics.configure_metrics(_cfg)
+_tracing = bool((_cfg.get("observability", {}) or {}).get("tracing", False))
+if _tracing:
+    setup_logging(level=_cfg.get("logging", {}).get("level", "INFO"), json_output=_cfg.get("logging", {}).get("json", True))
+log = get_logger("search.api")
+# The same retriever/pipeline objects the CLIs and eval use; the LLM keep-alive pool is
+# shared by all /rag requests
+_pipeline = RagPipeline(Retriever(_cfg))
+_embedder = _pipeline.retriever.embedder
+_dims = _pipeline.retriever.dims
+# Pooled, awaitable client so concurrent requests don't serialize on one connection
+_client = _pipeline.retriever.aclient
+_cache = make_query_cache(_cfg, _dims)
+# Concurrent requests share one embedding call instead of one provider request each
+_batcher = make_embedding_batcher(_cfg, _embedder.embed_texts)
+
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    # Opens the pool, ensures the collection and runs one embedding before serving traffic
+    await _pipeline.awarmup()
+    yield
+    if _batcher:
+        await _batcher.close()
+    await _pipeline.aclose()
+
+
+app = FastAPI(lifespan=_lifespan)
+
+
+async def _observe(request: Request, call_next):
+    trace, token = start_trace(request.headers.get("x-request-id"))
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Request-ID"] = trace.request_id
+        return response
+    finally:
+        elapsed = time.perf_counter() - start
+        # Label by route template, not raw path, to keep the series bounded
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        metrics.HTTP_REQUESTS.inc(route=route, method=request.method, status=status)
+        metrics.HTTP_SECONDS.observe(elapsed, route=route)
+        if _tracing:
+            log.info(
+                f"request_complete method={request.method} route={route} status={status} ms={elapsed * 1000:.1f}",
+                extra={"fields": {"route": route, "status": status, "ms": round(elapsed * 1000, 3), "spans": trace.span_ms()}},
+            )
+        end_trace(token)
+
+
+# Registered only when enabled, so a disabled deployment pays nothing per request
+if _metrics or _tracing:
+    app.middleware("http")(_observe)
 
 
 @app.get("/health")
@@ -39,10 +106,88 @@ def health():
     return {"status": "ok"}
 
 
-@app.post("/search")
-def search(req: SearchRequest):
-    qvec = _embedder.embed_texts([req.query])[0]
-    res = _client.search(qvec, req.top_k, req.filters)
+if _metrics:
+
+    @app.get("/metrics")
+    def prometheus_metrics():
+        return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    stats = _cache.stats() if _cache else {"enabled": False}
+    if _batcher:
+        stats["batching"] = _batcher.stats()
+    return stats
+
+
+async def _query_vector(query: str):
+    with span("embed"):
+        return await _embed_query(query)
+
+
+async def _embed_query(query: str):
+    if _cache:
+        qvec = _cache.get_vector(query)
+        if qvec is not None:
+            return qvec
+    if _batcher:
+        qvec = await _batcher.embed(query)
+    else:
+        qvec = (await asyncio.to_thread(_embedder.embed_texts, [query]))[0]
+    if _cache:
+        _cache.put_vector(query, qvec)
+    return qvec
+
+
+async def _search(qvec, top_k: int, filters, params=None, query_text=None):
+    with span("search"):
+        return await _cached_search(qvec, top_k, filters, params, query_text)
+
+
+async def _cached_search(qvec, top_k: int, filters, params=None, query_text=None):
+    if not _cache:
+        return await _client.search(qvec, top_k, filters, params, query_text=query_text)
+    key = _cache.result_key(qvec, top_k, filters, params, query_text)
+    res = _cache.get_results(key)
+    if res is None:
+        res = await _client.search(qvec, top_k, filters, params, query_text=query_text)
+        _cache.put_results(key, res)
+    return res
+
+
+def _server_timing(**stages: float) -> str:
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in stages.items())
+
+
+async def _query_vectors(queries: list[str]) -> list:
+    """Vectors for ``queries``, embedding every cache miss in a single call."""
+    vectors = [_cache.get_vector(q) if _cache else None for q in queries]
+    missing = list(dict.fromkeys(q for q, v in zip(queries, vectors) if v is None))
+    if missing:
+        fresh = dict(zip(missing, await asyncio.to_thread(_embedder.embed_texts, missing)))
+        if _cache:
+            for q, v in fresh.items():
+                _cache.put_vector(q, v)
+        vectors = [v if v is not None else fresh[q] for q, v in zip(queries, vectors)]
+    return vectors
+
+
+async def _search_batch(qvecs: list, top_k: int, filters, params=None, query_texts=None) -> list:
+    texts = query_texts or [None] * len(qvecs)
+    keys = [_cache.result_key(v, top_k, filters, params, t) for v, t in zip(qvecs, texts)] if _cache else None
+    results = [_cache.get_results(k) for k in keys] if _cache else [None] * len(qvecs)
+    todo = [i for i, r in enumerate(results) if r is None]
+    if todo:
+        fresh = await _client.search_batch([qvecs[i] for i in todo], top_k, filters, params, [texts[i] for i in todo])
+        for i, res in zip(todo, fresh):
+            results[i] = res
+            if _cache:
+                _cache.put_results(keys[i], res)
+    return results
+
+
+def _hits(res) -> list:
     return [
         {
             "id": r.id,
@@ -54,36 +199,51 @@ def search(req: SearchRequest):
     ]
 
 
-@app.post("/rag")
-def rag(req: RagRequest):
-    qvec = _embedder.embed_texts([req.query])[0]
-    res = _client.search(qvec, req.top_k, None)
-    context = "\n\n".join([r.text for r in res])[:4000]
-    try:
-        from openai import OpenAI
-
-        client = OpenAI()
-        completion = client.chat.completions.create(
-            model=_cfg["rag"]["llm_model"],
-            messages=[
-                {"role": "system", "content": "Answer using only provided context. Cite sources."},
-                {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {req.query}"},
-            ],
-            temperature=0.2,
-        )
-        answer = completion.choices[0].message.content
-    except Exception:
-        answer = "[LLM unavailable]"
+@app.post("/search")
+async def search(req: SearchRequest, response: Response):
+    start = time.perf_counter()
+    qvec = await _query_vector(req.query)
+    embedded = time.perf_counter()
+    res = await _search(qvec, req.top_k, req.filters, req.params, query_text=req.query if req.hybrid else None)
+    retrieved = time.perf_counter()
+    response.headers["Server-Timing"] = _server_timing(embed=embedded - start, retrieve=retrieved - embedded, total=retrieved - start)
+    return _hits(res)
+
+
+@app.post("/search/batch")
+async def search_batch(req: BatchSearchRequest, response: Response):
+    """Several queries at once: one embedding call and one vector-store round trip."""
+    start = time.perf_counter()
+    with span("embed"):
+        qvecs = await _query_vectors(req.queries)
+    embedded = time.perf_counter()
+    texts = req.queries if req.hybrid else None
+    with span("search"):
+        res = await _search_batch(qvecs, req.top_k, req.filters, req.params, texts)
+    retrieved = time.perf_counter()
+    response.headers["Server-Timing"] = _server_timing(embed=embedded - start, retrieve=retrieved - embedded, total=retrieved - start)
+    return [_hits(r) for r in res]
 
-    sources = [
-        {
-            "id": r.id,
-            "score": r.score,
-            "source_path": r.metadata.get("source_path"),
-            "section_path": r.metadata.get("section_path"),
-        }
-        for r in res
-    ]
-    return {"answer": answer, "sources": sources}
 
+def _sse(event: dict) -> str:
+    data = {k: v for k, v in event.items() if k != "type"}
+    return f"event: {event['type']}\ndata: {json.dumps(data)}\n\n"
 
+
+async def _rag_stream(question: str, res):
+    async for event in _pipeline.agenerate_stream(question, res):
+        yield _sse(event)
+
+
+@app.post("/rag")
+async def rag(req: RagRequest):
+    qvec = await _query_vector(req.query)
+    res = await _search(qvec, req.top_k, None, query_text=req.query)
+    if req.stream:
+        # no-cache / no proxy buffering so events reach the client as they are produced
+        return StreamingResponse(
+            _rag_stream(req.query, res), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    with span("generate"):
+        answer = await _pipeline.agenerate(req.query, res)
+    return {"answer": answer["answer"], "sources": answer["sources"]}
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from src.common import metrics
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent query embeddings into one ``embed_fn`` call.
+
+    Each ``embed(text)`` joins the pending batch; the batch is sent once it holds
+    ``max_batch`` texts or ``max_wait_ms`` after its first text arrived, whichever comes
+    first. ``embed_fn`` runs in a worker thread and the vectors are handed back to the
+    waiting callers; identical texts in one batch are embedded once. A failed call fails
+    every request in that batch. Must be used from a single event loop.
+    """
+
+    def __init__(self, embed_fn: Callable[[List[str]], Sequence[Any]], max_batch: int = 32, max_wait_ms: float = 2.0) -> None:
+        self.embed_fn = embed_fn
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait_s = max(0.0, float(max_wait_ms)) / 1000.0
+        self.batches = 0
+        self.items = 0
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set = set()
+
+    async def embed(self, text: str) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        metrics.QUEUE_DEPTH.set(len(self._pending), queue="query_embed")
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_s, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        metrics.QUEUE_DEPTH.set(0, queue="query_embed")
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._run(batch))
+            # Keep a reference so the task isn't garbage-collected mid-flight
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        self.batches += 1
+        self.items += len(batch)
+        metrics.QUERY_BATCH_SIZE.observe(len(texts))
+        try:
+            vectors = await asyncio.to_thread(self.embed_fn, texts)
+        except Exception as exc:  # noqa: BLE001 - handed to every waiter
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        by_text = dict(zip(texts, vectors))
+        for text, future in batch:
+            # Callers that gave up (cancelled requests) are skipped
+            if not future.done():
+                future.set_result(by_text[text])
+
+    async def close(self) -> None:
+        """Send anything still pending and wait for in-flight batches."""
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait_s * 1000.0,
+        }
+
+
+def make_embedding_batcher(cfg: Dict[str, Any], embed_fn: Callable[[List[str]], Sequence[Any]]) -> Optional[EmbeddingBatcher]:
+    bcfg = cfg.get("search", {}).get("batching", {}) or {}
+    if not bcfg.get("enabled", False):
+        return None
+    return EmbeddingBatcher(embed_fn, max_batch=int(bcfg.get("max_batch", 32)), max_wait_ms=float(bcfg.get("max_wait_ms", 2.0)))
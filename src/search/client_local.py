@@ -0,0 +1,738 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.common.logging import get_logger
+from src.common.types import EmbeddingBatch, SearchResult, as_float32_matrix
+from src.ingest.upsert import Records, VectorClient, diff_document
+from src.search.hybrid import HybridSettings, rrf_fuse, tokenize
+
+
+log = get_logger("search.local")
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS points (
+    slot INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    text TEXT NOT NULL,
+    source_path TEXT,
+    file_name TEXT,
+    section_path TEXT,
+    doc_id TEXT,
+    sha256 TEXT,
+    metadata TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS points_source_path ON points (source_path);
+CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+# External-content FTS5 index over points.text, kept in sync by triggers
+FTS_SQL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS points_fts USING fts5(text, content='points', content_rowid='slot');
+CREATE TRIGGER IF NOT EXISTS points_fts_insert AFTER INSERT ON points BEGIN
+    INSERT INTO points_fts(rowid, text) VALUES (new.slot, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS points_fts_delete AFTER DELETE ON points BEGIN
+    INSERT INTO points_fts(points_fts, rowid, text) VALUES ('delete', old.slot, old.text);
+END;
+CREATE TRIGGER IF NOT EXISTS points_fts_update AFTER UPDATE OF text ON points BEGIN
+    INSERT INTO points_fts(points_fts, rowid, text) VALUES ('delete', old.slot, old.text);
+    INSERT INTO points_fts(rowid, text) VALUES (new.slot, new.text);
+END;
+"""
+
+# Metadata fields stored as columns; other filter keys are matched inside the JSON metadata
+COLUMNS = ("source_path", "file_name", "section_path", "doc_id", "sha256")
+
+# SQLite's bound-parameter limit is 999 on older builds
+_PARAM_CHUNK = 500
+
+
+@dataclass
+class LocalSettings:
+    """Storage layout and search defaults for the ``local`` provider (``vectordb.local``)."""
+
+    path: str = ".cache/vectordb"
+    segment_rows: int = 65536  # rows per append-only vector segment file
+    index: str = "flat"  # flat (exact) | ivf (partitioned, trained by reindex)
+    nlist: Any = "auto"  # ivf lists; auto = sqrt(rows)
+    nprobe: int = 8  # lists scanned per query; per-query override via params
+    train_size: int = 50000  # vectors sampled to train the ivf centroids
+    kmeans_iters: int = 10
+
+    @classmethod
+    def from_config(cls, lcfg: Optional[Dict[str, Any]]) -> "LocalSettings":
+        lcfg = lcfg or {}
+        settings = cls(**{k: v for k, v in lcfg.items() if k in cls.__dataclass_fields__})
+        if settings.index not in ("flat", "ivf"):
+            raise ValueError(f"Unknown local index type: {settings.index}")
+        return settings
+
+    def list_count(self, rows: int) -> int:
+        if self.nlist != "auto":
+            return max(1, min(int(self.nlist), rows))
+        return max(1, min(int(np.sqrt(rows)), rows))
+
+
+def _normalized(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+def _kmeans(x: np.ndarray, k: int, iters: int, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on unit vectors; returns unit-norm centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = x[rng.choice(len(x), k, replace=False)].copy()
+    for _ in range(iters):
+        assign = np.argmax(x @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, x)
+        filled = np.bincount(assign, minlength=k) > 0
+        # Empty lists keep their previous centroid
+        centroids[filled] = _normalized(sums[filled])
+    return centroids
+
+
+def _top(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the ``k`` largest scores, best first."""
+    if len(scores) > k:
+        idx = np.argpartition(-scores, k - 1)[:k]
+    else:
+        idx = np.arange(len(scores))
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+
+def _close_synced(f) -> None:
+    f.flush()
+    os.fsync(f.fileno())
+    f.close()
+
+
+def _staged_or(path: Path) -> Path:
+    staged = path.with_name(path.name + ".compact")
+    return staged if staged.exists() else path
+
+
+class _Segment:
+    """One append-only segment: ``seg-N.f32`` vectors, ``seg-N.live`` flags, ``seg-N.list`` ivf lists."""
+
+    def __init__(self, base: Path, dims: int) -> None:
+        self.base = base
+        self.dims = dims
+        self.rows = 0
+        self.vectors: Optional[np.ndarray] = None
+        self.live: Optional[np.ndarray] = None
+        self.lists: Optional[np.ndarray] = None
+
+    def file(self, suffix: str) -> Path:
+        return self.base.with_suffix(suffix)
+
+    def load(self, repair: bool = True, staged: bool = False) -> None:
+        """(Re)map the segment files; a torn trailing row from a crash is dropped.
+
+        ``repair=False`` remaps files another process may be appending to: only rows
+        complete in every file are mapped and nothing is truncated. ``staged`` reads the
+        files of a committed compaction under their ``.compact`` names until renamed.
+        """
+        vec_path, live_path = self.file(".f32"), self.file(".live")
+        if staged:
+            vec_path, live_path = (_staged_or(path) for path in (vec_path, live_path))
+        self.rows = os.path.getsize(vec_path) // (4 * self.dims) if vec_path.exists() else 0
+        live_size = os.path.getsize(live_path) if live_path.exists() else 0
+        if not repair:
+            self.rows = min(self.rows, live_size)
+        else:
+            for suffix, itemsize in ((".f32", 4 * self.dims), (".live", 1), (".list", 4)):
+                path = self.file(suffix)
+                if path.exists() and os.path.getsize(path) > self.rows * itemsize:
+                    os.truncate(path, self.rows * itemsize)
+            if live_size < self.rows:
+                with open(live_path, "ab") as f:
+                    f.write(bytes(self.rows - live_size))
+        if not self.rows:
+            self.vectors = np.empty((0, self.dims), dtype=np.float32)
+            self.live = np.zeros(0, dtype=np.uint8)
+            self.lists = None
+            return
+        self.vectors = np.memmap(vec_path, dtype=np.float32, mode="r", shape=(self.rows, self.dims))
+        self.live = np.memmap(live_path, dtype=np.uint8, mode="r+", shape=(self.rows,))
+        # A compaction's staged rows have no ivf lists yet
+        list_path = self.file(".list")
+        complete = not staged and list_path.exists() and os.path.getsize(list_path) >= 4 * self.rows
+        self.lists = np.memmap(list_path, dtype=np.int32, mode="r", shape=(self.rows,)) if complete else None
+
+    def append(self, vectors: np.ndarray, lists: Optional[np.ndarray]) -> None:
+        # Rows are appended dead; they become visible once their metadata is committed
+        with open(self.file(".f32"), "ab") as f:
+            vectors.tofile(f)
+        with open(self.file(".live"), "ab") as f:
+            f.write(bytes(len(vectors)))
+        list_path = self.file(".list")
+        if lists is not None and (list_path.exists() or self.rows == 0):
+            with open(list_path, "ab") as f:
+                lists.astype(np.int32).tofile(f)
+        self.load()
+
+
+class LocalVectorClient(VectorClient):
+    """In-process vector store: no server needed (dev boxes, CI, edge deployments).
+
+    Layout under ``<path>/<collection>/``: vectors are unit-normalized float32 rows in
+    append-only segment files of ``segment_rows`` rows, memory-mapped for search, so opening
+    a collection costs no load time. Each row (slot) has a liveness flag; an upsert appends
+    new slots and retires the old ones, and a delete only clears flags. Text and metadata
+    live in SQLite (``meta.sqlite``), keyed by slot, which also serves filters.
+
+    Search is exact cosine scoring, one BLAS matrix product per segment. With
+    ``index: ivf``, ``reindex()`` trains spherical k-means centroids and partitions the rows
+    into lists; queries then score only the ``nprobe`` nearest lists (``params`` may pass
+    ``nprobe`` or ``exact``). Rows added after training are assigned to a list on write.
+    With ``search.hybrid`` an FTS5 index over the text supplies BM25 candidates that are
+    fused with the dense ones by RRF.
+
+    Other processes may open the same collection: writes that change the segment layout
+    (appends, compaction, ivf training) bump a ``generation`` setting, and every search
+    or write first remaps the segments if it moved.
+    """
+
+    def __init__(
+        self,
+        collection: str,
+        dims: int,
+        settings: Optional[Dict[str, Any]] = None,
+        hybrid: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.collection = collection
+        self.dims = dims
+        self.settings = LocalSettings.from_config(settings)
+        self.hybrid = HybridSettings.from_config(hybrid)
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._segments: List[_Segment] = []
+        self._centroids: Optional[np.ndarray] = None
+        self._dir = Path(self.settings.path) / collection
+        # reindex and search work on an existing collection without ensure_collection
+        if (self._dir / "meta.sqlite").exists():
+            self._open(collection, dims)
+
+    # -- storage ---------------------------------------------------------------------
+
+    def _open(self, name: str, dims: int) -> None:
+        self._dir = Path(self.settings.path) / name
+        self._dir.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self._dir / "meta.sqlite", check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA_SQL)
+        row = conn.execute("SELECT value FROM settings WHERE key = 'dims'").fetchone()
+        if row is None:
+            if not dims:
+                raise ValueError(f"collection {name} does not exist yet; dims are required to create it")
+            with conn:
+                conn.execute("INSERT INTO settings (key, value) VALUES ('dims', ?)", (str(int(dims)),))
+        elif dims and int(row[0]) != int(dims):
+            raise ValueError(f"collection {name} has {row[0]} dims, got {dims}")
+        self.dims = int(row[0]) if row is not None else int(dims)
+        # Slot numbering depends on the segment size the collection was created with
+        row = conn.execute("SELECT value FROM settings WHERE key = 'segment_rows'").fetchone()
+        if row is None:
+            with conn:
+                conn.execute("INSERT INTO settings (key, value) VALUES ('segment_rows', ?)", (str(int(self.settings.segment_rows)),))
+        self._segment_rows = int(row[0]) if row is not None else int(self.settings.segment_rows)
+        if self.hybrid.enabled:
+            fresh = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'points_fts'").fetchone() is None
+            conn.executescript(FTS_SQL)
+            if fresh:
+                # Index rows written while hybrid search was off
+                with conn:
+                    conn.execute("INSERT INTO points_fts(points_fts) VALUES ('rebuild')")
+        self._hybrid_ready = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'points_fts'").fetchone() is not None
+        self._conn = conn
+        row = conn.execute("SELECT value FROM settings WHERE key = 'compaction'").fetchone()
+        if row is not None:
+            log.warning(f"collection {name}: finishing an interrupted compaction")
+            self._finish_compaction(conn, int(row[0]))
+        else:
+            # Segments staged by a compaction that never committed
+            for path in self._dir.glob("seg-*.compact"):
+                path.unlink()
+        self._data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        self._generation = self._generation_of(conn)
+        self._segments, self._centroids = self._map_layout(conn)
+        self._reconcile()
+
+    def _segment(self, number: int, repair: bool = True, staged: bool = False) -> _Segment:
+        segment = _Segment(self._dir / f"seg-{number:06d}", self.dims)
+        segment.load(repair, staged)
+        return segment
+
+    def _map_layout(self, conn: sqlite3.Connection, repair: bool = True) -> Tuple[List[_Segment], Optional[np.ndarray]]:
+        segments: List[_Segment] = []
+        row = conn.execute("SELECT value FROM settings WHERE key = 'compaction'").fetchone()
+        if row is not None:
+            # Another process is finishing a compaction: the committed layout has exactly
+            # this many segments, some possibly still under their staging names
+            segments = [self._segment(n, repair, staged=True) for n in range(int(row[0]))]
+        else:
+            while (self._dir / f"seg-{len(segments):06d}.f32").exists():
+                segments.append(self._segment(len(segments), repair))
+        centroids = self._dir / "centroids.npy"
+        return segments, np.load(centroids) if centroids.exists() else None
+
+    @staticmethod
+    def _generation_of(conn: sqlite3.Connection) -> int:
+        row = conn.execute("SELECT value FROM settings WHERE key = 'generation'").fetchone()
+        return int(row[0]) if row is not None else 0
+
+    def _bump_generation(self, conn: sqlite3.Connection) -> None:
+        """Record a change to the segment layout, inside the transaction that commits it."""
+        conn.execute(
+            "INSERT OR REPLACE INTO settings (key, value) "
+            "SELECT 'generation', COALESCE((SELECT CAST(value AS INTEGER) FROM settings WHERE key = 'generation'), 0) + 1"
+        )
+        self._generation = self._generation_of(conn)
+
+    def _refresh(self) -> None:
+        """Remap the segments if another process appended or compacted since they were mapped.
+
+        ``PRAGMA data_version`` only moves when another connection commits, so the common
+        case costs one pragma. The remap is retried until the generation it started from
+        is still current, so files renamed by a concurrent compaction are never mixed in.
+        """
+        conn = self._require()
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version:
+            return
+        self._data_version = version
+        generation = self._generation_of(conn)
+        while generation != self._generation:
+            try:
+                layout = self._map_layout(conn, repair=False)
+            except OSError:
+                if self._generation_of(conn) == generation:
+                    raise
+                layout = None
+            latest = self._generation_of(conn)
+            if layout is not None and latest == generation:
+                self._segments, self._centroids = layout
+                self._generation = generation
+            generation = latest
+
+    def _reconcile(self) -> None:
+        """Make the liveness flags agree with SQLite after an interrupted write."""
+        live = sum(int(s.live.sum()) for s in self._segments)
+        if live == self._conn.execute("SELECT COUNT(*) FROM points").fetchone()[0]:
+            return
+        log.warning(f"collection {self.collection}: liveness flags out of sync with metadata, rebuilding them")
+        for segment in self._segments:
+            segment.live[:] = 0
+        self._set_live([slot for (slot,) in self._conn.execute("SELECT slot FROM points")], 1)
+        self._flush_live()
+
+    def _require(self) -> sqlite3.Connection:
+        if self._conn is None:
+            raise RuntimeError(f"collection {self.collection} is not open; call ensure_collection first")
+        return self._conn
+
+    def _locate(self, slot: int) -> Tuple[_Segment, int]:
+        return self._segments[slot // self._segment_rows], slot % self._segment_rows
+
+    @property
+    def _next_slot(self) -> int:
+        if not self._segments:
+            return 0
+        return (len(self._segments) - 1) * self._segment_rows + self._segments[-1].rows
+
+    def _set_live(self, slots: Sequence[int], value: int) -> None:
+        for slot in slots:
+            segment, offset = self._locate(slot)
+            segment.live[offset] = value
+
+    def _flush_live(self) -> None:
+        for segment in self._segments:
+            if isinstance(segment.live, np.memmap):
+                segment.live.flush()
+
+    def _append(self, matrix: np.ndarray) -> List[int]:
+        lists = np.argmax(matrix @ self._centroids.T, axis=1) if self._centroids is not None else None
+        first = self._next_slot
+        done = 0
+        while done < len(matrix):
+            if not self._segments or self._segments[-1].rows >= self._segment_rows:
+                self._segments.append(self._segment(len(self._segments)))
+            segment = self._segments[-1]
+            take = min(self._segment_rows - segment.rows, len(matrix) - done)
+            segment.append(matrix[done : done + take], lists[done : done + take] if lists is not None else None)
+            done += take
+        return list(range(first, first + len(matrix)))
+
+    def _slots(self, ids: Sequence[str]) -> Dict[str, int]:
+        conn = self._require()
+        found: Dict[str, int] = {}
+        for i in range(0, len(ids), _PARAM_CHUNK):
+            part = list(ids[i : i + _PARAM_CHUNK])
+            marks = ",".join("?" * len(part))
+            found.update(conn.execute(f"SELECT id, slot FROM points WHERE id IN ({marks})", part).fetchall())
+        return found
+
+    # -- VectorClient ----------------------------------------------------------------
+
+    def ensure_collection(self, name: str, dims: int) -> None:
+        with self._lock:
+            if self._conn is not None and self._dir == Path(self.settings.path) / name:
+                if dims and dims != self.dims:
+                    raise ValueError(f"collection {name} has {self.dims} dims, got {dims}")
+                return
+            self.close()
+            self.collection = name
+            self._open(name, dims)
+
+    def upsert(self, records: Records) -> None:
+        batch = records if isinstance(records, EmbeddingBatch) else EmbeddingBatch.from_records(list(records))
+        if not len(batch):
+            return
+        # The last occurrence of an id within the batch wins
+        last = list({rid: i for i, rid in enumerate(batch.ids)}.values())
+        if len(last) < len(batch):
+            batch = batch.take(sorted(last))
+        matrix = _normalized(as_float32_matrix(batch.vectors))
+        if matrix.shape[1] != self.dims:
+            raise ValueError(f"expected {self.dims}-dim vectors, got {matrix.shape[1]}")
+        with self._lock:
+            conn = self._require()
+            self._refresh()
+            old = self._slots(batch.ids)
+            slots = self._append(matrix)
+            rows = [
+                (slot, rid, text, *(meta.get(c) for c in COLUMNS), json.dumps(meta, default=str))
+                for slot, rid, text, meta in zip(slots, batch.ids, batch.texts, batch.metadata)
+            ]
+            with conn:
+                conn.executemany("DELETE FROM points WHERE slot = ?", [(s,) for s in old.values()])
+                conn.executemany(f"INSERT INTO points (slot, id, text, {', '.join(COLUMNS)}, metadata) VALUES ({', '.join('?' * 9)})", rows)
+                self._bump_generation(conn)
+            self._set_live(list(old.values()), 0)
+            self._set_live(slots, 1)
+            self._flush_live()
+
+    def delete(self, ids: List[str]) -> None:
+        if not ids:
+            return
+        with self._lock:
+            conn = self._require()
+            self._refresh()
+            slots = list(self._slots(ids).values())
+            with conn:
+                conn.executemany("DELETE FROM points WHERE slot = ?", [(s,) for s in slots])
+            self._set_live(slots, 0)
+            self._flush_live()
+
+    def document_ids(self, doc_key: str) -> List[str]:
+        with self._lock:
+            return [r[0] for r in self._require().execute("SELECT id FROM points WHERE source_path = ?", (doc_key,))]
+
+    def replace_document(self, doc_key: str, records: Records) -> None:
+        fresh, surviving, stale = diff_document(self.document_ids(doc_key), records)
+        self.delete(stale)
+        if len(fresh):
+            self.upsert(fresh)
+        if len(surviving):
+            # Surviving chunks keep their stored vector; refresh text and metadata only
+            rows = [
+                (r.text, *(r.metadata.get(c) for c in COLUMNS), json.dumps(r.metadata, default=str), r.id)
+                for r in surviving
+            ]
+            assignments = ", ".join(f"{c} = ?" for c in ("text", *COLUMNS, "metadata"))
+            with self._lock, self._require():
+                self._conn.executemany(f"UPDATE points SET {assignments} WHERE id = ?", rows)
+
+    def reindex(self) -> None:
+        """Compact away retired slots and, with ``index: ivf``, (re)train the partitioning."""
+        with self._lock:
+            conn = self._require()
+            self._refresh()
+            live = [(s, np.flatnonzero(s.live)) for s in self._segments]
+            total = sum(len(idx) for _, idx in live)
+            if self._next_slot > total:
+                self._compact(live)
+                live = [(s, np.flatnonzero(s.live)) for s in self._segments]
+            centroids_path = self._dir / "centroids.npy"
+            if self.settings.index != "ivf" or not total:
+                self._centroids = None
+                centroids_path.unlink(missing_ok=True)
+                for s in self._segments:
+                    s.file(".list").unlink(missing_ok=True)
+                    s.load()
+                with conn:
+                    self._bump_generation(conn)
+                return
+            # Sample each segment in proportion to its live rows
+            rng = np.random.default_rng(0)
+            fraction = min(1.0, self.settings.train_size / total)
+            parts = []
+            for segment, idx in live:
+                if fraction < 1.0:
+                    idx = np.sort(rng.choice(idx, max(1, round(len(idx) * fraction)), replace=False)) if len(idx) else idx
+                parts.append(np.asarray(segment.vectors[idx]))
+            sample = np.concatenate(parts)
+            k = self.settings.list_count(len(sample))
+            centroids = _kmeans(sample, k, self.settings.kmeans_iters)
+            for segment in self._segments:
+                lists = np.empty(segment.rows, dtype=np.int32)
+                for start in range(0, segment.rows, 8192):
+                    lists[start : start + 8192] = np.argmax(segment.vectors[start : start + 8192] @ centroids.T, axis=1)
+                # Replaced, not rewritten in place: other processes may have the old lists mapped
+                tmp = segment.file(".list.tmp")
+                lists.tofile(tmp)
+                os.replace(tmp, segment.file(".list"))
+                segment.load()
+            tmp = self._dir / "centroids.npy.tmp"
+            with open(tmp, "wb") as f:
+                np.save(f, centroids)
+            os.replace(tmp, centroids_path)
+            self._centroids = centroids
+            with conn:
+                self._bump_generation(conn)
+            log.info(f"reindex collection={self.collection} rows={total} ivf_lists={k}")
+
+    def _compact(self, live: List[Tuple[_Segment, np.ndarray]]) -> None:
+        """Rewrite the live rows into fresh segments and renumber their slots.
+
+        Crash-safe: the new segments are written as ``seg-N.<suffix>.compact`` files, and
+        the slot renumbering is committed together with a ``compaction`` marker holding
+        the new segment count. Only then are the files renamed into place and the old ones
+        removed, so an interrupted compaction leaves either the old layout or (finished by
+        ``_open``) the new one.
+        """
+        conn = self._require()
+        rows = self._segment_rows
+        old_slots = np.concatenate([i * rows + idx for i, (_, idx) in enumerate(live)]) if live else np.zeros(0, dtype=np.int64)
+        total = len(old_slots)
+        count = -(-total // rows)
+        out = None
+        number, filled = -1, rows
+        try:
+            for segment, idx in live:
+                for start in range(0, len(idx), 8192):
+                    block = np.asarray(segment.vectors[idx[start : start + 8192]])
+                    done = 0
+                    while done < len(block):
+                        if filled == rows:
+                            if out is not None:
+                                _close_synced(out)
+                            number, filled = number + 1, 0
+                            out = open(self._dir / f"seg-{number:06d}.f32.compact", "wb")
+                        take = min(rows - filled, len(block) - done)
+                        block[done : done + take].tofile(out)
+                        filled += take
+                        done += take
+        finally:
+            if out is not None:
+                _close_synced(out)
+        for number in range(count):
+            with open(self._dir / f"seg-{number:06d}.live.compact", "wb") as f:
+                f.write(b"\x01" * min(rows, total - number * rows))
+                f.flush()
+                os.fsync(f.fileno())
+        with conn:
+            # Two passes through negative slots so renumbering never collides
+            conn.executemany("UPDATE points SET slot = ? WHERE slot = ?", [(-1 - new, int(old)) for new, old in enumerate(old_slots)])
+            conn.execute("UPDATE points SET slot = -1 - slot WHERE slot < 0")
+            conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('compaction', ?)", (str(count),))
+            self._bump_generation(conn)
+            if self._hybrid_ready:
+                conn.execute("INSERT INTO points_fts(points_fts) VALUES ('rebuild')")
+        self._segments = []
+        self._finish_compaction(conn, count)
+        self._segments = [self._segment(n) for n in range(count)]
+
+    def _finish_compaction(self, conn: sqlite3.Connection, count: int) -> None:
+        """Move committed ``.compact`` segments into place and drop the old layout's files."""
+        for number in range(count):
+            base = f"seg-{number:06d}"
+            for suffix in (".f32", ".live"):
+                staged = self._dir / f"{base}{suffix}.compact"
+                if staged.exists():
+                    os.replace(staged, self._dir / f"{base}{suffix}")
+            # ivf lists belong to the old row order; reindex retrains them
+            (self._dir / f"{base}.list").unlink(missing_ok=True)
+        for path in self._dir.glob("seg-*"):
+            if int(path.name[4:10]) >= count:
+                path.unlink(missing_ok=True)
+        with conn:
+            conn.execute("DELETE FROM settings WHERE key = 'compaction'")
+            self._bump_generation(conn)
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_live()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._flush_live()
+                self._conn.close()
+            self._conn = None
+            self._segments = []
+
+    # -- search ----------------------------------------------------------------------
+
+    def _filter_slots(self, filters: Optional[Dict]) -> Optional[np.ndarray]:
+        if not filters:
+            return None
+        where, args = self._where(filters)
+        with self._lock:
+            rows = self._require().execute(f"SELECT slot FROM points WHERE {where} ORDER BY slot", args).fetchall()
+        return np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+
+    @staticmethod
+    def _where(filters: Dict, table: str = "points") -> Tuple[str, List]:
+        clauses: List[str] = []
+        args: List = []
+        for key, value in filters.items():
+            if key == "id" or key in COLUMNS:
+                clauses.append(f"{table}.{key} = ?")
+            else:
+                clauses.append(f"json_extract({table}.metadata, ?) = ?")
+                args.append("$." + json.dumps(str(key)))
+            args.append(value)
+        return " AND ".join(clauses), args
+
+    def _dense(self, queries: np.ndarray, limit: int, filters: Optional[Dict], params: Optional[Dict]) -> List[List[Tuple[int, float]]]:
+        """Best ``limit`` (slot, cosine) pairs for each row of ``queries`` (unit-norm).
+
+        The whole batch shares the candidate rows, so each segment costs one BLAS matrix
+        product; with IVF each query scans the rows of its own ``nprobe`` lists.
+        """
+        allowed = self._filter_slots(filters)
+        with self._lock:
+            self._refresh()
+            segments = list(self._segments)
+            centroids = self._centroids
+        p = params or {}
+        nprobe = int(p.get("nprobe", self.settings.nprobe))
+        if allowed is None and centroids is not None and not p.get("exact") and nprobe < len(centroids):
+            probes = np.argpartition(-(queries @ centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+            return [self._scan(segments, q[None, :], limit, None, lists)[0] for q, lists in zip(queries, probes)]
+        return self._scan(segments, queries, limit, allowed, None)
+
+    def _scan(
+        self,
+        segments: List[_Segment],
+        queries: np.ndarray,
+        limit: int,
+        allowed: Optional[np.ndarray],
+        probes: Optional[np.ndarray],
+    ) -> List[List[Tuple[int, float]]]:
+        found: List[Tuple[List[np.ndarray], List[np.ndarray]]] = [([], []) for _ in range(len(queries))]
+        for number, segment in enumerate(segments):
+            if not segment.rows:
+                continue
+            base = number * self._segment_rows
+            if allowed is not None:
+                lo, hi = np.searchsorted(allowed, [base, base + segment.rows])
+                idx = allowed[lo:hi] - base
+                idx = idx[segment.live[idx] == 1]
+            elif probes is not None and segment.lists is not None:
+                idx = np.flatnonzero((segment.live == 1) & np.isin(segment.lists, probes))
+            else:
+                idx = None
+            if idx is None:
+                # One BLAS product over the whole segment: (queries, rows) scores
+                seg_scores = (segment.vectors @ queries.T).T
+                seg_scores[:, segment.live == 0] = -np.inf
+            elif len(idx):
+                seg_scores = (segment.vectors[idx] @ queries.T).T
+            else:
+                continue
+            for row, (slots, scores) in zip(seg_scores, found):
+                best = _top(row, limit)
+                best = best[np.isfinite(row[best])]
+                slots.append(base + (best if idx is None else idx[best]))
+                scores.append(row[best])
+        out: List[List[Tuple[int, float]]] = []
+        for slots, scores in found:
+            if not slots:
+                out.append([])
+                continue
+            all_slots = np.concatenate(slots)
+            all_scores = np.concatenate(scores)
+            out.append([(int(all_slots[i]), float(all_scores[i])) for i in _top(all_scores, limit)])
+        return out
+
+    def _lexical(self, query_text: str, limit: int, filters: Optional[Dict]) -> List[int]:
+        terms = tokenize(query_text)
+        if not terms:
+            return []
+        # Quoted terms are phrases of their own tokens; any term may match
+        match = " OR ".join('"' + t.replace('"', '""') + '"' for t in dict.fromkeys(terms))
+        where, args = self._where(filters) if filters else ("", [])
+        sql = (
+            "SELECT points.slot FROM points_fts JOIN points ON points.slot = points_fts.rowid "
+            f"WHERE points_fts MATCH ?{' AND ' + where if where else ''} ORDER BY bm25(points_fts) LIMIT ?"
+        )
+        with self._lock:
+            return [r[0] for r in self._require().execute(sql, [match, *args, limit])]
+
+    def _results(self, batches: List[List[Tuple[Any, float]]]) -> List[List[SearchResult]]:
+        """Resolve (slot, score) lists into results, with one metadata lookup for all of them."""
+        wanted = sorted({slot for scored in batches for slot, _ in scored})
+        by_slot: Dict[int, Tuple[str, str, str]] = {}
+        with self._lock:
+            conn = self._require()
+            for i in range(0, len(wanted), _PARAM_CHUNK):
+                part = wanted[i : i + _PARAM_CHUNK]
+                marks = ",".join("?" * len(part))
+                for slot, rid, text, meta in conn.execute(f"SELECT slot, id, text, metadata FROM points WHERE slot IN ({marks})", part):
+                    by_slot[slot] = (rid, text, meta)
+        out: List[List[SearchResult]] = []
+        for scored in batches:
+            results: List[SearchResult] = []
+            for slot, score in scored:
+                if slot in by_slot:  # retired by a concurrent write
+                    rid, text, meta = by_slot[slot]
+                    results.append(SearchResult(id=rid, score=score, text=text, metadata=json.loads(meta)))
+            out.append(results)
+        return out
+
+    def search(
+        self,
+        query_vector: List[float],
+        top_k: int,
+        filters: Optional[Dict],
+        params: Optional[Dict] = None,
+        query_text: Optional[str] = None,
+    ) -> List[SearchResult]:
+        return self.search_batch([query_vector], top_k, filters, params, [query_text])[0]
+
+    def search_batch(
+        self,
+        query_vectors: Sequence[List[float]],
+        top_k: int,
+        filters: Optional[Dict],
+        params: Optional[Dict] = None,
+        query_texts: Optional[Sequence[Optional[str]]] = None,
+    ) -> List[List[SearchResult]]:
+        if not len(query_vectors):
+            return []
+        queries = _normalized(as_float32_matrix(query_vectors))
+        texts = query_texts or [None] * len(queries)
+        if not (self.hybrid.enabled and self._hybrid_ready and any(texts)):
+            return self._results(self._dense(queries, top_k, filters, params))
+        limit = self.hybrid.candidate_limit(top_k)
+        scored = []
+        for dense, text in zip(self._dense(queries, limit, filters, params), texts):
+            if text:
+                scored.append(rrf_fuse([[slot for slot, _ in dense], self._lexical(text, limit, filters)], self.hybrid.rrf_k, top_k))
+            else:
+                scored.append(dense[:top_k])
+        return self._results(scored)
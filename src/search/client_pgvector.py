@@ -1,13 +1,26 @@
 from __future__ import annotations
 
+import math
 import os
-from typing import Dict, List, Optional
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 import psycopg
-from pgvector.psycopg import register_vector
+from pgvector import Vector
+from pgvector.psycopg import register_vector, register_vector_async
+from psycopg import sql
+from psycopg.types import TypeInfo
+from psycopg.types.json import Jsonb
+from psycopg_pool import AsyncConnectionPool, ConnectionPool
 
-from src.common.types import SearchResult
-from src.ingest.upsert import VectorClient
+from src.common.logging import get_logger
+from src.common.types import EmbeddingBatch, EmbeddingRecord, SearchResult
+from src.ingest.upsert import AsyncVectorClient, VectorClient, diff_document
+from src.search.hybrid import HybridSettings
+
+
+log = get_logger("search.pgvector")
 
 
 SCHEMA_SQL = """
@@ -15,7 +28,7 @@ CREATE EXTENSION IF NOT EXISTS vector;
 CREATE TABLE IF NOT EXISTS documents (
     id TEXT PRIMARY KEY,
     text TEXT NOT NULL,
-    vector VECTOR(%(dims)s) NOT NULL,
+    vector VECTOR({dims}) NOT NULL,
     source_path TEXT,
     file_name TEXT,
     section_path TEXT,
@@ -24,82 +37,572 @@ CREATE TABLE IF NOT EXISTS documents (
     doc_id TEXT,
     sha256 TEXT
 );
-CREATE INDEX IF NOT EXISTS documents_vec_idx ON documents USING ivfflat (vector vector_cosine_ops) WITH (lists = 100);
+CREATE INDEX IF NOT EXISTS documents_source_path_idx ON documents (source_path);
+"""
+
+# Lexical side of hybrid search: a stored tsvector kept in sync by Postgres itself
+HYBRID_SCHEMA_SQL = """
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS tsv tsvector
+    GENERATED ALWAYS AS (to_tsvector({language}::regconfig, text)) STORED;
+CREATE INDEX IF NOT EXISTS documents_tsv_idx ON documents USING GIN (tsv);
+"""
+
+UPSERT_SQL = """
+INSERT INTO documents (id, text, vector, source_path, file_name, section_path, page_numbers, char_span, doc_id, sha256)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+ON CONFLICT (id) DO UPDATE SET text=EXCLUDED.text, vector=EXCLUDED.vector,
+source_path=EXCLUDED.source_path, file_name=EXCLUDED.file_name, section_path=EXCLUDED.section_path,
+page_numbers=EXCLUDED.page_numbers, char_span=EXCLUDED.char_span, doc_id=EXCLUDED.doc_id, sha256=EXCLUDED.sha256
+"""
+
+COLUMNS = "id, text, vector, source_path, file_name, section_path, page_numbers, char_span, doc_id, sha256"
+
+# Bulk path: binary COPY into a session-local staging table, then one merge per batch
+STAGING_SQL = "CREATE TEMP TABLE IF NOT EXISTS documents_staging (LIKE documents INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+COPY_SQL = f"COPY documents_staging ({COLUMNS}) FROM STDIN (FORMAT BINARY)"
+COPY_TYPES = ["text", "text", "vector", "text", "text", "text", "jsonb", "jsonb", "text", "text"]
+MERGE_SQL = f"""
+INSERT INTO documents ({COLUMNS})
+SELECT {COLUMNS} FROM documents_staging
+ON CONFLICT (id) DO UPDATE SET text=EXCLUDED.text, vector=EXCLUDED.vector,
+source_path=EXCLUDED.source_path, file_name=EXCLUDED.file_name, section_path=EXCLUDED.section_path,
+page_numbers=EXCLUDED.page_numbers, char_span=EXCLUDED.char_span, doc_id=EXCLUDED.doc_id, sha256=EXCLUDED.sha256
+"""
+
+# Surviving chunks keep their stored vector; only metadata is refreshed
+UPDATE_METADATA_SQL = """
+UPDATE documents SET file_name=%s, section_path=%s, page_numbers=%s, char_span=%s, doc_id=%s, sha256=%s
+WHERE id=%s
 """
 
 
+def _jsonb(value) -> Optional[Jsonb]:
+    if value is None:
+        return None
+    return Jsonb(list(value) if isinstance(value, tuple) else value)
+
+
+def _row(r: EmbeddingRecord) -> tuple:
+    payload = r.metadata
+    return (
+        r.id,
+        r.text,
+        r.vector,
+        payload.get("source_path"),
+        payload.get("file_name"),
+        payload.get("section_path"),
+        _jsonb(payload.get("page_numbers")),
+        _jsonb(payload.get("char_span")),
+        payload.get("doc_id"),
+        payload.get("sha256"),
+    )
+
+
+# metric -> (distance operator, index operator class, similarity expression over the distance)
+METRICS = {
+    "cosine": ("<=>", "vector_cosine_ops", "1 - ({})"),
+    "l2": ("<->", "vector_l2_ops", "-({})"),
+    "ip": ("<#>", "vector_ip_ops", "-({})"),
+}
+INDEX_TYPES = ("hnsw", "ivfflat", "none")
+VECTOR_INDEX = "documents_vec_idx"
+
+
+def ivfflat_lists(rows: int) -> int:
+    """pgvector's guidance: rows / 1000 up to 1M rows, sqrt(rows) beyond."""
+    if rows <= 1_000_000:
+        return max(1, rows // 1000)
+    return int(math.sqrt(rows))
+
+
+@dataclass
+class IndexSettings:
+    type: str = "hnsw"
+    metric: str = "cosine"
+    m: int = 16
+    ef_construction: int = 64
+    lists: Any = "auto"
+    ef_search: int = 40
+    probes: int = 10
+    maintenance_work_mem: Optional[str] = None
+
+    @classmethod
+    def from_config(cls, icfg: Optional[Dict[str, Any]]) -> "IndexSettings":
+        icfg = icfg or {}
+        settings = cls(**{k: v for k, v in icfg.items() if k in cls.__dataclass_fields__})
+        if settings.type not in INDEX_TYPES:
+            raise ValueError(f"Unknown pgvector index type: {settings.type}")
+        if settings.metric not in METRICS:
+            raise ValueError(f"Unknown pgvector metric: {settings.metric}")
+        return settings
+
+    @property
+    def operator(self) -> str:
+        return METRICS[self.metric][0]
+
+    @property
+    def opclass(self) -> str:
+        return METRICS[self.metric][1]
+
+    def index_sql(self, rows: int) -> Optional[str]:
+        if self.type == "hnsw":
+            return (
+                f"CREATE INDEX IF NOT EXISTS {VECTOR_INDEX} ON documents USING hnsw (vector {self.opclass}) "
+                f"WITH (m = {int(self.m)}, ef_construction = {int(self.ef_construction)})"
+            )
+        if self.type == "ivfflat":
+            lists = ivfflat_lists(rows) if self.lists == "auto" else int(self.lists)
+            return f"CREATE INDEX IF NOT EXISTS {VECTOR_INDEX} ON documents USING ivfflat (vector {self.opclass}) WITH (lists = {lists})"
+        return None
+
+    def matches(self, indexdef: str) -> bool:
+        return f"USING {self.type} (vector {self.opclass})" in indexdef
+
+    def query_settings(self, overrides: Optional[Dict[str, Any]] = None) -> List[Tuple[str, str]]:
+        """Planner settings for a search; per-query ``ef_search``/``probes`` override the defaults."""
+        overrides = overrides or {}
+        if self.type == "hnsw":
+            return [("hnsw.ef_search", str(int(overrides.get("ef_search", self.ef_search))))]
+        if self.type == "ivfflat":
+            return [("ivfflat.probes", str(int(overrides.get("probes", self.probes))))]
+        return []
+
+
+FILTER_COLUMNS = {"id", "source_path", "file_name", "section_path", "doc_id", "sha256"}
+
+RESULT_COLUMNS = "id, text, source_path, file_name, section_path, page_numbers, char_span, doc_id, sha256"
+
+
+def _where(filters: Optional[Dict]) -> Tuple[List[str], List]:
+    # Filter keys become column names, so only known columns are accepted
+    clauses: List[str] = []
+    params: List = []
+    for k, v in (filters or {}).items():
+        if k not in FILTER_COLUMNS:
+            raise ValueError(f"Unsupported filter field: {k}")
+        clauses.append(f"{k} = %s")
+        params.append(v)
+    return clauses, params
+
+
+def _search_query(query_vector, top_k: int, filters: Optional[Dict], metric: str = "cosine") -> Tuple[str, List]:
+    qvec = query_vector if isinstance(query_vector, Vector) else Vector(query_vector)
+    where, filter_params = _where(filters)
+    params: List = [qvec, *filter_params]
+    where_sql = (" WHERE " + " AND ".join(where)) if where else ""
+    # The ORDER BY operator must match the index opclass or the planner falls back to a
+    # sequential scan. LIMIT is bound so the statement text is stable and stays prepared.
+    op, _, similarity = METRICS[metric]
+    query = (
+        f"SELECT {RESULT_COLUMNS}, {similarity.format(f'vector {op} %s')} AS similarity "
+        f"FROM documents{where_sql} ORDER BY vector {op} %s ASC LIMIT %s"
+    )
+    params.extend([qvec, int(top_k)])
+    return query, params
+
+
+def _batch_query(query_vectors, top_k: int, filters: Optional[Dict], metric: str = "cosine") -> Tuple[str, List]:
+    """Nearest neighbours of every query vector in one statement.
+
+    The query vectors are unnested (keeping their position) and each drives a LATERAL
+    ``ORDER BY ... LIMIT`` scan, so every query still uses the vector index.
+    """
+    qvecs = [v if isinstance(v, Vector) else Vector(v) for v in query_vectors]
+    where, filter_params = _where(filters)
+    where_sql = (" WHERE " + " AND ".join(where)) if where else ""
+    op, _, similarity = METRICS[metric]
+    query = (
+        "SELECT q.ord, r.* FROM unnest(%s::vector[]) WITH ORDINALITY AS q(vec, ord) CROSS JOIN LATERAL ("
+        f"SELECT {RESULT_COLUMNS}, {similarity.format(f'vector {op} q.vec')} AS similarity "
+        f"FROM documents{where_sql} ORDER BY vector {op} q.vec ASC LIMIT %s) r "
+        "ORDER BY q.ord, r.similarity DESC, r.id"
+    )
+    return query, [qvecs, *filter_params, int(top_k)]
+
+
+def _hybrid_query(
+    query_vector, query_text: str, top_k: int, filters: Optional[Dict], metric: str, hybrid: HybridSettings
+) -> Tuple[str, List]:
+    """Dense and full-text candidates fused with reciprocal-rank fusion in one statement.
+
+    Each side keeps its own index-friendly ORDER BY ... LIMIT; ranks are assigned over
+    those candidates and RRF (``1 / (rrf_k + rank)``, summed) orders the union. The
+    score is the fused RRF score, not a similarity.
+    """
+    qvec = query_vector if isinstance(query_vector, Vector) else Vector(query_vector)
+    where, filter_params = _where(filters)
+    dense_where = (" WHERE " + " AND ".join(where)) if where else ""
+    lexical_where = " AND ".join(["tsv @@ q.query", *where])
+    limit = hybrid.candidate_limit(top_k)
+    op = METRICS[metric][0]
+    columns = ", ".join(f"d.{c.strip()}" for c in RESULT_COLUMNS.split(","))
+    query = (
+        "WITH dense AS ("
+        f"SELECT id, row_number() OVER (ORDER BY distance) AS rank FROM ("
+        f"SELECT id, vector {op} %s AS distance FROM documents{dense_where} ORDER BY vector {op} %s LIMIT %s) c), "
+        "lexical AS ("
+        "SELECT id, row_number() OVER (ORDER BY score DESC) AS rank FROM ("
+        "SELECT id, ts_rank_cd(tsv, q.query) AS score "
+        # websearch syntax, but any term may match (OR); ts_rank_cd ranks docs matching more terms higher
+        "FROM documents, (SELECT replace(websearch_to_tsquery(%s::regconfig, %s)::text, ' & ', ' | ')::tsquery AS query) q "
+        f"WHERE {lexical_where} ORDER BY score DESC LIMIT %s) c), "
+        "fused AS ("
+        "SELECT id, sum(1.0 / (%s + rank)) AS score FROM (SELECT * FROM dense UNION ALL SELECT * FROM lexical) r GROUP BY id) "
+        f"SELECT {columns}, f.score FROM fused f JOIN documents d USING (id) ORDER BY f.score DESC, d.id LIMIT %s"
+    )
+    params = [qvec, *filter_params, qvec, limit]
+    params += [hybrid.language, query_text, *filter_params, limit]
+    params += [int(hybrid.rrf_k), int(top_k)]
+    return query, params
+
+
+def _to_results(rows) -> List[SearchResult]:
+    out: List[SearchResult] = []
+    for row in rows:
+        (rid, text, source_path, file_name, section_path, page_numbers, char_span, doc_id, sha256, similarity) = row
+        out.append(
+            SearchResult(
+                id=rid,
+                score=float(similarity) if similarity is not None else 0.0,
+                text=text,
+                metadata={
+                    "source_path": source_path,
+                    "file_name": file_name,
+                    "section_path": section_path,
+                    "page_numbers": page_numbers,
+                    "char_span": char_span,
+                    "doc_id": doc_id,
+                    "sha256": sha256,
+                },
+            )
+        )
+    return out
+
+
+def _group_results(rows, count: int) -> List[List[SearchResult]]:
+    """Split ``_batch_query`` rows (prefixed with the 1-based query position) per query."""
+    grouped: List[List] = [[] for _ in range(count)]
+    for row in rows:
+        grouped[row[0] - 1].append(row[1:])
+    return [_to_results(g) for g in grouped]
+
+
+def _batch_statements(
+    query_vectors, top_k: int, filters: Optional[Dict], query_texts, metric: str, hybrid: HybridSettings
+) -> Tuple[List[Tuple[str, List]], bool]:
+    """Statements for a batch search, and whether their rows are grouped by query position.
+
+    Dense batches are one LATERAL statement; hybrid batches are one statement per query.
+    """
+    if query_texts and hybrid.enabled and any(query_texts):
+        statements = [
+            _hybrid_query(v, t, top_k, filters, metric, hybrid) if t else _search_query(v, top_k, filters, metric)
+            for v, t in zip(query_vectors, query_texts)
+        ]
+        return statements, False
+    return [_batch_query(query_vectors, top_k, filters, metric)], True
+
+
+def _batch_results(rows: List[List], grouped: bool, count: int) -> List[List[SearchResult]]:
+    if grouped:
+        return _group_results(rows[0], count)
+    return [_to_results(r) for r in rows]
+
+
+def _set_sql(settings: List[Tuple[str, str]], local: bool) -> Tuple[str, List[str]]:
+    calls = ", ".join(f"set_config(%s, %s, {'true' if local else 'false'})" for _ in settings)
+    return f"SELECT {calls}", [v for pair in settings for v in pair]
+
+
+def _search_path(schema: Optional[str]) -> List[Tuple[str, str]]:
+    # Unqualified table names then resolve in the schema; the vector type stays in public
+    return [("search_path", sql.Identifier(schema).as_string(None) + ", public")] if schema else []
+
+
+def _configure(index: IndexSettings, schema: Optional[str] = None):
+    def configure(conn: psycopg.Connection) -> None:
+        # The vector type must exist before its adapters can be registered
+        if TypeInfo.fetch(conn, "vector") is None:
+            conn.execute("CREATE EXTENSION IF NOT EXISTS vector")
+        register_vector(conn)
+        settings = index.query_settings() + _search_path(schema)
+        if settings:
+            conn.execute(*_set_sql(settings, local=False))
+
+    return configure
+
+
+def _configure_async(index: IndexSettings, schema: Optional[str] = None):
+    async def configure(conn: psycopg.AsyncConnection) -> None:
+        if await TypeInfo.fetch(conn, "vector") is None:
+            await conn.execute("CREATE EXTENSION IF NOT EXISTS vector")
+        await register_vector_async(conn)
+        settings = index.query_settings() + _search_path(schema)
+        if settings:
+            await conn.execute(*_set_sql(settings, local=False))
+
+    return configure
+
+
 class PgVectorClient(VectorClient):
-    def __init__(self, dsn: str, collection: str, dims: int) -> None:
+    def __init__(
+        self,
+        dsn: str,
+        collection: str,
+        dims: int,
+        upsert_batch_size: int = 1000,
+        upsert_method: str = "copy",
+        pool_min_size: int = 1,
+        pool_max_size: int = 10,
+        pool_timeout_s: float = 30.0,
+        index: Optional[Dict[str, Any]] = None,
+        hybrid: Optional[Dict[str, Any]] = None,
+        schema: Optional[str] = None,
+    ) -> None:
+        if upsert_method not in ("copy", "insert"):
+            raise ValueError(f"Unknown pgvector upsert_method: {upsert_method}")
         self.dsn = dsn
         self.collection = collection  # kept for interface parity
+        self.schema = schema
         self.dims = dims
-        self._conn = psycopg.connect(self.dsn, autocommit=True)
-        register_vector(self._conn)
+        self.upsert_batch_size = max(1, upsert_batch_size)
+        self.upsert_method = upsert_method
+        self.index = IndexSettings.from_config(index)
+        self.hybrid = HybridSettings.from_config(hybrid)
+        # Connections are opened in the background; errors surface on first use
+        self._pool = ConnectionPool(
+            self.dsn,
+            min_size=pool_min_size,
+            max_size=max(pool_min_size, pool_max_size),
+            timeout=pool_timeout_s,
+            kwargs={"autocommit": True},
+            configure=_configure(self.index, schema),
+            check=ConnectionPool.check_connection,
+            name="pgvector",
+            open=True,
+        )
 
     def ensure_collection(self, name: str, dims: int) -> None:
         self.dims = dims
-        with self._conn.cursor() as cur:
-            cur.execute(SCHEMA_SQL, {"dims": dims})
+        with self._pool.connection() as conn:
+            if self.schema:
+                conn.execute(sql.SQL("CREATE SCHEMA IF NOT EXISTS {}").format(sql.Identifier(self.schema)))
+            # Multi-statement DDL can't be sent with bound parameters
+            conn.execute(sql.SQL(SCHEMA_SQL).format(dims=sql.Literal(int(dims))))
+            if self.hybrid.enabled:
+                conn.execute(sql.SQL(HYBRID_SCHEMA_SQL).format(language=sql.Literal(self.hybrid.language)))
+            self._ensure_index(conn)
+
+    def _ensure_index(self, conn: psycopg.Connection) -> None:
+        row = conn.execute("SELECT indexdef FROM pg_indexes WHERE schemaname = current_schema() AND indexname = %s", (VECTOR_INDEX,)).fetchone()
+        if row is not None:
+            if not self.index.matches(row[0]):
+                log.warning(f"vector index does not match index settings ({self.index.type}/{self.index.metric}); run reindex")
+            return
+        if self.index.type == "ivfflat" and not conn.execute("SELECT EXISTS (SELECT 1 FROM documents)").fetchone()[0]:
+            # IVFFlat centroids trained on an empty table are meaningless; build after loading
+            log.info("ivfflat index deferred until reindex (table is empty)")
+            return
+        stmt = self.index.index_sql(rows=0)
+        if stmt:
+            conn.execute(stmt)
+
+    def reindex(self) -> None:
+        with self._pool.connection() as conn:
+            rows = conn.execute("SELECT count(*) FROM documents").fetchone()[0]
+            stmt = self.index.index_sql(rows)
+            with conn.transaction():
+                if self.index.maintenance_work_mem:
+                    conn.execute("SELECT set_config('maintenance_work_mem', %s, true)", (self.index.maintenance_work_mem,))
+                conn.execute(f"DROP INDEX IF EXISTS {VECTOR_INDEX}")
+                if stmt:
+                    conn.execute(stmt)
+            conn.execute("ANALYZE documents")
+        log.info(f"reindex_complete type={self.index.type} metric={self.index.metric} rows={rows}")
 
     def upsert(self, records) -> None:
-        with self._conn.cursor() as cur:
+        # Batches are sliced as views; their rows go to COPY as float32 arrays
+        if not isinstance(records, EmbeddingBatch):
+            records = list(records)
+        with self._pool.connection() as conn:
+            for i in range(0, len(records), self.upsert_batch_size):
+                with conn.transaction(), conn.cursor() as cur:
+                    self._write(cur, records[i : i + self.upsert_batch_size])
+
+    def _write(self, cur, records) -> None:
+        if not records:
+            return
+        if self.upsert_method == "insert":
             for r in records:
-                payload = {**r.metadata}
-                cur.execute(
-                    """
-                    INSERT INTO documents (id, text, vector, source_path, file_name, section_path, page_numbers, char_span, doc_id, sha256)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (id) DO UPDATE SET text=EXCLUDED.text, vector=EXCLUDED.vector,
-                    source_path=EXCLUDED.source_path, file_name=EXCLUDED.file_name, section_path=EXCLUDED.section_path,
-                    page_numbers=EXCLUDED.page_numbers, char_span=EXCLUDED.char_span, doc_id=EXCLUDED.doc_id, sha256=EXCLUDED.sha256
-                    """,
-                    (
-                        r.id,
-                        r.text,
-                        r.vector,
-                        payload.get("source_path"),
-                        payload.get("file_name"),
-                        payload.get("section_path"),
-                        payload.get("page_numbers"),
-                        payload.get("char_span"),
-                        payload.get("doc_id"),
-                        payload.get("sha256"),
-                    ),
-                )
-
-    def search(self, query_vector: List[float], top_k: int, filters: Optional[Dict]) -> List[SearchResult]:
-        where = []
-        params: List = [query_vector]
-        if filters:
-            for k, v in filters.items():
-                where.append(f"{k} = %s")
-                params.append(v)
-        where_sql = (" WHERE " + " AND ".join(where)) if where else ""
-        sql = f"SELECT id, text, source_path, file_name, section_path, page_numbers, char_span, doc_id, sha256, (1 - (vector <#> %s)) AS similarity FROM documents{where_sql} ORDER BY vector <#> %s ASC LIMIT {top_k}"
-        # duplicate query_vector at end for ORDER BY
-        params.append(query_vector)
-        with self._conn.cursor() as cur:
-            cur.execute(sql, params)
-            rows = cur.fetchall()
-        out: List[SearchResult] = []
-        for row in rows:
-            (rid, text, source_path, file_name, section_path, page_numbers, char_span, doc_id, sha256, similarity) = row
-            out.append(
-                SearchResult(
-                    id=rid,
-                    score=float(similarity) if similarity is not None else 0.0,
-                    text=text,
-                    metadata={
-                        "source_path": source_path,
-                        "file_name": file_name,
-                        "section_path": section_path,
-                        "page_numbers": page_numbers,
-                        "char_span": char_span,
-                        "doc_id": doc_id,
-                        "sha256": sha256,
-                    },
-                )
-            )
-        return out
+                cur.execute(UPSERT_SQL, _row(r))
+            return
+        # A merge cannot touch the same id twice; keep the last record per id
+        rows = {r.id: r for r in records}
+        cur.execute(STAGING_SQL)
+        with cur.copy(COPY_SQL) as copy:
+            copy.set_types(COPY_TYPES)
+            for r in rows.values():
+                copy.write_row(_row(r))
+        cur.execute(MERGE_SQL)
+
+    def delete(self, ids: List[str]) -> None:
+        if not ids:
+            return
+        with self._pool.connection() as conn:
+            conn.execute("DELETE FROM documents WHERE id = ANY(%s)", (list(ids),))
+
+    def document_ids(self, doc_key: str) -> List[str]:
+        with self._pool.connection() as conn:
+            return [row[0] for row in conn.execute("SELECT id FROM documents WHERE source_path = %s", (doc_key,))]
+
+    def replace_document(self, doc_key: str, records) -> None:
+        with self._pool.connection() as conn, conn.transaction(), conn.cursor() as cur:
+            cur.execute("SELECT id FROM documents WHERE source_path = %s", (doc_key,))
+            fresh, surviving, stale = diff_document((row[0] for row in cur.fetchall()), records)
+            if stale:
+                cur.execute("DELETE FROM documents WHERE id = ANY(%s)", (stale,))
+            for i in range(0, len(fresh), self.upsert_batch_size):
+                self._write(cur, fresh[i : i + self.upsert_batch_size])
+            if surviving:
+                cur.executemany(UPDATE_METADATA_SQL, [_row(r)[4:] + (r.id,) for r in surviving])
+
+    def _query(self, query_vector, top_k: int, filters: Optional[Dict], query_text: Optional[str]) -> Tuple[str, List]:
+        if query_text and self.hybrid.enabled:
+            return _hybrid_query(query_vector, query_text, top_k, filters, self.index.metric, self.hybrid)
+        return _search_query(query_vector, top_k, filters, self.index.metric)
+
+    def search_batch(
+        self,
+        query_vectors: Sequence[List[float]],
+        top_k: int,
+        filters: Optional[Dict],
+        params: Optional[Dict] = None,
+        query_texts: Optional[Sequence[Optional[str]]] = None,
+    ) -> List[List[SearchResult]]:
+        if not len(query_vectors):
+            return []
+        statements, grouped = _batch_statements(query_vectors, top_k, filters, query_texts, self.index.metric, self.hybrid)
+        # Pipelined: the statements (and any SET LOCAL) go out in one round trip
+        with self._pool.connection() as conn:
+            with conn.pipeline(), (conn.transaction() if params else nullcontext()):
+                if params:
+                    conn.execute(*_set_sql(self.index.query_settings(params), local=True))
+                cursors = [conn.execute(query, args, prepare=True) for query, args in statements]
+            rows = [cur.fetchall() for cur in cursors]
+        return _batch_results(rows, grouped, len(query_vectors))
+
+    def search(
+        self,
+        query_vector: List[float],
+        top_k: int,
+        filters: Optional[Dict],
+        params: Optional[Dict] = None,
+        query_text: Optional[str] = None,
+    ) -> List[SearchResult]:
+        query, args = self._query(query_vector, top_k, filters, query_text)
+        with self._pool.connection() as conn, conn.cursor() as cur:
+            if not params:
+                cur.execute(query, args, prepare=True)
+                return _to_results(cur.fetchall())
+            # Per-query planner settings only last for this transaction
+            with conn.transaction():
+                cur.execute(*_set_sql(self.index.query_settings(params), local=True))
+                cur.execute(query, args, prepare=True)
+                return _to_results(cur.fetchall())
+
+    def close(self) -> None:
+        self._pool.close()
+
+
+class AsyncPgVectorClient(AsyncVectorClient):
+    """Async pgvector client on an ``AsyncConnectionPool`` for use from async endpoints.
+
+    Call ``await open()`` inside the running event loop before use. Bulk ingestion stays
+    on the sync client; this covers the request path.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        collection: str,
+        dims: int,
+        pool_min_size: int = 1,
+        pool_max_size: int = 10,
+        pool_timeout_s: float = 30.0,
+        index: Optional[Dict[str, Any]] = None,
+        hybrid: Optional[Dict[str, Any]] = None,
+        schema: Optional[str] = None,
+    ) -> None:
+        self.dsn = dsn
+        self.collection = collection
+        self.schema = schema
+        self.dims = dims
+        self.index = IndexSettings.from_config(index)
+        self.hybrid = HybridSettings.from_config(hybrid)
+        self._pool = AsyncConnectionPool(
+            self.dsn,
+            min_size=pool_min_size,
+            max_size=max(pool_min_size, pool_max_size),
+            timeout=pool_timeout_s,
+            kwargs={"autocommit": True},
+            configure=_configure_async(self.index, schema),
+            check=AsyncConnectionPool.check_connection,
+            name="pgvector-async",
+            open=False,
+        )
+
+    async def open(self) -> None:
+        await self._pool.open()
+
+    async def ensure_collection(self, name: str, dims: int) -> None:
+        self.dims = dims
+        async with self._pool.connection() as conn:
+            if self.schema:
+                await conn.execute(sql.SQL("CREATE SCHEMA IF NOT EXISTS {}").format(sql.Identifier(self.schema)))
+            await conn.execute(sql.SQL(SCHEMA_SQL).format(dims=sql.Literal(int(dims))))
+            if self.hybrid.enabled:
+                await conn.execute(sql.SQL(HYBRID_SCHEMA_SQL).format(language=sql.Literal(self.hybrid.language)))
+
+    async def search_batch(
+        self,
+        query_vectors: Sequence[List[float]],
+        top_k: int,
+        filters: Optional[Dict],
+        params: Optional[Dict] = None,
+        query_texts: Optional[Sequence[Optional[str]]] = None,
+    ) -> List[List[SearchResult]]:
+        if not len(query_vectors):
+            return []
+        statements, grouped = _batch_statements(query_vectors, top_k, filters, query_texts, self.index.metric, self.hybrid)
+        async with self._pool.connection() as conn:
+            async with conn.pipeline():
+                async with (conn.transaction() if params else nullcontext()):
+                    if params:
+                        await conn.execute(*_set_sql(self.index.query_settings(params), local=True))
+                    cursors = [await conn.execute(query, args, prepare=True) for query, args in statements]
+            rows = [await cur.fetchall() for cur in cursors]
+        return _batch_results(rows, grouped, len(query_vectors))
 
+    async def search(
+        self,
+        query_vector: List[float],
+        top_k: int,
+        filters: Optional[Dict],
+        params: Optional[Dict] = None,
+        query_text: Optional[str] = None,
+    ) -> List[SearchResult]:
+        if query_text and self.hybrid.enabled:
+            query, args = _hybrid_query(query_vector, query_text, top_k, filters, self.index.metric, self.hybrid)
+        else:
+            query, args = _search_query(query_vector, top_k, filters, self.index.metric)
+        async with self._pool.connection() as conn, conn.cursor() as cur:
+            if not params:
+                await cur.execute(query, args, prepare=True)
+                return _to_results(await cur.fetchall())
+            async with conn.transaction():
+                await cur.execute(*_set_sql(self.index.query_settings(params), local=True))
+                await cur.execute(query, args, prepare=True)
+                return _to_results(await cur.fetchall())
 
+    async def close(self) -> None:
+        await self._pool.close()
@@ -1,59 +1,377 @@
 from __future__ import annotations
 
 import os
-from typing import Dict, List, Optional
+import threading
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
 
-from qdrant_client import QdrantClient
+from qdrant_client import QdrantClient, models
 from qdrant_client.http.models import Distance, VectorParams
-from qdrant_client.models import PointStruct
+from qdrant_client.models import (
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    FieldCondition,
+    Filter,
+    Fusion,
+    FusionQuery,
+    HnswConfigDiff,
+    MatchValue,
+    Modifier,
+    PayloadSchemaType,
+    PointIdsList,
+    PointStruct,
+    Prefetch,
+    QuantizationSearchParams,
+    QueryRequest,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    SearchParams,
+    SetPayload,
+    SetPayloadOperation,
+    SparseIndexParams,
+    SparseVector,
+    SparseVectorParams,
+)
 
-from src.common.types import SearchResult
-from src.ingest.upsert import VectorClient
+from src.common.logging import get_logger
+from src.common.types import EmbeddingBatch, EmbeddingRecord, SearchResult
+from src.ingest.upsert import VectorClient, diff_document
+from src.search.hybrid import HybridSettings, bm25_document_vector, bm25_query_vector
+
+
+log = get_logger("search.qdrant")
+
+DENSE_VECTOR = "dense"
+SPARSE_VECTOR = "sparse"
+
+
+def _point_id(record_id: str) -> str:
+    """Qdrant point ids must be UUIDs or integers; record ids are 32 hex chars."""
+    try:
+        return str(uuid.UUID(hex=record_id))
+    except ValueError:
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, record_id))
+
+
+def _record_id(point_id) -> str:
+    try:
+        return uuid.UUID(str(point_id)).hex
+    except ValueError:
+        return str(point_id)
+
+
+@dataclass
+class CollectionSettings:
+    """Collection layout (``vectordb.qdrant``) and search-time defaults."""
+
+    m: int = 16
+    ef_construct: int = 100
+    quantization: Optional[str] = None  # scalar|binary
+    quantile: float = 0.99
+    always_ram: bool = True
+    on_disk: bool = False
+    on_disk_payload: bool = False
+    payload_indexes: List[str] = field(default_factory=lambda: ["source_path", "file_name", "doc_id", "sha256"])
+    hnsw_ef: Optional[int] = None
+    exact: bool = False
+    rescore: bool = True
+    oversampling: Optional[float] = None
+
+    @classmethod
+    def from_config(cls, qcfg: Optional[Dict[str, Any]]) -> "CollectionSettings":
+        qcfg = qcfg or {}
+        settings = cls(**{k: v for k, v in qcfg.items() if k in cls.__dataclass_fields__})
+        if settings.quantization not in (None, "scalar", "binary"):
+            raise ValueError(f"Unknown qdrant quantization: {settings.quantization}")
+        return settings
+
+    def quantization_config(self):
+        if self.quantization == "scalar":
+            return ScalarQuantization(scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=self.quantile, always_ram=self.always_ram))
+        if self.quantization == "binary":
+            return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=self.always_ram))
+        return None
+
+    def search_params(self, overrides: Optional[Dict[str, Any]] = None) -> Optional[SearchParams]:
+        """Defaults merged with per-query ``hnsw_ef``/``exact``/``rescore``/``oversampling``."""
+        o = overrides or {}
+        hnsw_ef = o.get("hnsw_ef", self.hnsw_ef)
+        exact = bool(o.get("exact", self.exact))
+        quantization = None
+        if self.quantization:
+            quantization = QuantizationSearchParams(rescore=bool(o.get("rescore", self.rescore)), oversampling=o.get("oversampling", self.oversampling))
+        if hnsw_ef is None and not exact and quantization is None:
+            return None
+        return SearchParams(hnsw_ef=hnsw_ef, exact=exact, quantization=quantization)
+
+
+def _to_results(points) -> List[SearchResult]:
+    out: List[SearchResult] = []
+    for r in points:
+        payload = r.payload or {}
+        out.append(
+            SearchResult(
+                id=_record_id(r.id),
+                score=r.score or 0.0,
+                text=payload.get("text", ""),
+                metadata={k: v for k, v in payload.items() if k != "text"},
+            )
+        )
+    return out
+
+
+def _to_filter(filters: Optional[Dict]) -> Optional[Filter]:
+    """Translate ``{"field": value}`` equality filters; ``Filter`` objects pass through."""
+    if not filters or isinstance(filters, Filter):
+        return filters or None
+    return Filter(must=[FieldCondition(key=k, match=MatchValue(value=v)) for k, v in filters.items()])
 
 
 class QdrantVectorClient(VectorClient):
-    def __init__(self, url: str | None, host: str | None, port: int | None, api_key: str | None, collection: str, dims: int) -> None:
+    """Qdrant backend.
+
+    Upserts are buffered across calls (and so across documents) and sent as
+    ``upload_points`` requests of ``upload_batch_size`` points with ``wait=False``;
+    ``flush()`` sends the remainder and waits for it, which also acts as a barrier
+    for the earlier un-awaited batches. ``location=":memory:"`` or a local path runs
+    Qdrant in-process.
+
+    ``settings`` (``vectordb.qdrant``) shape the collection when it is first created:
+    HNSW ``m``/``ef_construct``, optional scalar or binary quantization, on-disk
+    vectors and payload, and keyword payload indexes for the filterable metadata
+    fields. ``hnsw_ef``, ``exact``, ``rescore`` and ``oversampling`` are search-time
+    defaults that can be overridden per query through ``params``.
+
+    With ``search.hybrid`` a new collection gets a named dense vector plus a sparse BM25
+    vector (term weights computed here, IDF applied by Qdrant); searches given
+    ``query_text`` prefetch candidates from both and fuse them with RRF server-side.
+    Collections created without the sparse vector keep serving dense-only searches.
+    """
+
+    def __init__(
+        self,
+        url: str | None,
+        host: str | None,
+        port: int | None,
+        api_key: str | None,
+        collection: str,
+        dims: int,
+        location: str | None = None,
+        prefer_grpc: bool = False,
+        grpc_port: int = 6334,
+        upload_batch_size: int = 256,
+        upload_parallel: int = 1,
+        timeout_s: int | None = None,
+        settings: Optional[Dict[str, Any]] = None,
+        hybrid: Optional[Dict[str, Any]] = None,
+    ) -> None:
         self.collection = collection
-        if url:
-            self.client = QdrantClient(url=url, api_key=api_key or os.getenv("QDRANT_API_KEY"))
+        self.settings = CollectionSettings.from_config(settings)
+        self.hybrid = HybridSettings.from_config(hybrid)
+        # Layout of the collection in use, read back in ensure_collection
+        self._dense_name: Optional[str] = None
+        self._sparse = False
+        api_key = api_key or os.getenv("QDRANT_API_KEY")
+        if location:
+            self.client = QdrantClient(location=location)
+        elif url:
+            self.client = QdrantClient(url=url, api_key=api_key, prefer_grpc=prefer_grpc, grpc_port=grpc_port, timeout=timeout_s)
         else:
-            self.client = QdrantClient(host=host or "localhost", port=port or 6333, api_key=api_key or os.getenv("QDRANT_API_KEY"))
+            self.client = QdrantClient(
+                host=host or "localhost", port=port or 6333, api_key=api_key, prefer_grpc=prefer_grpc, grpc_port=grpc_port, timeout=timeout_s
+            )
         self.dims = dims
+        self.upload_batch_size = max(1, upload_batch_size)
+        # upload_points parallelism uses worker processes, which in-process mode can't share
+        self.upload_parallel = 1 if location else max(1, upload_parallel)
+        self._local = bool(location)
+        self._buffer: List[PointStruct] = []
+        self._unacked: Optional[PointStruct] = None
+        # Set when a buffered upload fails, so the next flush cannot report those points stored
+        self._failed: Optional[BaseException] = None
+        self._lock = threading.Lock()
 
     def ensure_collection(self, name: str, dims: int) -> None:
+        # Never recreate: an existing collection and its data are left as they are
         self.dims = dims
-        has = False
-        try:
-            _ = self.client.get_collection(name)
-            has = True
-        except Exception:
-            has = False
-        if not has:
-            self.client.recreate_collection(
+        s = self.settings
+        if not self.client.collection_exists(name):
+            dense = VectorParams(size=dims, distance=Distance.COSINE, on_disk=s.on_disk)
+            hybrid = self.hybrid.enabled
+            self.client.create_collection(
                 collection_name=name,
-                vectors_config=VectorParams(size=dims, distance=Distance.COSINE),
+                vectors_config={DENSE_VECTOR: dense} if hybrid else dense,
+                sparse_vectors_config=(
+                    {SPARSE_VECTOR: SparseVectorParams(index=SparseIndexParams(on_disk=s.on_disk), modifier=Modifier.IDF)} if hybrid else None
+                ),
+                hnsw_config=HnswConfigDiff(m=s.m, ef_construct=s.ef_construct),
+                quantization_config=s.quantization_config(),
+                on_disk_payload=s.on_disk_payload,
             )
+        info = self.client.get_collection(name)
+        self._dense_name = DENSE_VECTOR if isinstance(info.config.params.vectors, dict) else None
+        self._sparse = SPARSE_VECTOR in (info.config.params.sparse_vectors or {})
+        if self.hybrid.enabled and not self._sparse:
+            log.warning(f"collection {name} has no sparse vector; hybrid search falls back to dense (recreate it to enable)")
+        if self._local:  # in-process Qdrant ignores payload indexes
+            return
+        indexed = set((info.payload_schema or {}).keys())
+        for field_name in s.payload_indexes:
+            if field_name not in indexed:
+                self.client.create_payload_index(collection_name=name, field_name=field_name, field_schema=PayloadSchemaType.KEYWORD)
 
     def upsert(self, records):
-        points = [
-            PointStruct(id=r.id, vector=r.vector, payload={"text": r.text, **r.metadata})
-            for r in records
-        ]
-        self.client.upsert(collection_name=self.collection, points=points)
-
-    def search(self, query_vector: List[float], top_k: int, filters: Optional[Dict]) -> List[SearchResult]:
-        res = self.client.search(collection_name=self.collection, query_vector=query_vector, limit=top_k, query_filter=filters)
-        out: List[SearchResult] = []
-        for r in res:
-            payload = r.payload or {}
-            out.append(
-                SearchResult(
-                    id=str(r.id),
-                    score=r.score or 0.0,
-                    text=payload.get("text", ""),
-                    metadata={k: v for k, v in payload.items() if k != "text"},
-                )
+        if isinstance(records, EmbeddingBatch):
+            # The wire formats need Python floats; convert the whole matrix in one call
+            points = [
+                PointStruct(id=_point_id(rid), vector=self._vector(vec, text), payload={"text": text, **meta})
+                for rid, vec, text, meta in zip(records.ids, records.vectors.tolist(), records.texts, records.metadata)
+            ]
+        else:
+            points = [
+                PointStruct(id=_point_id(r.id), vector=self._vector(r.vector, r.text), payload={"text": r.text, **r.metadata})
+                for r in records
+            ]
+        # Send only whole batches so each request carries upload_batch_size points
+        slab = self.upload_batch_size * self.upload_parallel
+        with self._lock:
+            self._buffer.extend(points)
+            while len(self._buffer) >= slab:
+                batch, self._buffer = self._buffer[:slab], self._buffer[slab:]
+                self._upload(batch)
+
+    def _vector(self, dense, text: str):
+        if self._dense_name is None:
+            return dense
+        vector: Dict[str, Any] = {self._dense_name: dense}
+        if self._sparse:
+            indices, values = bm25_document_vector(text, self.hybrid)
+            vector[SPARSE_VECTOR] = SparseVector(indices=indices, values=values)
+        return vector
+
+    def _upload(self, points: List[PointStruct]) -> None:
+        try:
+            self.client.upload_points(
+                collection_name=self.collection,
+                points=points,
+                batch_size=self.upload_batch_size,
+                parallel=self.upload_parallel,
+                wait=False,
+            )
+        except BaseException as exc:
+            self._failed = exc
+            raise
+        self._unacked = points[-1]
+
+    def flush(self) -> None:
+        """Send buffered points and wait until all of them are applied.
+
+        Raises if any upload since the last flush failed; buffered points are dropped
+        either way, so a caller never sees a successful flush with points missing.
+        """
+        with self._lock:
+            pending, self._buffer = self._buffer, []
+            unacked, self._unacked = self._unacked, None
+            failed, self._failed = self._failed, None
+            if failed is not None:
+                raise RuntimeError(f"earlier upload to {self.collection} failed; buffered points were dropped") from failed
+            if not pending and unacked is not None:
+                # Re-writing the last point with wait=True is an idempotent barrier
+                pending = [unacked]
+            if pending:
+                self.client.upsert(collection_name=self.collection, points=pending, wait=True)
+
+    def delete(self, ids: List[str]) -> None:
+        if ids:
+            self.client.delete(collection_name=self.collection, points_selector=PointIdsList(points=[_point_id(i) for i in ids]))
+
+    def document_ids(self, doc_key: str) -> List[str]:
+        flt = Filter(must=[FieldCondition(key="source_path", match=MatchValue(value=doc_key))])
+        ids: List[str] = []
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection, scroll_filter=flt, limit=1024, offset=offset, with_payload=False, with_vectors=False
+            )
+            ids.extend(_record_id(p.id) for p in points)
+            if offset is None:
+                return ids
+
+    def replace_document(self, doc_key: str, records: List[EmbeddingRecord]) -> None:
+        fresh, surviving, stale = diff_document(self.document_ids(doc_key), records)
+        if fresh:
+            self.upsert(fresh)
+        self.delete(stale)
+        if surviving:
+            # Surviving chunks keep their stored vector; refresh payloads in one request
+            self.client.batch_update_points(
+                collection_name=self.collection,
+                update_operations=[
+                    SetPayloadOperation(set_payload=SetPayload(payload={"text": r.text, **r.metadata}, points=[_point_id(r.id)]))
+                    for r in surviving
+                ],
             )
-        return out
+
+    def _fusion(self):
+        # Parameterized RRF needs a recent client; older ones fuse with Qdrant's default constant
+        if hasattr(models, "RrfQuery"):
+            return models.RrfQuery(rrf=models.Rrf(k=int(self.hybrid.rrf_k)))
+        return FusionQuery(fusion=Fusion.RRF)
+
+    def _request(self, query_vector, top_k: int, flt: Optional[Filter], search_params, query_text: Optional[str]) -> QueryRequest:
+        if query_text and self.hybrid.enabled and self._sparse:
+            limit = self.hybrid.candidate_limit(top_k)
+            indices, values = bm25_query_vector(query_text)
+            return QueryRequest(
+                prefetch=[
+                    Prefetch(query=query_vector, using=self._dense_name, filter=flt, params=search_params, limit=limit),
+                    Prefetch(query=SparseVector(indices=indices, values=values), using=SPARSE_VECTOR, filter=flt, limit=limit),
+                ],
+                query=self._fusion(),
+                limit=top_k,
+                with_payload=True,
+            )
+        return QueryRequest(query=query_vector, using=self._dense_name, filter=flt, params=search_params, limit=top_k, with_payload=True)
+
+    def search(
+        self,
+        query_vector: List[float],
+        top_k: int,
+        filters: Optional[Dict],
+        params: Optional[Dict] = None,
+        query_text: Optional[str] = None,
+    ) -> List[SearchResult]:
+        req = self._request(query_vector, top_k, _to_filter(filters), self.settings.search_params(params), query_text)
+        res = self.client.query_points(
+            collection_name=self.collection,
+            prefetch=req.prefetch,
+            query=req.query,
+            using=req.using,
+            query_filter=req.filter,
+            search_params=req.params,
+            limit=req.limit,
+            with_payload=True,
+        )
+        return _to_results(res.points)
+
+    def search_batch(
+        self,
+        query_vectors: Sequence[List[float]],
+        top_k: int,
+        filters: Optional[Dict],
+        params: Optional[Dict] = None,
+        query_texts: Optional[Sequence[Optional[str]]] = None,
+    ) -> List[List[SearchResult]]:
+        if not len(query_vectors):
+            return []
+        flt = _to_filter(filters)
+        search_params = self.settings.search_params(params)
+        texts = query_texts or [None] * len(query_vectors)
+        requests = [self._request(v, top_k, flt, search_params, t) for v, t in zip(query_vectors, texts)]
+        # All queries (dense or fused) in one request
+        responses = self.client.query_batch_points(collection_name=self.collection, requests=requests)
+        return [_to_results(res.points) for res in responses]
 
 
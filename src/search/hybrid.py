@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import re
+import zlib
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+# Identifiers such as "AB-1234", "v2.3.1" or "M8x1.25" stay single terms
+TOKEN_RE = re.compile(r"\w+(?:[-./]\w+)*")
+
+
+@dataclass
+class HybridSettings:
+    """``search.hybrid`` plus its ``search.hybrid_options`` (fusion and lexical parameters)."""
+
+    enabled: bool = False
+    rrf_k: int = 60
+    candidates: int = 50  # per-retriever candidates fed into the fusion
+    language: str = "english"  # Postgres text search configuration
+    bm25_k1: float = 1.2
+    bm25_b: float = 0.75
+    avg_doc_tokens: int = 256  # length normalization for the sparse BM25 weights
+
+    @classmethod
+    def from_config(cls, scfg: Optional[Dict[str, Any]]) -> "HybridSettings":
+        scfg = scfg or {}
+        options = scfg.get("hybrid_options", {}) or {}
+        settings = cls(**{k: v for k, v in options.items() if k in cls.__dataclass_fields__})
+        settings.enabled = bool(scfg.get("hybrid", False))
+        return settings
+
+    def candidate_limit(self, top_k: int) -> int:
+        return max(int(top_k), int(self.candidates))
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())
+
+
+def _term_index(term: str) -> int:
+    # Stable across processes (unlike hash()); sparse indices are unsigned 32-bit
+    return zlib.crc32(term.encode("utf-8"))
+
+
+def bm25_document_vector(text: str, settings: HybridSettings) -> Tuple[List[int], List[float]]:
+    """Sparse document vector of BM25 term-frequency weights; IDF is applied by the engine."""
+    counts = Counter(_term_index(t) for t in tokenize(text))
+    length = sum(counts.values())
+    if not length:
+        return [], []
+    k1, b = settings.bm25_k1, settings.bm25_b
+    norm = k1 * (1 - b + b * length / max(1, settings.avg_doc_tokens))
+    indices = sorted(counts)
+    return indices, [counts[i] * (k1 + 1) / (counts[i] + norm) for i in indices]
+
+
+def bm25_query_vector(text: str) -> Tuple[List[int], List[float]]:
+    indices = sorted({_term_index(t) for t in tokenize(text)})
+    return indices, [1.0] * len(indices)
+
+
+def rrf_fuse(rankings: Sequence[Sequence[Hashable]], k: int, top_k: int) -> List[Tuple[Any, float]]:
+    """Reciprocal-rank fusion of ranked id lists: score(id) = sum over lists of 1 / (k + rank)."""
+    scores: Dict[Any, float] = {}
+    for ranking in rankings:
+        for rank, rid in enumerate(ranking, start=1):
+            scores[rid] = scores.get(rid, 0.0) + 1.0 / (k + rank)
+    fused = sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))
+    return fused[:top_k]
@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence
+
+import numpy as np
+
+from src.common import metrics
+from src.common.types import SearchResult
+from src.ingest.embed_cache import cache_key
+
+
+def normalize_query(text: str) -> str:
+    """Unicode-normalize and collapse whitespace, so trivially different spellings share entries."""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+class TTLCache:
+    """Thread-safe LRU map whose entries also expire ``ttl_s`` seconds after insertion."""
+
+    def __init__(self, max_entries: int, ttl_s: float, clock: Callable[[], float] = time.monotonic, name: str = "ttl") -> None:
+        self.name = name
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_s = float(ttl_s)
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > self._clock():
+                self._data.move_to_end(key)
+                self.hits += 1
+                hit = entry[1]
+            else:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                hit = None
+        metrics.CACHE_LOOKUPS.inc(cache=self.name, result="miss" if hit is None else "hit")
+        return hit
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (self._clock() + self.ttl_s, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl_s,
+            }
+
+
+def generation_path(cfg: Dict[str, Any]) -> str:
+    ccfg = cfg.get("search", {}).get("cache", {}) or {}
+    cache_dir = cfg.get("data", {}).get("cache_dir", ".cache/docling")
+    return ccfg.get("generation_path") or str(Path(cache_dir) / "generations" / cfg["vectordb"]["collection"])
+
+
+class CollectionGeneration:
+    """Counter in a small file that writers bump whenever a collection's contents change.
+
+    Readers only ``stat`` the file per lookup and re-read it when its mtime or size changes,
+    so every API worker on the same host (or sharing the file system) sees a bump at once.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._stamp: Optional[tuple] = None
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def current(self) -> int:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return 0
+        stamp = (st.st_mtime_ns, st.st_size, st.st_ino)
+        with self._lock:
+            if stamp != self._stamp:
+                try:
+                    self._value = int(Path(self.path).read_text().strip() or 0)
+                except (OSError, ValueError):
+                    self._value += 1  # unreadable mid-replace: treat as changed
+                self._stamp = stamp
+            return self._value
+
+    def bump(self) -> int:
+        value = self.current() + 1
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        Path(tmp).write_text(str(value))
+        # Atomic swap; the new inode changes the stamp even within one mtime tick
+        os.replace(tmp, self.path)
+        return value
+
+
+def bump_generation(cfg: Dict[str, Any]) -> int:
+    """Invalidate cached search results for the configured collection."""
+    return CollectionGeneration(generation_path(cfg)).bump()
+
+
+def _vector_hash(vector: Sequence[float]) -> str:
+    return hashlib.blake2b(np.asarray(vector, dtype=np.float32).tobytes(), digest_size=16).hexdigest()
+
+
+class QueryCache:
+    """Query-embedding and search-result caches for the request path.
+
+    Query vectors are keyed by embedding provider, model, dimensions and normalized query
+    text. Results are keyed by the query vector's hash, ``top_k``, filters, search params,
+    the hybrid query text and the collection generation, so a bump by ingest makes every
+    earlier result unreachable; they then age out of the LRU.
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        model: str,
+        dims: int,
+        generation: CollectionGeneration,
+        embedding_entries: int = 10000,
+        embedding_ttl_s: float = 3600,
+        result_entries: int = 5000,
+        result_ttl_s: float = 300,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.provider = provider
+        self.model = model
+        self.dims = dims
+        self.generation = generation
+        self.embeddings = TTLCache(embedding_entries, embedding_ttl_s, clock, name="query_embeddings")
+        self.results = TTLCache(result_entries, result_ttl_s, clock, name="search_results")
+
+    def _embedding_key(self, query: str) -> str:
+        return cache_key(self.provider, self.model, self.dims, normalize_query(query))
+
+    def get_vector(self, query: str) -> Optional[List[float]]:
+        vec = self.embeddings.get(self._embedding_key(query))
+        return vec.tolist() if vec is not None else None
+
+    def put_vector(self, query: str, vector: Sequence[float]) -> None:
+        # float32 arrays are ~4x smaller than lists of Python floats
+        self.embeddings.put(self._embedding_key(query), np.asarray(vector, dtype=np.float32))
+
+    def result_key(
+        self,
+        vector: Sequence[float],
+        top_k: int,
+        filters: Optional[Dict],
+        params: Optional[Dict] = None,
+        query_text: Optional[str] = None,
+    ) -> tuple:
+        return (
+            _vector_hash(vector),
+            int(top_k),
+            json.dumps(filters or {}, sort_keys=True, default=str),
+            json.dumps(params or {}, sort_keys=True, default=str),
+            normalize_query(query_text) if query_text else None,
+            self.generation.current(),
+        )
+
+    def get_results(self, key: tuple) -> Optional[List[SearchResult]]:
+        return self.results.get(key)
+
+    def put_results(self, key: tuple, results: List[SearchResult]) -> None:
+        self.results.put(key, list(results))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"embeddings": self.embeddings.stats(), "results": self.results.stats(), "generation": self.generation.current()}
+
+
+def make_query_cache(cfg: Dict[str, Any], dims: int) -> Optional[QueryCache]:
+    ccfg = cfg.get("search", {}).get("cache", {}) or {}
+    if not ccfg.get("enabled", False):
+        return None
+    ecfg = ccfg.get("embeddings", {}) or {}
+    rcfg = ccfg.get("results", {}) or {}
+    return QueryCache(
+        provider=cfg["embeddings"]["provider"],
+        model=cfg["embeddings"]["model"],
+        dims=dims,
+        generation=CollectionGeneration(generation_path(cfg)),
+        embedding_entries=int(ecfg.get("max_entries", 10000)),
+        embedding_ttl_s=float(ecfg.get("ttl_s", 3600)),
+        result_entries=int(rcfg.get("max_entries", 5000)),
+        result_ttl_s=float(rcfg.get("ttl_s", 300)),
+    )
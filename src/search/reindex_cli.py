@@ -0,0 +1,23 @@
+import argparse
+
+from src.common.config import load_config
+from src.common.logging import setup_logging
+from src.ingest.upsert import make_vector_client
+from src.search.query_cache import bump_generation
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rebuild the vector index, e.g. after a bulk load")
+    parser.add_argument("--config", required=True)
+    args = parser.parse_args()
+
+    cfg = load_config(args.config)
+    setup_logging(level=cfg.get("logging", {}).get("level", "INFO"), json_output=cfg.get("logging", {}).get("json", True))
+    client = make_vector_client(cfg)
+    client.reindex()
+    client.close()
+    bump_generation(cfg)
+
+
+if __name__ == "__main__":
+    main()
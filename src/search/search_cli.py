@@ -1,9 +1,6 @@
 import argparse
-import os
 
-from src.common.config import load_config
-from src.ingest.embed import Embedder
-from src.ingest.upsert import make_vector_client
+from src.rag.retrieve import Retriever
 
 
 def main() -> None:
@@ -13,19 +10,11 @@ def main() -> None:
     parser.add_argument("--top_k", type=int, default=5)
     args = parser.parse_args()
 
-    cfg = load_config(args.config)
-    embedder = Embedder(
-        provider=cfg["embeddings"]["provider"],
-        model=cfg["embeddings"]["model"],
-        batch_size=cfg["embeddings"].get("batch_size", 64),
-        timeout_s=cfg["embeddings"].get("request_timeout_s", 60),
-    )
-    dims = embedder.embedding_dimensions()
-    client = make_vector_client(cfg)
-    client.ensure_collection(cfg["vectordb"]["collection"], dims)
-
-    qvec = embedder.embed_texts([args.query])[0]
-    results = client.search(qvec, args.top_k, cfg.get("search", {}).get("filters"))
+    retriever = Retriever.from_path(args.config)
+    try:
+        results = retriever.retrieve(args.query, args.top_k, retriever.cfg.get("search", {}).get("filters"))
+    finally:
+        retriever.close()
 
     for r in results:
         print(f"score={r.score:.3f} id={r.id} file={r.metadata.get('file_name','')} section={r.metadata.get('section_path','')}")
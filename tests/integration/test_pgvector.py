@@ -0,0 +1,229 @@
+import os
+
+import pytest
+
+from src.common.types import Chunk, EmbeddingBatch
+from src.ingest.upsert import build_records
+
+DSN = os.getenv("PGVECTOR_TEST_DSN")
+
+pytestmark = [
+    pytest.mark.integration,
+    pytest.mark.skipif(not DSN, reason="set PGVECTOR_TEST_DSN to a scratch database with pgvector"),
+]
+
+DIMS = 8
+
+
+def _make_client(**kwargs):
+    import psycopg
+
+    from src.search.client_pgvector import PgVectorClient
+
+    with psycopg.connect(DSN, autocommit=True) as conn:
+        conn.execute("CREATE EXTENSION IF NOT EXISTS vector")
+        conn.execute("DROP TABLE IF EXISTS documents")
+    c = PgVectorClient(dsn=DSN, collection="documents", dims=DIMS, **kwargs)
+    c.ensure_collection("documents", DIMS)
+    return c
+
+
+@pytest.fixture
+def client():
+    c = _make_client(upsert_batch_size=3)
+    yield c
+    c.close()
+
+
+def _records(texts, source_path="docs/a.pdf"):
+    chunks = [
+        Chunk(
+            doc_id="d",
+            chunk_index=i,
+            text=t,
+            char_span=(i, i + len(t)),
+            section_path="S",
+            page_numbers=[1],
+            metadata={"source_path": source_path, "file_name": "a.pdf", "sha256": "v1", "doc_id": "d"},
+        )
+        for i, t in enumerate(texts)
+    ]
+    return build_records(chunks, [[float(i + 1)] + [0.5] * (DIMS - 1) for i in range(len(chunks))])
+
+
+def _ids(client, source_path="docs/a.pdf"):
+    with client._pool.connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT id FROM documents WHERE source_path = %s", (source_path,))
+        return sorted(row[0] for row in cur.fetchall())
+
+
+@pytest.mark.parametrize("method", ["copy", "insert"])
+def test_upsert_methods_round_trip(client, method):
+    client.upsert_method = method
+    records = _records([f"chunk {i}" for i in range(7)])
+    client.upsert(records)
+    client.upsert(records[:2])
+    assert _ids(client) == sorted(r.id for r in records)
+    with client._pool.connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT page_numbers, char_span FROM documents WHERE id = %s", (records[1].id,))
+        assert cur.fetchone() == ([1], [1, 8])
+
+
+@pytest.mark.parametrize("method", ["copy", "insert"])
+def test_upsert_accepts_columnar_batches(client, method):
+    client.upsert_method = method
+    batch = EmbeddingBatch.from_records(_records([f"chunk {i}" for i in range(5)]))
+    client.upsert(batch)
+    client.replace_document("docs/a.pdf", batch[:3])
+    assert _ids(client) == sorted(batch.ids[:3])
+    with client._pool.connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT vector FROM documents WHERE id = %s", (batch.ids[2],))
+        assert list(cur.fetchone()[0].to_list()) == batch.vectors[2].tolist()
+
+
+def test_replace_document_removes_stale_chunks(client):
+    client.replace_document("docs/a.pdf", _records(["intro", "body", "outro"]))
+    new = _records(["intro", "body edited"])
+    client.replace_document("docs/a.pdf", new)
+    assert _ids(client) == sorted(r.id for r in new)
+    assert sorted(client.document_ids("docs/a.pdf")) == _ids(client)
+
+
+def test_search_filters_reject_unknown_columns(client):
+    client.upsert(_records(["alpha", "beta"]))
+    results = client.search([1.0] + [0.5] * (DIMS - 1), 5, {"source_path": "docs/a.pdf"})
+    assert len(results) == 2
+    with pytest.raises(ValueError):
+        client.search([1.0] * DIMS, 5, {"1=1; DROP TABLE documents; --": "x"})
+
+
+def test_async_client_searches_through_pool(client):
+    import asyncio
+
+    from src.search.client_pgvector import AsyncPgVectorClient
+
+    client.upsert(_records(["alpha", "beta", "gamma"]))
+
+    async def run():
+        aclient = AsyncPgVectorClient(dsn=DSN, collection="documents", dims=DIMS, pool_max_size=4)
+        await aclient.open()
+        try:
+            query = [1.0] + [0.5] * (DIMS - 1)
+            return await asyncio.gather(*(aclient.search(query, 2, None) for _ in range(8)))
+        finally:
+            await aclient.close()
+
+    batches = asyncio.run(run())
+    assert all(len(b) == 2 for b in batches)
+    assert len({tuple(r.id for r in b) for b in batches}) == 1
+
+
+def test_search_batch_is_one_lateral_statement(client):
+    import asyncio
+
+    from src.search.client_pgvector import AsyncPgVectorClient
+
+    client.upsert(_records([f"chunk {i}" for i in range(6)]))
+    queries = [[float(i)] + [0.5] * (DIMS - 1) for i in (1, 4, 6)]
+    expected = [[r.id for r in client.search(q, 2, {"source_path": "docs/a.pdf"})] for q in queries]
+    batch = client.search_batch(queries, 2, {"source_path": "docs/a.pdf"})
+    assert [[r.id for r in res] for res in batch] == expected
+    assert [[r.id for r in res] for res in client.search_batch(queries, 2, None, params={"ef_search": 80})] == expected
+
+    async def run():
+        aclient = AsyncPgVectorClient(dsn=DSN, collection="documents", dims=DIMS)
+        await aclient.open()
+        try:
+            return await aclient.search_batch(queries, 2, None)
+        finally:
+            await aclient.close()
+
+    assert [[r.id for r in res] for res in asyncio.run(run())] == expected
+
+
+def _explain(client, filters=None):
+    from src.search.client_pgvector import _search_query
+
+    query, args = _search_query([1.0] * DIMS, 5, filters, client.index.metric)
+    with client._pool.connection() as conn, conn.transaction(), conn.cursor() as cur:
+        # Tiny tables are cheaper to scan; make the planner show whether the index can serve the query
+        cur.execute("SET LOCAL enable_seqscan = off")
+        cur.execute("EXPLAIN " + query, args)
+        return "\n".join(row[0] for row in cur.fetchall())
+
+
+def _load(client, n=300):
+    import random
+
+    rnd = random.Random(0)
+    chunks = [
+        Chunk(doc_id="d", chunk_index=i, text=f"chunk {i}", char_span=(0, 0), section_path=None, page_numbers=[], metadata={"source_path": "docs/a.pdf"})
+        for i in range(n)
+    ]
+    client.upsert(build_records(chunks, [[rnd.random() for _ in range(DIMS)] for _ in range(n)]))
+
+
+@pytest.mark.parametrize("metric", ["cosine", "l2", "ip"])
+def test_hnsw_index_serves_search(metric):
+    client = _make_client(index={"type": "hnsw", "metric": metric})
+    try:
+        _load(client)
+        plan = _explain(client)
+        assert "documents_vec_idx" in plan, plan
+        assert len(client.search([1.0] * DIMS, 5, None, params={"ef_search": 100})) == 5
+    finally:
+        client.close()
+
+
+def test_ivfflat_index_is_built_by_reindex_after_load():
+    client = _make_client(index={"type": "ivfflat", "metric": "cosine", "probes": 3})
+    try:
+        with client._pool.connection() as conn:
+            assert conn.execute("SELECT count(*) FROM pg_indexes WHERE indexname = 'documents_vec_idx'").fetchone()[0] == 0
+        _load(client, n=2000)
+        client.reindex()
+        with client._pool.connection() as conn:
+            indexdef = conn.execute("SELECT indexdef FROM pg_indexes WHERE indexname = 'documents_vec_idx'").fetchone()[0]
+        assert "lists='2'" in indexdef
+        assert "documents_vec_idx" in _explain(client)
+        assert len(client.search([1.0] * DIMS, 5, None, params={"probes": 2})) == 5
+    finally:
+        client.close()
+
+
+def test_hybrid_search_fuses_full_text_matches():
+    client = _make_client(hybrid={"hybrid": True, "hybrid_options": {"candidates": 10}})
+    try:
+        texts = ["torque settings overview", "torque table for fasteners", "error code XK-4471 means sensor fault"]
+        records = _records(texts)
+        client.upsert(records)
+        query = [1.0] + [0.5] * (DIMS - 1)  # dense-wise closest to the first chunk
+        assert client.search(query, 3, None)[0].text == texts[0]
+        results = client.search(query, 3, {"source_path": "docs/a.pdf"}, query_text="what does XK-4471 mean")
+        assert [r.text for r in results][0] == texts[2]
+        assert len(results) == 3
+        batch = client.search_batch([query, query], 3, None, query_texts=["what does XK-4471 mean", None])
+        assert batch[0][0].text == texts[2] and batch[1][0].text == texts[0]
+    finally:
+        client.close()
+
+
+def test_eval_bench_variant_leaves_documents_table_alone(client, tmp_path):
+    import argparse
+
+    import psycopg
+
+    from src.eval import bench
+
+    client.upsert(_records(["real chunk"]))
+    matrix = tmp_path / "matrix.yaml"
+    matrix.write_text("variants:\n  - name: pg-hnsw\n    vectordb: {provider: pgvector, index: {type: hnsw}}\n")
+    cfg = {"vectordb": {"provider": "pgvector", "collection": "documents", "dsn": DSN}}
+    args = argparse.Namespace(matrix=str(matrix), only=None, docs=300, num_queries=10, dims=16, seed=1, k=5, concurrency=[1])
+    (variant,) = bench(cfg, args)["variants"]
+    assert variant["recall@5"] > 0.5
+
+    assert _ids(client) == [r.id for r in _records(["real chunk"])]
+    with psycopg.connect(DSN, autocommit=True) as conn:
+        assert conn.execute("SELECT count(*) FROM pg_namespace WHERE nspname = 'eval_bench_pg_hnsw'").fetchone()[0] == 0
+        assert conn.execute("SELECT indexdef FROM pg_indexes WHERE indexname = 'documents_vec_idx'").fetchone() is not None
@@ -0,0 +1,80 @@
+import asyncio
+import threading
+import time
+
+from src.search.batcher import EmbeddingBatcher
+
+
+class _Embed:
+    def __init__(self, delay=0.0, fail=False):
+        self.calls = []
+        self.delay = delay
+        self.fail = fail
+        self._lock = threading.Lock()
+
+    def __call__(self, texts):
+        with self._lock:
+            self.calls.append(list(texts))
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("provider down")
+        return [[float(len(t))] for t in texts]
+
+
+def test_concurrent_queries_share_one_call():
+    embed = _Embed()
+    batcher = EmbeddingBatcher(embed, max_batch=64, max_wait_ms=20)
+
+    async def run():
+        return await asyncio.gather(*(batcher.embed(t) for t in ["a", "bb", "a", "ccc"]))
+
+    assert asyncio.run(run()) == [[1.0], [2.0], [1.0], [3.0]]
+    assert embed.calls == [["a", "bb", "ccc"]]  # duplicates embedded once
+    assert batcher.stats()["batches"] == 1 and batcher.stats()["items"] == 4
+
+
+def test_full_batches_are_sent_without_waiting():
+    embed = _Embed()
+    batcher = EmbeddingBatcher(embed, max_batch=2, max_wait_ms=10_000)
+
+    async def run():
+        return await asyncio.wait_for(asyncio.gather(*(batcher.embed(str(i)) for i in range(4))), timeout=5)
+
+    assert len(asyncio.run(run())) == 4
+    assert [len(c) for c in embed.calls] == [2, 2]
+
+
+def test_lone_query_is_sent_after_max_wait():
+    embed = _Embed()
+    batcher = EmbeddingBatcher(embed, max_batch=32, max_wait_ms=5)
+
+    async def run():
+        return await asyncio.wait_for(batcher.embed("x"), timeout=5)
+
+    assert asyncio.run(run()) == [1.0]
+
+
+def test_failures_reach_every_waiter():
+    batcher = EmbeddingBatcher(_Embed(fail=True), max_batch=8, max_wait_ms=1)
+
+    async def run():
+        return await asyncio.gather(*(batcher.embed(t) for t in "ab"), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_cancelled_waiter_does_not_break_the_batch():
+    embed = _Embed(delay=0.05)
+    batcher = EmbeddingBatcher(embed, max_batch=8, max_wait_ms=1)
+
+    async def run():
+        gone = asyncio.ensure_future(batcher.embed("gone"))
+        kept = asyncio.ensure_future(batcher.embed("kept"))
+        await asyncio.sleep(0.01)
+        gone.cancel()
+        result = await kept
+        await batcher.close()
+        return result, gone.cancelled()
+
+    assert asyncio.run(run()) == ([4.0], True)
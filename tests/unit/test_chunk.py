@@ -1,5 +1,7 @@
+from collections.abc import Iterator
+
 from src.common.types import DocumentConversion, SectionText
-from src.ingest.chunk import chunk_document
+from src.ingest.chunk import chunk_document, iter_chunks
 
 
 def test_chunk_hierarchical_basic():
@@ -32,3 +34,32 @@ def test_chunk_docling_uses_markdown():
     assert len(chunks) >= 2
 
 
+def _doc(**kwargs):
+    return DocumentConversion(doc_id="id", title=None, author=None, created_at=None, modified_at=None, language="en", **kwargs)
+
+
+def test_char_spans_are_exact_slices_with_overlap():
+    text = "Überblick: naïve café ☕ prices rose 12% — 漢字 too. " * 20
+    chunks = chunk_document(_doc(sections=[SectionText(section_path="A", page_numbers=[2], text=text)]), "hierarchical", 16, 5)
+    assert len(chunks) > 3
+    for c in chunks:
+        assert text[c.char_span[0] : c.char_span[1]] == c.text
+        assert c.page_numbers == [2] and c.section_path == "A"
+    # Windows overlap, so each chunk starts before the previous one ends
+    assert all(b.char_span[0] < a.char_span[1] for a, b in zip(chunks, chunks[1:]))
+    assert chunks[-1].char_span[1] == len(text)
+    assert [c.chunk_index for c in chunks] == list(range(len(chunks)))
+
+
+def test_markdown_spans_point_into_the_document():
+    md = "# Title\n\n  intro text\n\n## Sub\ncontent here\n"
+    chunks = chunk_document(_doc(markdown=md), "docling", 50, 0)
+    assert [md[c.char_span[0] : c.char_span[1]] for c in chunks] == [c.text for c in chunks]
+    assert chunks[1].text == "## Sub\ncontent here"
+
+
+def test_chunks_stream_and_overlap_cannot_stall():
+    gen = iter_chunks(_doc(sections=[SectionText(section_path="A", page_numbers=[], text="one two three four five")]), "token", 2, 5)
+    assert isinstance(gen, Iterator)
+    chunks = list(gen)
+    assert chunks[-1].char_span[1] == len("one two three four five")
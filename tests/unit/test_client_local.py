@@ -0,0 +1,193 @@
+import numpy as np
+import pytest
+
+from src.common.types import Chunk, EmbeddingBatch
+from src.ingest.upsert import build_records
+from src.search import client_local
+from src.search.client_local import LocalVectorClient
+
+
+def _make(tmp_path, dims=4, hybrid=None, **settings):
+    c = LocalVectorClient(collection="documents", dims=dims, settings={"path": str(tmp_path), **settings}, hybrid=hybrid)
+    c.ensure_collection("documents", dims)
+    return c
+
+
+def _records(texts, vectors, source_path="docs/a.pdf"):
+    chunks = [
+        Chunk(
+            doc_id="d",
+            chunk_index=i,
+            text=t,
+            char_span=(0, len(t)),
+            section_path="S",
+            page_numbers=[1],
+            metadata={"source_path": source_path, "file_name": source_path.rsplit("/", 1)[-1], "lang": "en" if i % 2 else "de"},
+        )
+        for i, t in enumerate(texts)
+    ]
+    return build_records(chunks, [list(map(float, v)) for v in vectors])
+
+
+def _eye(n, dims=4):
+    return [[1.0 if j == i % dims else 0.1 * i for j in range(dims)] for i in range(n)]
+
+
+def test_round_trip_filters_and_segments(tmp_path):
+    client = _make(tmp_path, segment_rows=3)
+    records = _records([f"chunk {i}" for i in range(7)], _eye(7))
+    client.upsert(records)
+    assert len(client._segments) == 3
+
+    (best,) = client.search([0.0, 0.0, 1.0, 0.0], 1, None)
+    assert best.id == records[2].id and best.metadata["page_numbers"] == [1]
+    assert best.score == pytest.approx(float(np.dot(_eye(7)[2], [0, 0, 1, 0]) / np.linalg.norm(_eye(7)[2])), rel=1e-5)
+    assert {r.id for r in client.search([1.0, 1.0, 1.0, 1.0], 10, {"lang": "en"})} == {r.id for r in records[1::2]}
+    assert len(client.search([1.0, 0.0, 0.0, 0.0], 10, {"file_name": "a.pdf", "lang": "de"})) == 4
+
+
+def test_upsert_replaces_and_delete_retires_slots(tmp_path):
+    client = _make(tmp_path)
+    records = _records(["a", "b", "c"], _eye(3))
+    client.upsert(records)
+    client.upsert(EmbeddingBatch.from_records(records[:1]))
+    client.delete([records[1].id])
+    assert sorted(r.id for r in client.search([1.0, 1.0, 1.0, 1.0], 10, None)) == sorted([records[0].id, records[2].id])
+    assert client._next_slot == 4
+
+    client.reindex()  # compacts the retired slots
+    assert client._next_slot == 2
+    assert client.search([0.0, 0.0, 1.0, 0.0], 1, None)[0].id == records[2].id
+
+
+def _compaction_fixture(tmp_path):
+    client = _make(tmp_path, segment_rows=3)
+    records = _records([f"chunk {i}" for i in range(7)], _eye(7))
+    client.upsert(records)
+    client.delete([records[i].id for i in (0, 3, 4)])
+    return client, [records[i] for i in (1, 2, 5, 6)]
+
+
+def _crash(*args, **kwargs):
+    raise KeyboardInterrupt
+
+
+def _assert_intact(tmp_path, kept):
+    reopened = _make(tmp_path, segment_rows=3)
+    assert sorted(r.id for r in reopened.search([1.0, 1.0, 1.0, 1.0], 10, None)) == sorted(r.id for r in kept)
+    assert reopened.search(_eye(7)[5], 1, None)[0].id == kept[2].id
+    assert not list(tmp_path.glob("documents/*.compact"))
+    return reopened
+
+
+def test_compaction_interrupted_before_commit_keeps_old_layout(tmp_path, monkeypatch):
+    client, kept = _compaction_fixture(tmp_path)
+    monkeypatch.setattr(client_local, "_close_synced", _crash)
+    with pytest.raises(KeyboardInterrupt):
+        client.reindex()
+    monkeypatch.undo()
+    client.close()
+    assert _assert_intact(tmp_path, kept)._next_slot == 7
+
+
+def test_compaction_interrupted_after_commit_is_finished_on_open(tmp_path, monkeypatch):
+    client, kept = _compaction_fixture(tmp_path)
+    monkeypatch.setattr(LocalVectorClient, "_finish_compaction", _crash)
+    with pytest.raises(KeyboardInterrupt):
+        client.reindex()
+    monkeypatch.undo()
+    client.close()
+    reopened = _assert_intact(tmp_path, kept)
+    assert reopened._next_slot == 4 and len(reopened._segments) == 2
+
+
+def test_reader_remaps_after_another_instance_appends_and_compacts(tmp_path):
+    writer = _make(tmp_path, segment_rows=3)
+    records = _records([f"chunk {i}" for i in range(7)], _eye(7))
+    writer.upsert(records[:2])
+    reader = _make(tmp_path, segment_rows=3)
+    assert len(reader.search([1.0, 1.0, 1.0, 1.0], 10, None)) == 2
+
+    writer.upsert(records[2:])
+    assert len(reader.search([1.0, 1.0, 1.0, 1.0], 10, None)) == 7 and len(reader._segments) == 3
+    writer.delete([records[i].id for i in (0, 3, 4)])
+    writer.reindex()
+    # Slots were renumbered: a stale mapping would pair vectors with the wrong text
+    assert len(reader._segments) == 3
+    for i in (1, 2, 5, 6):
+        hit = reader.search(_eye(7)[i], 1, None)[0]
+        assert (hit.id, hit.text) == (records[i].id, f"chunk {i}")
+    assert len(reader._segments) == 2
+
+
+def test_reader_maps_committed_compaction_before_its_files_are_renamed(tmp_path, monkeypatch):
+    writer, kept = _compaction_fixture(tmp_path)
+    reader = _make(tmp_path, segment_rows=3)
+    monkeypatch.setattr(LocalVectorClient, "_finish_compaction", _crash)
+    with pytest.raises(KeyboardInterrupt):
+        writer.reindex()
+    monkeypatch.undo()
+    assert list(tmp_path.glob("documents/*.compact"))
+    assert sorted(r.id for r in reader.search([1.0, 1.0, 1.0, 1.0], 10, None)) == sorted(r.id for r in kept)
+    assert reader.search(_eye(7)[5], 1, None)[0].id == kept[2].id
+
+
+def test_replace_document_and_reopen(tmp_path):
+    client = _make(tmp_path)
+    client.replace_document("docs/a.pdf", _records(["intro", "body", "outro"], _eye(3)))
+    new = _records(["intro", "body edited"], _eye(2))
+    client.replace_document("docs/a.pdf", new)
+    client.close()
+
+    reopened = LocalVectorClient(collection="documents", dims=0, settings={"path": str(tmp_path)})
+    assert reopened.dims == 4
+    assert sorted(reopened.document_ids("docs/a.pdf")) == sorted(r.id for r in new)
+    with pytest.raises(ValueError):
+        reopened.ensure_collection("documents", 8)
+
+
+def test_interrupted_write_is_reconciled_on_open(tmp_path):
+    client = _make(tmp_path)
+    client.upsert(_records(["a", "b"], _eye(2)))
+    client._segments[0].live[:] = 0  # committed metadata, flags never flipped
+    client.close()
+    reopened = _make(tmp_path)
+    assert len(reopened.search([1.0, 0.0, 0.0, 0.0], 5, None)) == 2
+
+
+def test_ivf_matches_exact_search(tmp_path):
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(2000, 16))
+    client = _make(tmp_path, dims=16, index="ivf", nlist=16, nprobe=4, segment_rows=512)
+    client.upsert(_records([f"t{i}" for i in range(2000)], vectors))
+    client.reindex()
+    assert client._centroids.shape == (16, 16)
+    client.upsert(_records(["late"], rng.normal(size=(1, 16)), source_path="docs/b.pdf"))
+
+    hits = 0
+    for q in rng.normal(size=(50, 16)):
+        exact = [r.id for r in client.search(q.tolist(), 10, None, params={"exact": True})]
+        approx = [r.id for r in client.search(q.tolist(), 10, None)]
+        hits += len(set(exact) & set(approx))
+        assert [r.id for r in client.search(q.tolist(), 10, None, params={"nprobe": 16})] == exact
+    assert hits / 500 > 0.6
+
+
+def test_hybrid_ranks_exact_identifier_first(tmp_path):
+    client = _make(tmp_path, hybrid={"hybrid": True})
+    texts = ["torque settings overview", "torque table for fasteners", "error code XK-4471 means sensor fault"]
+    client.upsert(_records(texts, [[1.0, 0.0, 0, 0], [0.9, 0.1, 0, 0], [0.2, 1.0, 0, 0]]))
+    query = [1.0, 0.05, 0.0, 0.0]
+    assert client.search(query, 3, None)[0].text != texts[2]
+    results = client.search(query, 3, None, query_text="what does XK-4471 mean")
+    assert results[0].text == texts[2] and len(results) == 3
+
+
+def test_search_batch_matches_single_searches(tmp_path):
+    rng = np.random.default_rng(2)
+    client = _make(tmp_path, dims=8, segment_rows=64)
+    client.upsert(_records([f"t{i}" for i in range(200)], rng.normal(size=(200, 8))))
+    queries = rng.normal(size=(5, 8)).tolist()
+    batch = client.search_batch(queries, 4, {"lang": "en"})
+    assert [[r.id for r in res] for res in batch] == [[r.id for r in client.search(q, 4, {"lang": "en"})] for q in queries]
+    assert client.search_batch([], 4, None) == []
@@ -0,0 +1,171 @@
+import pytest
+
+from src.common.types import Chunk, EmbeddingBatch
+from src.ingest.upsert import build_records
+from src.search.client_qdrant import QdrantVectorClient, _point_id
+
+
+def _make(**kwargs):
+    c = QdrantVectorClient(url=None, host=None, port=None, api_key=None, collection="documents", dims=2, location=":memory:", **kwargs)
+    c.ensure_collection("documents", 2)
+    return c
+
+
+@pytest.fixture
+def client():
+    return _make(upload_batch_size=4)
+
+
+def _records(texts, source_path="docs/a.pdf"):
+    chunks = [
+        Chunk(
+            doc_id="d",
+            chunk_index=i,
+            text=t,
+            char_span=(0, len(t)),
+            section_path=None,
+            page_numbers=[],
+            metadata={"source_path": source_path, "file_name": source_path.rsplit("/", 1)[-1], "chunk_index": i},
+        )
+        for i, t in enumerate(texts)
+    ]
+    return build_records(chunks, [[1.0, float(i + 1)] for i in range(len(chunks))])
+
+
+def _count(c):
+    return c.client.count("documents", exact=True).count
+
+
+def _stored(c, source_path="docs/a.pdf"):
+    return sorted(c.document_ids(source_path))
+
+
+def test_replace_document_removes_stale_chunks(client):
+    client.replace_document("docs/a.pdf", _records(["intro", "body", "outro"]))
+    client.replace_document("docs/b.pdf", _records(["other"], source_path="docs/b.pdf"))
+    client.flush()
+    new = _records(["intro", "body edited"])
+    client.replace_document("docs/a.pdf", new)
+    client.flush()
+
+    assert _stored(client) == sorted(r.id for r in new)
+    assert len(_stored(client, "docs/b.pdf")) == 1
+    (point,) = client.client.retrieve("documents", ids=[_point_id(new[1].id)])
+    assert point.payload["text"] == "body edited"
+
+
+def test_upserts_are_buffered_across_calls_into_full_batches(client, monkeypatch):
+    sizes = []
+    original = client.client.upload_points
+
+    def recording(**kwargs):
+        points = list(kwargs["points"])
+        sizes.append(len(points))
+        assert kwargs["wait"] is False
+        return original(**{**kwargs, "points": points})
+
+    monkeypatch.setattr(client.client, "upload_points", recording)
+    client.upsert(_records(["a", "b", "c"]))
+    assert sizes == [] and _count(client) == 0
+    client.upsert(_records(["d", "e", "f", "g", "h", "i", "j"], source_path="docs/b.pdf"))
+    assert sizes == [4, 4]
+    client.flush()
+    assert _count(client) == 10
+
+
+def test_flush_raises_after_a_failed_upload(client, monkeypatch):
+    def failing(**kwargs):
+        raise ConnectionError("qdrant unavailable")
+
+    monkeypatch.setattr(client.client, "upload_points", failing)
+    with pytest.raises(ConnectionError):
+        client.upsert(_records(["a", "b", "c", "d", "e"]))
+    monkeypatch.undo()
+    with pytest.raises(RuntimeError, match="buffered points were dropped"):
+        client.flush()
+    client.flush()  # the failure is reported once
+    assert _count(client) == 0
+
+
+def test_search_applies_equality_filters(client):
+    client.upsert(_records(["alpha", "beta"]))
+    client.upsert(_records(["gamma"], source_path="docs/b.pdf"))
+    client.flush()
+    results = client.search([1.0, 1.0], 5, {"file_name": "b.pdf"})
+    assert [r.text for r in results] == ["gamma"]
+    assert len(client.search([1.0, 1.0], 5, None)) == 3
+
+
+def test_collection_is_created_once_with_configured_layout(monkeypatch):
+    c = QdrantVectorClient(
+        url=None, host=None, port=None, api_key=None, collection="documents", dims=2, location=":memory:",
+        settings={"m": 8, "ef_construct": 64, "quantization": "scalar", "on_disk": True},
+    )
+    created = []
+    original = c.client.create_collection
+    monkeypatch.setattr(c.client, "create_collection", lambda **kw: created.append(kw) or original(**kw))
+    c.ensure_collection("documents", 2)
+    c.upsert(_records(["kept"]))
+    c.flush()
+    c.ensure_collection("documents", 2)
+
+    assert len(created) == 1 and _count(c) == 1
+    kw = created[0]
+    assert (kw["hnsw_config"].m, kw["hnsw_config"].ef_construct) == (8, 64)
+    assert kw["vectors_config"].on_disk is True
+    assert kw["quantization_config"].scalar.always_ram is True
+
+
+def test_payload_indexes_are_created_for_missing_fields(monkeypatch):
+    c = QdrantVectorClient(
+        url=None, host=None, port=None, api_key=None, collection="documents", dims=2, location=":memory:",
+        settings={"payload_indexes": ["source_path", "doc_id"]},
+    )
+    c._local = False
+    indexed = []
+    monkeypatch.setattr(c.client, "create_payload_index", lambda **kw: indexed.append(kw["field_name"]))
+    c.ensure_collection("documents", 2)
+    assert indexed == ["source_path", "doc_id"]
+
+
+def test_search_params_merge_config_and_per_query_overrides():
+    from src.search.client_qdrant import CollectionSettings
+
+    assert CollectionSettings().search_params() is None
+    s = CollectionSettings(quantization="binary", hnsw_ef=64, oversampling=2.0)
+    p = s.search_params({"hnsw_ef": 256, "rescore": False})
+    assert p.hnsw_ef == 256
+    assert p.quantization.rescore is False and p.quantization.oversampling == 2.0
+    with pytest.raises(ValueError):
+        CollectionSettings.from_config({"quantization": "pq"})
+
+
+def test_search_passes_search_params(client, monkeypatch):
+    client.settings.hnsw_ef = 32
+    seen = {}
+    original = client.client.query_points
+    monkeypatch.setattr(client.client, "query_points", lambda **kw: seen.update(kw) or original(**kw))
+    client.search([1.0, 1.0], 3, None, {"exact": True})
+    assert seen["search_params"].hnsw_ef == 32 and seen["search_params"].exact is True
+
+
+def test_upsert_accepts_columnar_batches(client):
+    batch = EmbeddingBatch.from_records(_records(["a", "b", "c", "d", "e"]))
+    client.upsert(batch)
+    client.replace_document("docs/a.pdf", batch[1:])
+    client.flush()
+    assert _stored(client) == sorted(batch.ids[1:])
+    (point,) = client.client.retrieve("documents", ids=[_point_id(batch.ids[4])], with_vectors=True)
+    assert point.payload["text"] == "e"
+
+
+def test_search_batch_uses_one_request(client, monkeypatch):
+    client.upsert(_records(["a", "b", "c"]))
+    client.flush()
+    calls = []
+    original = client.client.query_batch_points
+    monkeypatch.setattr(client.client, "query_batch_points", lambda **kw: calls.append(kw) or original(**kw))
+    queries = [[1.0, 3.0], [1.0, 1.0]]
+    batch = client.search_batch(queries, 2, {"source_path": "docs/a.pdf"})
+    assert len(calls) == 1 and len(calls[0]["requests"]) == 2
+    assert [[r.id for r in res] for res in batch] == [[r.id for r in client.search(q, 2, {"source_path": "docs/a.pdf"})] for q in queries]
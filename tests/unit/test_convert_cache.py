@@ -0,0 +1,56 @@
+import sys
+import types
+
+import pytest
+
+docling_doc = pytest.importorskip("docling_core.types.doc")
+
+from src.ingest.convert_docling import convert_with_docling, load_docling_document
+
+
+class _CountingConverter:
+    calls = 0
+
+    def convert(self, path):
+        type(self).calls += 1
+        doc = docling_doc.DoclingDocument(name="sample")
+        doc.add_text(label=docling_doc.DocItemLabel.PARAGRAPH, text="hello from docling")
+        return types.SimpleNamespace(document=doc)
+
+
+@pytest.fixture
+def fake_docling(monkeypatch):
+    _CountingConverter.calls = 0
+    module = types.ModuleType("docling.document_converter")
+    module.DocumentConverter = _CountingConverter
+    monkeypatch.setitem(sys.modules, "docling", types.ModuleType("docling"))
+    monkeypatch.setitem(sys.modules, "docling.document_converter", module)
+    return _CountingConverter
+
+
+def _cfg(tmp_path, strategy="docling"):
+    return {"data": {"cache_dir": str(tmp_path)}, "docling": {"cache_converted": True}, "chunking": {"strategy": strategy}}
+
+
+def test_warm_cache_rehydrates_docling_document_without_converting(tmp_path, fake_docling):
+    cfg = _cfg(tmp_path)
+    convert_with_docling("a.pdf", "abc", cfg)
+    assert fake_docling.calls == 1
+
+    dc = convert_with_docling("a.pdf", "abc", cfg)
+    assert fake_docling.calls == 1
+    assert dc.dl_doc is None and dc.dl_doc_path
+    dl_doc = load_docling_document(dc)
+    assert dl_doc.texts[0].text == "hello from docling"
+    assert fake_docling.calls == 1
+
+
+def test_cache_entry_without_docling_document_is_a_miss_for_docling_strategy(tmp_path, fake_docling):
+    convert_with_docling("a.pdf", "abc", _cfg(tmp_path))
+    (tmp_path / "abc.docling.json").unlink()
+
+    convert_with_docling("a.pdf", "abc", _cfg(tmp_path, strategy="token"))
+    assert fake_docling.calls == 1
+    convert_with_docling("a.pdf", "abc", _cfg(tmp_path))
+    assert fake_docling.calls == 2
+    assert (tmp_path / "abc.docling.json").exists()
@@ -0,0 +1,49 @@
+from pathlib import Path
+
+from src.ingest.embed import Embedder
+from src.ingest.embed_cache import EmbeddingCache, cache_key
+
+
+def _embedder(monkeypatch, cache):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    e = Embedder(provider="openai", model="text-embedding-3-small", batch_size=2, timeout_s=5, cache=cache)
+    sent = []
+
+    def fake_batch(texts, tokens=0):
+        sent.append(list(texts))
+        return [[float(len(t)), 0.5] for t in texts]
+
+    monkeypatch.setattr(e, "_embed_batch_openai", fake_batch)
+    return e, sent
+
+
+def test_only_misses_reach_the_provider(tmp_path: Path, monkeypatch):
+    db = str(tmp_path / "emb.sqlite")
+    e, sent = _embedder(monkeypatch, EmbeddingCache(db))
+    assert e.embed_texts(["a", "bb", "a"]) == [[1.0, 0.5], [2.0, 0.5], [1.0, 0.5]]
+    assert sent == [["a", "bb"]]
+
+    # A fresh process reuses the persisted vectors
+    e2, sent2 = _embedder(monkeypatch, EmbeddingCache(db))
+    assert e2.embed_texts(["ccc", "bb", "a"]) == [[3.0, 0.5], [2.0, 0.5], [1.0, 0.5]]
+    assert sent2 == [["ccc"]]
+    stats = e2.cache_stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 1, 3)
+
+
+def test_key_depends_on_model_and_dims():
+    base = cache_key("openai", "m", 1536, "text")
+    assert base != cache_key("openai", "m2", 1536, "text")
+    assert base != cache_key("openai", "m", 3072, "text")
+    assert base == cache_key("openai", "m", 1536, "text")
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path: Path):
+    # Room for ~4 vectors of 64 float32s
+    cache = EmbeddingCache(str(tmp_path / "emb.sqlite"), max_mb=4 * 256 / (1024 * 1024))
+    for k in ("a", "b", "c", "d"):
+        cache.put_many([(k, [0.0] * 64)])
+    cache.get_many(["a"])
+    cache.put_many([("e", [1.0] * 64)])
+    assert set(cache.get_many(["a", "b", "c", "d", "e"])) == {"a", "d", "e"}
+    assert cache.stats()["bytes"] <= cache.max_bytes
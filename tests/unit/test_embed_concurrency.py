@@ -0,0 +1,173 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.ingest.embed import Embedder, pack_batches
+from src.ingest.rate_limit import TokenBucket
+
+
+class _FakeEmbeddings(BaseHTTPRequestHandler):
+    """OpenAI-compatible /embeddings endpoint; the vector of text "t" is [len(t), 1.0]."""
+
+    calls = []
+    fail_once = set()
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        texts = body["input"]
+        cls = type(self)
+        with cls.lock:
+            cls.calls.append(list(texts))
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+            fail = texts[0] in cls.fail_once
+            cls.fail_once.discard(texts[0])
+        time.sleep(0.05)
+        with cls.lock:
+            cls.in_flight -= 1
+        if fail:
+            self._send(429, {"error": {"message": "rate limited", "type": "rate_limit"}}, {"Retry-After": "0"})
+            return
+        # Answer out of order; the client must sort by index
+        data = [{"object": "embedding", "index": i, "embedding": [float(len(t)), 1.0]} for i, t in enumerate(texts)]
+        self._send(200, {"object": "list", "data": data[::-1], "model": body["model"], "usage": {"prompt_tokens": 1, "total_tokens": 1}})
+
+    def _send(self, status, payload, headers=None):
+        raw = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    _FakeEmbeddings.calls = []
+    _FakeEmbeddings.fail_once = set()
+    _FakeEmbeddings.max_in_flight = 0
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _FakeEmbeddings)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/v1"
+    httpd.shutdown()
+
+
+def _embedder(base_url, monkeypatch, **kwargs):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    return Embedder(provider="openai", model="text-embedding-3-small", batch_size=2, timeout_s=5, base_url=base_url, **kwargs)
+
+
+def test_batches_run_concurrently_and_keep_order(server, monkeypatch):
+    e = _embedder(server, monkeypatch, concurrency=4)
+    texts = ["x" * n for n in range(1, 17)]
+    vectors = e.embed_texts(texts)
+    e.close()
+    assert [v[0] for v in vectors] == [float(n) for n in range(1, 17)]
+    assert len(_FakeEmbeddings.calls) == 8
+    assert _FakeEmbeddings.max_in_flight > 1
+
+
+def test_concurrent_callers_share_one_thread_pool(server, monkeypatch):
+    from src.ingest import embed
+
+    created = []
+
+    class _SlowPool(embed.ThreadPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            created.append(self)
+            time.sleep(0.05)  # widen the window between the None check and the assignment
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(embed, "ThreadPoolExecutor", _SlowPool)
+    e = _embedder(server, monkeypatch, concurrency=2)
+    callers = [threading.Thread(target=e.embed_texts, args=([f"{i}a", f"{i}b", f"{i}c"],)) for i in range(4)]
+    for t in callers:
+        t.start()
+    for t in callers:
+        t.join()
+    e.close()
+    assert len(created) == 1 and len(_FakeEmbeddings.calls) == 8
+
+
+def test_only_the_rate_limited_batch_is_retried(server, monkeypatch):
+    _FakeEmbeddings.fail_once = {"c"}
+    e = _embedder(server, monkeypatch, concurrency=2)
+    vectors = e.embed_texts(["a", "b", "c", "dd", "e", "f"])
+    e.close()
+    assert [v[0] for v in vectors] == [1.0, 1.0, 1.0, 2.0, 1.0, 1.0]
+    sent = sorted(tuple(c) for c in _FakeEmbeddings.calls)
+    assert sent == [("a", "b"), ("c", "dd"), ("c", "dd"), ("e", "f")]
+
+
+def test_client_errors_are_not_retried(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    e = Embedder(provider="openai", model="m", batch_size=2, timeout_s=5)
+    calls = []
+
+    class BadRequest(Exception):
+        status_code = 400
+
+    def failing(texts, tokens=0):
+        calls.append(texts)
+        raise BadRequest("invalid input")
+
+    monkeypatch.setattr(e, "_embed_batch_openai", failing)
+    with pytest.raises(BadRequest):
+        e.embed_texts(["a"])
+    assert len(calls) == 1
+
+
+def test_token_bucket_waits_for_refill():
+    now = [0.0]
+    slept = []
+
+    def sleep(s):
+        slept.append(s)
+        now[0] += s
+
+    bucket = TokenBucket(60, clock=lambda: now[0], sleep=sleep)  # 1 token/s
+    assert bucket.acquire(60) == 0.0
+    assert bucket.acquire(2) == pytest.approx(2.0)
+    bucket.pause(5)
+    assert bucket.acquire(1) == pytest.approx(5.0)
+
+
+def test_pack_batches_respects_item_and_token_budgets():
+    counts = [500, 20, 480, 30, 25, 510]
+    batches = pack_batches(counts, max_items=3, max_tokens=1000, window=6)
+    assert sorted(i for b in batches for i in b) == list(range(6))
+    for b in batches:
+        assert len(b) <= 3 and sum(counts[i] for i in b) <= 1000
+    # Length-sorted packing keeps the short inputs together
+    assert batches[0] == [1, 4, 3]
+    assert pack_batches(counts, max_items=64, max_tokens=10_000) == [[0, 1, 2, 3, 4, 5]]
+
+
+def test_requests_are_packed_by_tokens_and_oversized_inputs_handled(server, monkeypatch):
+    e = _embedder(server, monkeypatch, max_tokens_per_request=30, max_input_tokens=20)
+    e.batch_size = 64
+    long_text = " ".join(["word"] * 50)
+    vectors = e.embed_texts(["short", long_text, "tiny"])
+    e.close()
+    assert all(sum(len(e._encoding.encode(t)) for t in call) <= 30 for call in _FakeEmbeddings.calls)
+    assert len(vectors) == 3 and len(vectors[1]) == 2
+    assert any(len(e._encoding.encode(t)) == 20 for call in _FakeEmbeddings.calls for t in call)
+
+    _FakeEmbeddings.calls = []
+    e = _embedder(server, monkeypatch, max_tokens_per_request=30, max_input_tokens=20, oversize="split")
+    vectors = e.embed_texts([long_text])
+    e.close()
+    pieces = [t for call in _FakeEmbeddings.calls for t in call]
+    assert len(pieces) == 3 and sum(len(p) for p in pieces) == len(long_text)
+    assert sum(x * x for x in vectors[0]) == pytest.approx(1.0)
@@ -0,0 +1,86 @@
+import sys
+import types
+
+import numpy as np
+import pytest
+
+from src.ingest.embed import Embedder
+
+
+class _FakeST:
+    """Stands in for SentenceTransformer: the vector of text t is [len(t), 1, 0]."""
+
+    instances = []
+
+    def __init__(self, model, **kwargs):
+        self.kwargs = kwargs
+        self.encode_calls = []
+        self.pools = 0
+        type(self).instances.append(self)
+
+    def get_sentence_embedding_dimension(self):
+        return 3
+
+    def _vectors(self, texts, normalize):
+        out = np.array([[len(t), 1.0, 0.0] for t in texts], dtype=np.float64)
+        if normalize:
+            out /= np.linalg.norm(out, axis=1, keepdims=True)
+        return out
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, normalize_embeddings=False):
+        self.encode_calls.append(list(texts))
+        return self._vectors(texts, normalize_embeddings)
+
+    def start_multi_process_pool(self, devices):
+        self.pools += 1
+        return {"devices": devices}
+
+    def encode_multi_process(self, texts, pool, batch_size=32, normalize_embeddings=False):
+        self.encode_calls.append(("mp", len(pool["devices"]), list(texts)))
+        return self._vectors(texts, normalize_embeddings)
+
+    def stop_multi_process_pool(self, pool):
+        self.pools -= 1
+
+
+@pytest.fixture(autouse=True)
+def fake_st(monkeypatch):
+    _FakeST.instances = []
+    module = types.ModuleType("sentence_transformers")
+    module.SentenceTransformer = _FakeST
+    monkeypatch.setitem(sys.modules, "sentence_transformers", module)
+
+
+def _embedder(**options):
+    return Embedder(provider="huggingface", model="local-mini", batch_size=8, timeout_s=10, huggingface=options)
+
+
+def test_dims_come_from_the_model_and_arrays_are_float32():
+    e = _embedder(normalize=False)
+    assert e.embedding_dimensions() == 3
+    arr = e.embed_array(["aaa", "a", "aa"])
+    assert arr.dtype == np.float32 and arr.flags["C_CONTIGUOUS"] and arr.shape == (3, 3)
+    assert arr[:, 0].tolist() == [3.0, 1.0, 2.0]
+    # Encoded longest-first to minimise padding
+    assert _FakeST.instances[0].encode_calls == [["aaa", "aa", "a"]]
+    empty = e.embed_array([])
+    assert empty.shape == (0, 3) and empty.dtype == np.float32
+    assert _FakeST.instances[0].encode_calls == [["aaa", "aa", "a"]]
+
+
+def test_normalization_and_list_output():
+    e = _embedder()
+    vectors = e.embed_texts(["abcd", "ab"])
+    assert isinstance(vectors[0], list)
+    assert np.allclose(np.linalg.norm(np.array(vectors), axis=1), 1.0)
+
+
+def test_multi_process_pool_is_reused_and_stopped():
+    e = _embedder(processes=3, backend="onnx", model_file="onnx/model_qint8.onnx")
+    st = _FakeST.instances[0]
+    assert st.kwargs == {"backend": "onnx", "model_kwargs": {"file_name": "onnx/model_qint8.onnx"}}
+    e.embed_texts(["x", "yy"])
+    e.embed_texts(["zzz"])
+    assert st.pools == 1 and [c[:2] for c in st.encode_calls] == [("mp", 3), ("mp", 3)]
+    e.close()
+    assert st.pools == 0
@@ -0,0 +1,45 @@
+import argparse
+import json
+
+import numpy as np
+import pytest
+
+from src.eval import HashEmbedder, bench, exact_neighbours, retrieval_metrics, synthetic_corpus
+
+
+def test_synthetic_corpus_and_embedder_are_deterministic():
+    assert synthetic_corpus(50, 5, seed=3) == synthetic_corpus(50, 5, seed=3)
+    assert synthetic_corpus(50, 5, seed=3) != synthetic_corpus(50, 5, seed=4)
+    a, b = HashEmbedder(16).embed_array(["w1 w2", "w2 w1", "w3"]), HashEmbedder(16).embed_array(["w1 w2"])
+    assert np.allclose(a[0], a[1]) and np.allclose(a[0], b[0])
+    assert np.allclose(np.linalg.norm(a, axis=1), 1.0)
+
+
+def test_exact_neighbours_matches_full_sort():
+    rng = np.random.default_rng(0)
+    corpus, queries = rng.standard_normal((300, 8)), rng.standard_normal((20, 8))
+    expected = np.argsort(-(queries @ corpus.T), axis=1)[:, :4]
+    assert (exact_neighbours(corpus, queries, 4) == expected).all()
+
+
+def test_retrieval_metrics():
+    truth = [["a", "b", "c"], ["a", "b", "c"]]
+    assert retrieval_metrics(truth, truth, 3) == {"recall@3": 1.0, "mrr": 1.0, "ndcg@3": 1.0}
+    metrics = retrieval_metrics([["b", "a", "x"], ["x", "y", "z"]], truth, 3)
+    assert metrics["recall@3"] == pytest.approx(1 / 3, abs=1e-4)
+    assert metrics["mrr"] == 0.25  # nearest neighbour at rank 2 in one query, missing in the other
+    assert 0 < metrics["ndcg@3"] < 0.5
+
+
+def test_bench_reports_exact_recall_for_flat_and_json(tmp_path):
+    matrix = tmp_path / "matrix.yaml"
+    matrix.write_text("variants:\n  - name: flat\n    vectordb: {provider: local, local: {index: flat}}\n")
+    cfg = {"vectordb": {"provider": "local", "collection": "documents", "local": {"path": str(tmp_path / "ignored")}}}
+    args = argparse.Namespace(matrix=str(matrix), only=None, docs=400, num_queries=20, dims=32, seed=1, k=5, concurrency=[1, 2])
+    report = json.loads(json.dumps(bench(cfg, args)))
+
+    (flat,) = report["variants"]
+    assert flat["name"] == "flat" and flat["recall@5"] == 1.0 and flat["mrr"] == 1.0
+    assert [level["concurrency"] for level in flat["latency"]] == [1, 2]
+    assert all(level["qps"] > 0 and level["p50_ms"] <= level["p99_ms"] for level in flat["latency"])
+    assert not (tmp_path / "ignored").exists()  # local variants run in a temporary directory
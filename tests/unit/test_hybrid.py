@@ -0,0 +1,64 @@
+from src.common.types import Chunk
+from src.ingest.upsert import build_records
+from src.search.client_qdrant import QdrantVectorClient
+from src.search.hybrid import HybridSettings, bm25_document_vector, rrf_fuse, tokenize
+
+
+def test_settings_from_config():
+    s = HybridSettings.from_config({"hybrid": True, "hybrid_options": {"rrf_k": 10, "candidates": 5, "unknown": 1}})
+    assert s.enabled and s.rrf_k == 10
+    assert s.candidate_limit(3) == 5 and s.candidate_limit(20) == 20
+    assert not HybridSettings.from_config(None).enabled
+
+
+def test_tokenize_keeps_identifiers_whole():
+    assert tokenize("Part AB-1234 fits M8x1.25, see v2.3.1") == ["part", "ab-1234", "fits", "m8x1.25", "see", "v2.3.1"]
+
+
+def test_bm25_document_vector_saturates_term_frequency():
+    indices, values = bm25_document_vector("error error error code", HybridSettings())
+    assert len(indices) == 2 and indices == sorted(indices)
+    assert max(values) < 3 * min(values)
+    assert bm25_document_vector("", HybridSettings()) == ([], [])
+
+
+def test_rrf_fuse_rewards_agreement():
+    fused = rrf_fuse([["a", "b", "c"], ["d", "b", "e"]], k=60, top_k=3)
+    assert [rid for rid, _ in fused] == ["b", "a", "d"]
+
+
+def _records(texts, vectors):
+    chunks = [
+        Chunk(doc_id="d", chunk_index=i, text=t, char_span=(0, len(t)), section_path=None, page_numbers=[], metadata={"source_path": "a.pdf"})
+        for i, t in enumerate(texts)
+    ]
+    return build_records(chunks, vectors)
+
+
+def test_qdrant_hybrid_ranks_exact_identifier_first():
+    client = QdrantVectorClient(
+        url=None, host=None, port=None, api_key=None, collection="documents", dims=2, location=":memory:", hybrid={"hybrid": True}
+    )
+    client.ensure_collection("documents", 2)
+    texts = ["torque settings overview", "torque table for fasteners", "error code XK-4471 means sensor fault"]
+    records = _records(texts, [[1.0, 0.0], [0.9, 0.1], [0.2, 1.0]])
+    client.upsert(records)
+    client.flush()
+
+    query = [1.0, 0.05]  # dense-wise closest to the torque chunks
+    assert client.search(query, 3, None)[0].text != texts[2]
+    results = client.search(query, 3, None, query_text="what does XK-4471 mean")
+    assert results[0].text == texts[2]
+    assert len(results) == 3
+
+
+def test_qdrant_hybrid_reuses_existing_dense_only_collection():
+    plain = QdrantVectorClient(url=None, host=None, port=None, api_key=None, collection="documents", dims=2, location=":memory:")
+    plain.ensure_collection("documents", 2)
+    hybrid = QdrantVectorClient(url=None, host=None, port=None, api_key=None, collection="documents", dims=2, location=":memory:", hybrid={"hybrid": True})
+    hybrid.client = plain.client
+    hybrid.ensure_collection("documents", 2)
+    hybrid.upsert(_records(["alpha"], [[1.0, 0.0]]))
+    hybrid.flush()
+    # Falls back to dense-only search on a collection without the sparse vector
+    assert [r.text for r in hybrid.search([1.0, 0.0], 1, None, query_text="alpha")] == ["alpha"]
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.common.types import SearchResult
+from src.rag.generate import astream_events, stream_events
+from src.rag.llm import LLMClient, LLMSettings
+
+
+class _FakeLLM(BaseHTTPRequestHandler):
+    """OpenAI chat completions and Ollama /api/generate, streaming "Hello world" in three deltas."""
+
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is observable
+    tokens = ["Hello", " ", "world"]
+    connections = 0
+    fail = False
+
+    def setup(self):
+        super().setup()
+        type(self).connections += 1
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if type(self).fail:
+            self._send(500, "application/json", [b'{"error": "boom"}'])
+            return
+        if self.path.endswith("/chat/completions"):
+            if body.get("stream"):
+                chunks = [self._chunk(body["model"], t) for t in self.tokens]
+                self._send(200, "text/event-stream", [f"data: {json.dumps(c)}\n\n".encode() for c in chunks] + [b"data: [DONE]\n\n"])
+            else:
+                message = {"role": "assistant", "content": "".join(self.tokens)}
+                completion = {"id": "c", "object": "chat.completion", "created": 0, "model": body["model"],
+                              "choices": [{"index": 0, "message": message, "finish_reason": "stop"}]}
+                self._send(200, "application/json", [json.dumps(completion).encode()])
+        elif body["stream"]:
+            lines = [json.dumps({"response": t, "done": False}) + "\n" for t in self.tokens] + ['{"response": "", "done": true}\n']
+            self._send(200, "application/x-ndjson", [line.encode() for line in lines])
+        else:
+            self._send(200, "application/json", [json.dumps({"response": "".join(self.tokens)}).encode()])
+
+    @staticmethod
+    def _chunk(model, text):
+        return {"id": "c", "object": "chat.completion.chunk", "created": 0, "model": model,
+                "choices": [{"index": 0, "delta": {"content": text}, "finish_reason": None}]}
+
+    def _send(self, status, content_type, parts):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for part in parts:
+            self.wfile.write(f"{len(part):x}\r\n".encode() + part + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    _FakeLLM.connections = 0
+    _FakeLLM.fail = False
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _FakeLLM)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+
+CONTEXTS = [SearchResult(id="1", score=0.8, text="ctx", metadata={"source_path": "a.pdf", "section_path": "S"})]
+
+
+def _llm(provider, server, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    return LLMClient(LLMSettings(provider=provider, model="m", base_url=server + ("/v1" if provider == "openai" else ""), timeout_s=5))
+
+
+@pytest.mark.parametrize("provider", ["openai", "ollama"])
+def test_stream_sends_sources_first_and_reuses_connections(provider, server, monkeypatch):
+    llm = _llm(provider, server, monkeypatch)
+    events = list(stream_events(llm, "q", CONTEXTS))
+    assert events[0] == {"type": "sources", "sources": [{"id": "1", "score": 0.8, "source_path": "a.pdf", "section_path": "S"}], "confidence": 0.8}
+    assert [e["text"] for e in events if e["type"] == "token"] == ["Hello", " ", "world"]
+    assert events[-1] == {"type": "done"}
+    assert llm.complete("q") == "Hello world"
+    assert "".join(llm.stream("q")) == "Hello world"
+    assert _FakeLLM.connections == 1
+    llm.close()
+
+
+@pytest.mark.parametrize("provider", ["openai", "ollama"])
+def test_async_stream_and_complete(provider, server, monkeypatch):
+    llm = _llm(provider, server, monkeypatch)
+
+    async def run():
+        try:
+            events = [e async for e in astream_events(llm, "q", CONTEXTS)]
+            return events, await llm.acomplete("q")
+        finally:
+            await llm.aclose()
+
+    events, text = asyncio.run(run())
+    assert [e["type"] for e in events] == ["sources", "token", "token", "token", "done"]
+    assert text == "Hello world"
+
+
+def test_llm_failure_becomes_an_error_event(server, monkeypatch):
+    _FakeLLM.fail = True
+    events = list(stream_events(_llm("ollama", server, monkeypatch), "q", CONTEXTS))
+    assert [e["type"] for e in events] == ["sources", "error", "done"]
@@ -0,0 +1,65 @@
+import os
+from pathlib import Path
+
+import src.ingest.discover as discover_module
+from src.ingest.discover import discover_files
+from src.ingest.manifest import IngestManifest, ingest_settings_key
+
+
+def _counting_hasher(monkeypatch):
+    calls = []
+    original = discover_module._sha256_of_file
+
+    def counting(path):
+        calls.append(path.name)
+        return original(path)
+
+    monkeypatch.setattr(discover_module, "_sha256_of_file", counting)
+    return calls
+
+
+def test_discovery_only_hashes_changed_files(tmp_path: Path, monkeypatch):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "a.pdf").write_text("alpha")
+    (docs / "b.pdf").write_text("beta")
+    calls = _counting_hasher(monkeypatch)
+    db = str(tmp_path / "manifest.sqlite")
+
+    first = discover_files(str(docs), ["*.pdf"], [], 1, manifest=IngestManifest(db))
+    assert sorted(calls) == ["a.pdf", "b.pdf"]
+
+    calls.clear()
+    (docs / "b.pdf").write_text("beta v2")
+    st = (docs / "b.pdf").stat()
+    os.utime(docs / "b.pdf", ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    second = discover_files(str(docs), ["*.pdf"], [], 1, manifest=IngestManifest(db))
+    assert calls == ["b.pdf"]
+    by_name = {Path(f.path).name: f.sha256 for f in first}
+    assert {Path(f.path).name: f.sha256 for f in second}["a.pdf"] == by_name["a.pdf"]
+    assert {Path(f.path).name: f.sha256 for f in second}["b.pdf"] != by_name["b.pdf"]
+
+
+def test_ingested_status_tracks_content_and_settings(tmp_path: Path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "a.pdf").write_text("alpha")
+    db = str(tmp_path / "manifest.sqlite")
+    cfg = {"chunking": {"strategy": "docling", "max_tokens": 800, "overlap_tokens": 150}, "embeddings": {"model": "m"}}
+    key = ingest_settings_key(cfg)
+
+    manifest = IngestManifest(db)
+    (f,) = discover_files(str(docs), [], [], 1, manifest=manifest)
+    assert not manifest.is_ingested(f, key)
+    manifest.mark_ingested(f, key)
+    manifest.close()
+
+    manifest = IngestManifest(db)
+    (f,) = discover_files(str(docs), [], [], 1, manifest=manifest)
+    assert manifest.is_ingested(f, key)
+    cfg["chunking"]["max_tokens"] = 400
+    assert not manifest.is_ingested(f, ingest_settings_key(cfg))
+
+    (docs / "a.pdf").write_text("alpha, edited")
+    (f,) = discover_files(str(docs), [], [], 1, manifest=manifest)
+    assert not manifest.is_ingested(f, key)
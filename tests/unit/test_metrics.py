@@ -0,0 +1,118 @@
+import json
+import logging
+
+import pytest
+
+from src.common import metrics
+from src.common.logging import JsonFormatter, current_trace, end_trace, span, start_trace
+from src.common.types import Chunk
+from src.ingest.upsert import InstrumentedVectorClient, build_records, make_vector_client
+from src.search.query_cache import TTLCache
+
+
+@pytest.fixture
+def enabled():
+    metrics.REGISTRY.clear()
+    metrics.enable_metrics(True)
+    yield
+    metrics.enable_metrics(False)
+    metrics.REGISTRY.clear()
+
+
+def test_disabled_updates_are_no_ops():
+    metrics.REGISTRY.clear()
+    metrics.EMBED_RETRIES.inc(provider="openai")
+    metrics.EMBED_BATCH_SIZE.observe(8, provider="openai")
+    with metrics.EMBED_SECONDS.time(provider="openai"):
+        pass
+    assert metrics.render() == ""
+
+
+def test_render_text_format(enabled):
+    metrics.EMBED_RETRIES.inc(provider="openai")
+    metrics.EMBED_RETRIES.inc(2, provider="openai")
+    metrics.EMBED_BATCH_SIZE.observe(3, provider="hf")
+    metrics.EMBED_BATCH_SIZE.observe(64, provider="hf")
+    metrics.QUEUE_DEPTH.set(5, queue="embed")
+    text = metrics.render()
+    assert "# TYPE rag_embed_retries_total counter" in text
+    assert 'rag_embed_retries_total{provider="openai"} 3' in text
+    assert 'rag_embed_batch_size_bucket{provider="hf",le="2"} 0' in text
+    assert 'rag_embed_batch_size_bucket{provider="hf",le="4"} 1' in text
+    assert 'rag_embed_batch_size_bucket{provider="hf",le="+Inf"} 2' in text
+    assert 'rag_embed_batch_size_sum{provider="hf"} 67' in text
+    assert 'rag_embed_batch_size_count{provider="hf"} 2' in text
+    assert 'rag_queue_depth{queue="embed"} 5' in text
+    # Metrics without samples are left out entirely
+    assert "rag_upsert_rows_total" not in text
+
+
+def test_cache_lookups_counted_per_cache(enabled):
+    cache = TTLCache(max_entries=4, ttl_s=60, name="search_results")
+    cache.put("a", 1)
+    cache.get("a")
+    cache.get("b")
+    assert metrics.CACHE_LOOKUPS.value(cache="search_results", result="hit") == 1
+    assert metrics.CACHE_LOOKUPS.value(cache="search_results", result="miss") == 1
+
+
+def test_instrumented_client_times_search_and_counts_rows(enabled, tmp_path):
+    cfg = {"vectordb": {"provider": "local", "collection": "documents", "dims": 2, "local": {"path": str(tmp_path)}}}
+    client = make_vector_client(cfg)
+    assert isinstance(client, InstrumentedVectorClient)
+    client.ensure_collection("documents", 2)
+    chunks = [
+        Chunk(doc_id="d", chunk_index=i, text=f"t{i}", char_span=(0, 2), section_path="", page_numbers=[], metadata={"source_path": "a"})
+        for i in range(3)
+    ]
+    client.replace_document("a", build_records(chunks, [[1.0, 0.0], [0.0, 1.0], [0.7, 0.7]]))
+    assert len(client.search([1.0, 0.0], 2, None)) == 2
+    client.search_batch([[1.0, 0.0], [0.0, 1.0]], 1, None)
+    # One edited chunk: the two surviving ones are not rewritten
+    chunks[2].text = "t2 edited"
+    client.replace_document("a", build_records(chunks, [[1.0, 0.0], [0.0, 1.0], [0.6, 0.8]]))
+    client.close()
+    assert metrics.UPSERT_ROWS.value(backend="local") == 4
+    assert metrics.SEARCH_QUERIES.value(backend="local") == 3
+    assert metrics.SEARCH_SECONDS.count(backend="local", op="search") == 1
+    assert metrics.SEARCH_SECONDS.count(backend="local", op="search_batch") == 1
+
+
+def test_factory_skips_wrapper_when_disabled(tmp_path):
+    cfg = {"vectordb": {"provider": "local", "collection": "documents", "dims": 2, "local": {"path": str(tmp_path)}}}
+    client = make_vector_client(cfg)
+    assert not isinstance(client, InstrumentedVectorClient)
+    client.close()
+
+
+def test_export_writes_textfile(enabled, tmp_path):
+    metrics.UPSERT_ROWS.inc(10, backend="qdrant")
+    path = tmp_path / "prom" / "ingest.prom"
+    metrics.export_metrics({"observability": {"textfile": str(path)}}, job="ingest")
+    assert 'rag_upsert_rows_total{backend="qdrant"} 10' in path.read_text()
+
+
+def test_trace_spans_and_request_id_in_json_logs():
+    with span("embed"):
+        pass  # no active trace: nothing recorded, nothing raised
+    trace, token = start_trace("req-1")
+    try:
+        with span("embed"):
+            pass
+        with span("search"):
+            pass
+        with span("search"):
+            pass
+        assert current_trace() is trace
+        assert [name for name, _ in trace.spans] == ["embed", "search", "search"]
+        assert set(trace.span_ms()) == {"embed", "search"}
+        record = logging.LogRecord("api", logging.INFO, __file__, 1, "request_complete", None, None)
+        record.fields = {"spans": trace.span_ms()}
+        payload = json.loads(JsonFormatter().format(record))
+        assert payload["request_id"] == "req-1"
+        assert set(payload["spans"]) == {"embed", "search"}
+    finally:
+        end_trace(token)
+    assert current_trace() is None
+    record = logging.LogRecord("api", logging.INFO, __file__, 1, "idle", None, None)
+    assert "request_id" not in json.loads(JsonFormatter().format(record))
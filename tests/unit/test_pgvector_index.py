@@ -0,0 +1,34 @@
+import pytest
+
+from src.search.client_pgvector import IndexSettings, _search_query, ivfflat_lists
+
+
+@pytest.mark.parametrize("metric,op,opclass", [("cosine", "<=>", "vector_cosine_ops"), ("l2", "<->", "vector_l2_ops"), ("ip", "<#>", "vector_ip_ops")])
+def test_query_operator_matches_index_opclass(metric, op, opclass):
+    settings = IndexSettings.from_config({"type": "hnsw", "metric": metric})
+    query, _ = _search_query([0.1, 0.2], 5, None, settings.metric)
+    assert f"ORDER BY vector {op} %s" in query
+    assert f"(vector {opclass})" in settings.index_sql(rows=0)
+
+
+def test_ivfflat_lists_follow_row_count():
+    assert ivfflat_lists(0) == 1
+    assert ivfflat_lists(250_000) == 250
+    assert ivfflat_lists(4_000_000) == 2000
+    settings = IndexSettings.from_config({"type": "ivfflat", "lists": "auto"})
+    assert "lists = 50" in settings.index_sql(rows=50_000)
+
+
+def test_query_settings_and_overrides():
+    hnsw = IndexSettings.from_config({"type": "hnsw", "ef_search": 40})
+    assert hnsw.query_settings() == [("hnsw.ef_search", "40")]
+    assert hnsw.query_settings({"ef_search": 200}) == [("hnsw.ef_search", "200")]
+    ivf = IndexSettings.from_config({"type": "ivfflat", "probes": 4})
+    assert ivf.query_settings({"probes": 16}) == [("ivfflat.probes", "16")]
+
+
+def test_rejects_unknown_index_settings():
+    with pytest.raises(ValueError):
+        IndexSettings.from_config({"type": "diskann"})
+    with pytest.raises(ValueError):
+        IndexSettings.from_config({"metric": "hamming"})
@@ -0,0 +1,304 @@
+import json
+import pstats
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from src.common.types import Chunk, DiscoveredFile
+from src.ingest.pipeline import PipelineSettings, ingest_serial, run_pipeline, trace_slowest
+from src.ingest.profile import NULL_PROFILER, IngestProfiler
+from src.search.client_local import LocalVectorClient
+
+
+def _fake_prepare(f, cfg):
+    n = int(f.path.rsplit("_", 1)[1])
+    return [
+        Chunk(
+            doc_id=f.sha256,
+            chunk_index=i,
+            text=f"{f.path} chunk {i}",
+            char_span=(0, 0),
+            section_path=None,
+            page_numbers=[],
+            metadata={"source_path": f.path, "sha256": f.sha256},
+        )
+        for i in range(n)
+    ]
+
+
+def _failing_prepare(f, cfg):
+    raise RuntimeError("conversion failed")
+
+
+class _StubEmbedder:
+    def __init__(self, fail: bool = False) -> None:
+        self.fail = fail
+
+    def embed_texts(self, texts):
+        if self.fail:
+            raise RuntimeError("embedding failed")
+        return [[float(len(t))] for t in texts]
+
+    def embed_array(self, texts):
+        return np.asarray(self.embed_texts(texts), dtype=np.float32).reshape(len(texts), 1)
+
+    def embedding_dimensions(self):
+        return 1
+
+
+class _RecordingClient:
+    def __init__(self) -> None:
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def upsert(self, records):
+        with self._lock:
+            self.batches.append(list(records))
+
+    def flush(self):
+        self.flushed = True
+
+    def replace_document(self, doc_key, records):
+        with self._lock:
+            self.replaced = getattr(self, "replaced", {})
+            self.replaced[doc_key] = list(records)
+
+    def document_ids(self, doc_key):
+        return [r.id for r in getattr(self, "replaced", {}).get(doc_key, [])]
+
+
+class _BufferingClient:
+    """Holds writes until ``flush`` like the Qdrant client; ``stored`` is what a flush applied."""
+
+    def __init__(self) -> None:
+        self.buffer = []
+        self.stored = {}
+
+    def replace_document(self, doc_key, records):
+        self.buffer.append((doc_key, list(records)))
+
+    def document_ids(self, doc_key):
+        return [r.id for r in self.stored.get(doc_key, [])]
+
+    def flush(self):
+        for doc_key, records in self.buffer:
+            self.stored[doc_key] = records
+        self.buffer = []
+
+
+def _files(sizes):
+    return [DiscoveredFile(path=f"doc_{n}", size_bytes=0, sha256=f"sha{i}") for i, n in enumerate(sizes)]
+
+
+def test_pipeline_writes_all_chunks_in_bounded_batches():
+    client = _RecordingClient()
+    settings = PipelineSettings(convert_workers=2, embed_workers=3, upsert_batch_size=4, queue_size=2, replace_documents=False)
+    total = run_pipeline(_files([3, 0, 5, 7, 1]), {}, _StubEmbedder(), client, settings, prepare=_fake_prepare)
+    assert total == 16
+    assert all(len(b) <= 4 for b in client.batches)
+    assert client.flushed
+    ids = [r.id for b in client.batches for r in b]
+    assert len(ids) == len(set(ids)) == 16
+
+
+@pytest.mark.parametrize(
+    "prepare,embedder",
+    [(_failing_prepare, _StubEmbedder()), (_fake_prepare, _StubEmbedder(fail=True))],
+)
+def test_pipeline_propagates_stage_errors(prepare, embedder):
+    settings = PipelineSettings(convert_workers=1, embed_workers=1, upsert_batch_size=2, queue_size=1)
+    with pytest.raises(RuntimeError):
+        run_pipeline(_files([2] * 10), {}, embedder, _RecordingClient(), settings, prepare=prepare)
+
+
+def test_settings_from_config_defaults_to_serial():
+    assert PipelineSettings.from_config({}).convert_workers == 0
+    s = PipelineSettings.from_config({"ingest": {"workers": 4, "upsert_batch_size": 0}})
+    assert s.convert_workers == 4 and s.upsert_batch_size == 1
+
+
+def test_pipeline_reports_documents_once_fully_written():
+    client = _RecordingClient()
+    done = []
+    settings = PipelineSettings(convert_workers=2, embed_workers=2, upsert_batch_size=3, queue_size=2, replace_documents=False)
+    files = _files([2, 0, 4, 5])
+    run_pipeline(files, {}, _StubEmbedder(), client, settings, prepare=_fake_prepare, on_document_done=done.append)
+    assert sorted(f.path for f in done) == sorted(f.path for f in files)
+
+
+def test_pipeline_replaces_each_document():
+    client = _RecordingClient()
+    settings = PipelineSettings(convert_workers=1, embed_workers=2, queue_size=2)
+    total = run_pipeline(_files([2, 0, 3]), {}, _StubEmbedder(), client, settings, prepare=_fake_prepare)
+    assert total == 5
+    assert {k: len(v) for k, v in client.replaced.items()} == {"doc_2": 2, "doc_0": 0, "doc_3": 3}
+    assert client.batches == []
+
+
+def _prepare_failing_on_doc_3(f, cfg):
+    if f.path == "doc_3":
+        raise RuntimeError("conversion failed")
+    return _fake_prepare(f, cfg)
+
+
+def test_ingest_serial_reports_documents_only_once_flushed():
+    client = _BufferingClient()
+    done = []
+
+    def on_done(f):
+        # The manifest may only record documents whose points are stored
+        assert f.path in client.stored
+        done.append(f.path)
+
+    with pytest.raises(RuntimeError, match="conversion failed"):
+        ingest_serial(
+            _files([2, 3, 1]), {}, _StubEmbedder(), client, PipelineSettings(), prepare=_prepare_failing_on_doc_3, on_document_done=on_done
+        )
+    assert done == ["doc_2"] and set(client.stored) == {"doc_2"}
+
+
+def test_pipeline_reports_documents_only_once_flushed():
+    client = _BufferingClient()
+    done = []
+
+    def on_done(f):
+        assert f.path in client.stored
+        done.append(f.path)
+
+    settings = PipelineSettings(convert_workers=1, embed_workers=1, queue_size=1)
+    with pytest.raises(RuntimeError, match="conversion failed"):
+        run_pipeline(_files([2, 4, 3, 5]), {}, _StubEmbedder(), client, settings, prepare=_prepare_failing_on_doc_3, on_document_done=on_done)
+    assert set(done) == set(client.stored) and "doc_3" not in done
+
+
+class _CountingEmbedder:
+    """Maps each text to a fixed unit vector along ``axis``; records every text embedded."""
+
+    def __init__(self, axis=0):
+        self.axis = axis
+        self.embedded = []
+
+    def embed_array(self, texts):
+        self.embedded.extend(texts)
+        vectors = np.zeros((len(texts), 2), dtype=np.float32)
+        vectors[:, self.axis] = 1.0
+        return vectors
+
+    def embedding_dimensions(self):
+        return 2
+
+
+def _texts_prepare(f, cfg):
+    return [
+        Chunk(doc_id="d", chunk_index=i, text=t, char_span=(0, 0), section_path=None, page_numbers=[], metadata={"source_path": f.path})
+        for i, t in enumerate(cfg["texts"][f.path])
+    ]
+
+
+def test_reingest_embeds_only_fresh_chunks_and_a_model_change_replaces_vectors(tmp_path):
+    client = LocalVectorClient(collection="documents", dims=2, settings={"path": str(tmp_path)})
+    client.ensure_collection("documents", 2)
+    files = [DiscoveredFile(path="a", size_bytes=0, sha256="a")]
+    cfg = {"embeddings": {"provider": "huggingface", "model": "m1"}, "texts": {"a": ["hello", "world"]}}
+    ingest_serial(files, cfg, _CountingEmbedder(), client, PipelineSettings(), prepare=_texts_prepare)
+
+    cfg["texts"]["a"] = ["hello", "world edited"]
+    embedder = _CountingEmbedder()
+    ingest_serial(files, cfg, embedder, client, PipelineSettings(), prepare=_texts_prepare)
+    assert embedder.embedded == ["world edited"]
+    assert sorted(r.text for r in client.search([1.0, 0.0], 5, None)) == ["hello", "world edited"]
+
+    # Same dimensions, different model: every chunk is fresh and gets the new vector
+    cfg["embeddings"]["model"] = "m2"
+    embedder = _CountingEmbedder(axis=1)
+    ingest_serial(files, cfg, embedder, client, PipelineSettings(), prepare=_texts_prepare)
+    assert embedder.embedded == ["hello", "world edited"]
+    assert len(client.document_ids("a")) == 2
+    assert [round(r.score, 3) for r in client.search([0.0, 1.0], 5, None)] == [1.0, 1.0]
+    client.close()
+
+
+class _CachingStubEmbedder(_StubEmbedder):
+    def __init__(self) -> None:
+        super().__init__()
+        self.cache = object()
+        self.caches_seen = []
+
+    def embed_array(self, texts):
+        self.caches_seen.append(self.cache)
+        return super().embed_array(texts)
+
+
+def _profiled_prepare(f, cfg, profiler=NULL_PROFILER):
+    cfg.setdefault("traced", []).append((tracemalloc.is_tracing(), cfg.get("docling", {}).get("cache_converted", True)))
+    with profiler.stage("convert", items=1, nbytes=f.size_bytes):
+        time.sleep(0.05 if f.path == "doc_4" else 0)
+    with profiler.stage("chunk") as counts:
+        chunks = _fake_prepare(f, cfg)
+        counts.items = len(chunks)
+    return chunks
+
+
+def test_ingest_serial_without_profiler():
+    client = _RecordingClient()
+    total = ingest_serial(_files([2, 0, 3]), {}, _StubEmbedder(), client, PipelineSettings(), prepare=_fake_prepare)
+    assert total == 5 and client.flushed
+    assert {k: len(v) for k, v in client.replaced.items()} == {"doc_2": 2, "doc_0": 0, "doc_3": 3}
+
+
+def test_profiler_records_stages_documents_and_slowest_dumps(tmp_path):
+    profiler = IngestProfiler(str(tmp_path / "prof"), top_n=2)
+    done = []
+    cfg = {}
+    client = _RecordingClient()
+    try:
+        total = ingest_serial(
+            _files([1, 4, 2, 3]), cfg, _StubEmbedder(), client, PipelineSettings(replace_documents=False),
+            prepare=_profiled_prepare, on_document_done=done.append, profiler=profiler,
+        )
+        timing_stages = json.loads(json.dumps(profiler.report()["stages"]))
+        embedder = _CachingStubEmbedder()
+        cache = embedder.cache
+        trace_slowest(profiler, cfg, embedder, prepare=_profiled_prepare)
+        path = profiler.write()
+    finally:
+        profiler.close()
+    assert total == 10 and len(done) == 4
+    # Timing pass untraced; the slowest two re-run under tracemalloc, bypassing the
+    # conversion and embedding caches, without writing again
+    assert cfg["traced"] == [(False, True)] * 4 + [(True, False)] * 2
+    assert embedder.caches_seen == [None, None] and embedder.cache is cache
+    assert len(client.batches) == 4
+    report = json.loads(open(path).read())
+
+    stages = report["stages"]
+    assert set(stages) == {"convert", "chunk", "embed", "upsert", "flush"}
+    assert stages["convert"]["calls"] == 4 and stages["chunk"]["items"] == 10 and stages["upsert"]["items"] == 10
+    assert stages["embed"]["bytes"] == sum(len(f"doc_{n} chunk {i}") for n in [1, 4, 2, 3] for i in range(n))
+    assert stages["upsert"]["bytes"] > 10 * 4  # float32 vectors plus text
+    # The traced pass adds allocation peaks but leaves the timings alone
+    assert {n: {k: v for k, v in s.items() if k != "peak_alloc_bytes"} for n, s in stages.items()} == {
+        n: {k: v for k, v in s.items() if k != "peak_alloc_bytes"} for n, s in timing_stages.items()
+    }
+    assert stages["chunk"]["peak_alloc_bytes"] > 0
+    assert [d["path"] for d in report["traced"]] == report["slowest"]
+    assert set(report["traced"][0]["stages"]) == {"convert", "chunk", "embed"}
+    assert stages["convert"]["wall_s"] >= 0.05 and stages["convert"]["cpu_s"] < stages["convert"]["wall_s"]
+    assert [d["path"] for d in report["documents"]] == ["doc_1", "doc_4", "doc_2", "doc_3"]
+    assert set(report["documents"][1]["stages"]) == {"convert", "chunk", "embed", "upsert"}
+
+    assert report["slowest"][0] == "doc_4" and len(report["slowest"]) == 2
+    dumps = sorted(p.name for p in (tmp_path / "prof" / "slowest").iterdir())
+    assert dumps[0] == "01_doc_4.prof" and len(dumps) == 4
+    assert pstats.Stats(str(tmp_path / "prof" / "slowest" / "01_doc_4.prof")).total_calls > 0
+    tracemalloc.Snapshot.load(str(tmp_path / "prof" / "slowest" / "01_doc_4.tracemalloc"))
+
+
+def test_null_profiler_is_inert():
+    with NULL_PROFILER.document(DiscoveredFile(path="a", size_bytes=1, sha256="s")):
+        with NULL_PROFILER.stage("x", items=3) as counts:
+            counts.items = 5
+    assert not NULL_PROFILER.enabled
@@ -0,0 +1,61 @@
+from src.common.types import SearchResult
+from src.search.query_cache import CollectionGeneration, QueryCache, TTLCache, make_query_cache
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_cache_expires_and_evicts_lru():
+    clock = _Clock()
+    cache = TTLCache(max_entries=2, ttl_s=10, clock=clock)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # a is now most recently used
+    cache.put("c", 3)
+    assert cache.get("b") is None and cache.get("c") == 3
+    clock.now = 11
+    assert cache.get("a") is None
+    assert cache.stats() == {"hits": 2, "misses": 2, "hit_rate": 0.5, "entries": 1, "max_entries": 2, "ttl_s": 10.0}
+
+
+def test_query_vectors_share_normalized_text(tmp_path):
+    cache = QueryCache("openai", "m", 3, CollectionGeneration(str(tmp_path / "gen")))
+    cache.put_vector("reset  the\tpassword ", [0.5, 0.25, 1.0])
+    assert cache.get_vector("reset the password") == [0.5, 0.25, 1.0]
+    assert cache.get_vector("Reset the password") is None
+    other_model = QueryCache("openai", "other", 3, cache.generation)
+    assert other_model.get_vector("reset the password") is None
+
+
+def test_generation_bump_invalidates_results(tmp_path):
+    path = str(tmp_path / "gens" / "documents")
+    cache = QueryCache("openai", "m", 2, CollectionGeneration(path))
+    results = [SearchResult(id="1", score=0.9, text="t", metadata={})]
+    key = cache.result_key([1.0, 0.0], 5, {"b": 1, "a": 2})
+    cache.put_results(key, results)
+    assert cache.get_results(cache.result_key([1.0, 0.0], 5, {"a": 2, "b": 1})) == results
+    assert cache.get_results(cache.result_key([1.0, 0.0], 6, {"a": 2, "b": 1})) is None
+
+    # A writer in another process bumps the counter through its own instance
+    assert CollectionGeneration(path).bump() == 1
+    assert cache.get_results(cache.result_key([1.0, 0.0], 5, {"a": 2, "b": 1})) is None
+    assert cache.stats()["generation"] == 1
+
+
+def test_make_query_cache_respects_config(tmp_path):
+    cfg = {
+        "data": {"cache_dir": str(tmp_path)},
+        "embeddings": {"provider": "openai", "model": "m"},
+        "vectordb": {"collection": "documents"},
+        "search": {"cache": {"enabled": True, "results": {"max_entries": 7}}},
+    }
+    cache = make_query_cache(cfg, 3)
+    assert cache.results.max_entries == 7
+    assert cache.generation.path == str(tmp_path / "generations" / "documents")
+    cfg["search"]["cache"]["enabled"] = False
+    assert make_query_cache(cfg, 3) is None
@@ -0,0 +1,108 @@
+import yaml
+
+from src.common.types import Chunk
+from src.ingest.upsert import build_records
+from src.rag import generate, retrieve
+from src.rag.generate import RagPipeline
+from src.rag.retrieve import Retriever
+
+WORDS = ["alpha", "beta", "gamma", "delta"]
+
+
+class _Embedder:
+    """One dimension per known word; counts calls and instances."""
+
+    instances = 0
+
+    def __init__(self, cfg=None):
+        type(self).instances += 1
+        self.calls = 0
+        self.closed = False
+
+    def embedding_dimensions(self):
+        return len(WORDS)
+
+    def embed_texts(self, texts):
+        self.calls += 1
+        return [[1.0 if w in t else 0.0 for w in WORDS] for t in texts]
+
+    def close(self):
+        self.closed = True
+
+
+class _LLM:
+    def __init__(self):
+        self.prompts = []
+
+    def complete(self, prompt):
+        self.prompts.append(prompt)
+        return "answer"
+
+    def close(self):
+        pass
+
+
+def _config(tmp_path):
+    cfg = {
+        "vectordb": {"provider": "local", "collection": "documents", "dims": "auto", "local": {"path": str(tmp_path / "store")}},
+        "embeddings": {"provider": "fake", "model": "fake"},
+        "rag": {"max_context_tokens": 1000},
+    }
+    path = tmp_path / "cfg.yaml"
+    path.write_text(yaml.safe_dump(cfg))
+    return cfg, str(path)
+
+
+def _load(retriever):
+    chunks = [
+        Chunk(doc_id="d", chunk_index=i, text=f"about {w}", char_span=(0, 8), section_path="S", page_numbers=[1], metadata={"source_path": f"{w}.pdf"})
+        for i, w in enumerate(WORDS)
+    ]
+    retriever.client.upsert(build_records(chunks, retriever.embedder.embed_texts([c.text for c in chunks])))
+
+
+def test_function_api_reuses_one_retriever(tmp_path, monkeypatch):
+    _Embedder.instances = 0
+    monkeypatch.setattr(retrieve, "make_embedder", _Embedder)
+    retrieve.get_retriever.cache_clear()
+    generate.get_pipeline.cache_clear()
+    _, path = _config(tmp_path)
+    _load(retrieve.get_retriever(path))
+
+    for w in WORDS:
+        (top,) = retrieve.retrieve(w, path, 1, None)
+        assert top.text == f"about {w}"
+    assert _Embedder.instances == 1
+    retriever = retrieve.get_retriever(path)
+    assert generate.get_pipeline(path).retriever is retriever
+    retriever.close()
+    retrieve.get_retriever.cache_clear()
+    generate.get_pipeline.cache_clear()
+
+
+def test_warmup_batch_and_close(tmp_path):
+    cfg, _ = _config(tmp_path)
+    embedder = _Embedder()
+    retriever = Retriever(cfg, embedder=embedder)
+    retriever.warmup()
+    assert embedder.calls == 1
+    _load(retriever)
+
+    batch = retriever.retrieve_batch(["gamma", "alpha"], 2)
+    assert [[r.text for r in res] for res in batch] == [[r.text for r in retriever.retrieve(q, 2)] for q in ["gamma", "alpha"]]
+    assert batch[0][0].text == "about gamma"
+    retriever.close()
+    assert embedder.closed
+
+
+def test_pipeline_answers_from_retrieved_contexts(tmp_path):
+    cfg, _ = _config(tmp_path)
+    llm = _LLM()
+    pipeline = RagPipeline(Retriever(cfg, embedder=_Embedder()), llm)
+    _load(pipeline.retriever)
+
+    res = pipeline.answer("delta?", top_k=1)
+    assert res["answer"] == "answer"
+    assert [s["source_path"] for s in res["sources"]] == ["delta.pdf"]
+    assert "about delta" in llm.prompts[0] and "delta?" in llm.prompts[0]
+    pipeline.close()
@@ -0,0 +1,95 @@
+import tracemalloc
+
+import numpy as np
+
+from src.common.types import Chunk, EmbeddingBatch
+from src.ingest.upsert import build_batch, build_records, chunk_ids, diff_document, embedding_fingerprint
+
+
+def _chunks(texts, source_path="docs/a.pdf", sha256="v1"):
+    return [
+        Chunk(
+            doc_id=sha256,
+            chunk_index=i,
+            text=t,
+            char_span=(0, len(t)),
+            section_path=None,
+            page_numbers=[],
+            metadata={"source_path": source_path, "sha256": sha256},
+        )
+        for i, t in enumerate(texts)
+    ]
+
+
+def _records(texts, **kwargs):
+    chunks = _chunks(texts, **kwargs)
+    return build_records(chunks, [[float(i)] for i in range(len(chunks))])
+
+
+def test_chunk_ids_are_content_addressed():
+    before = _records(["intro", "body", "outro"], sha256="v1")
+    after = _records(["intro", "body edited", "outro"], sha256="v2")
+    assert before[0].id == after[0].id
+    assert before[2].id == after[2].id
+    assert before[1].id != after[1].id
+    assert len(before[0].id) == 32
+
+
+def test_duplicate_texts_get_distinct_ids():
+    records = _records(["same", "same"])
+    assert records[0].id != records[1].id
+    assert _records(["x"], source_path="a")[0].id != _records(["x"], source_path="b")[0].id
+
+
+def test_chunk_ids_change_with_the_embedding_model():
+    chunks = _chunks(["intro", "body"])
+    small = chunk_ids(chunks, embedding_fingerprint("openai", "text-embedding-3-small", 1536))
+    large = chunk_ids(chunks, embedding_fingerprint("openai", "text-embedding-3-large", 1536))
+    assert set(small).isdisjoint(large)
+    assert build_batch(chunks, np.ones((2, 1)), embedding_fingerprint("openai", "text-embedding-3-small", 1536)).ids == small
+
+
+def test_diff_document_splits_fresh_surviving_stale():
+    old = _records(["intro", "body", "outro"])
+    new = _records(["intro", "body edited"])
+    fresh, surviving, stale = diff_document([r.id for r in old], new)
+    assert [r.text for r in fresh] == ["body edited"]
+    assert [r.text for r in surviving] == ["intro"]
+    assert sorted(stale) == sorted([old[1].id, old[2].id])
+
+
+def test_batch_matches_records_and_diffs_by_index():
+    chunks = _chunks(["intro", "body", "intro"])
+    records = build_records(chunks, [[float(i), 1.0] for i in range(3)])
+    batch = build_batch(_chunks(["intro", "body", "intro"]), np.array([[float(i), 1.0] for i in range(3)]))
+    assert batch.ids == [r.id for r in records]
+    assert batch.vectors.dtype == np.float32 and batch.vectors.shape == (3, 2)
+    assert [r.metadata for r in batch] == [r.metadata for r in records]
+
+    fresh, surviving, stale = diff_document([records[1].id, "gone"], batch)
+    assert isinstance(fresh, EmbeddingBatch) and fresh.ids == [batch.ids[0], batch.ids[2]]
+    assert surviving.ids == [batch.ids[1]] and stale == ["gone"]
+    assert np.shares_memory(batch[1:].vectors, batch.vectors)
+    # Only a contiguous part is a view of the input rows
+    assert np.shares_memory(surviving.vectors, batch.vectors) and not np.shares_memory(fresh.vectors, batch.vectors)
+    np.testing.assert_array_equal(fresh.vectors, batch.vectors[[0, 2]])
+
+
+def test_columnar_batches_use_a_fraction_of_record_memory():
+    n, dims = 400, 1536
+    rng = np.random.default_rng(0)
+    embedded = rng.random((n, dims), dtype=np.float32)
+
+    def peak(build):
+        chunks = _chunks([f"chunk {i}" for i in range(n)])
+        tracemalloc.start()
+        try:
+            kept = build(chunks)
+            return tracemalloc.get_traced_memory()[1], kept
+        finally:
+            tracemalloc.stop()
+
+    records_peak, _ = peak(lambda chunks: build_records(chunks, embedded.tolist()))
+    batch_peak, _ = peak(lambda chunks: build_batch(chunks, embedded))
+    # Boxed floats cost ~32 bytes each (float + list slot) versus 4 in the matrix
+    assert batch_peak * 5 < records_peak